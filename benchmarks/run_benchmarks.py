@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Measures what a message costs the client: the creation of the payloads and ids
+# (micro) and the messages per second a single sender manages against oscsim-mock
+# (send). The results are written as JSON, so they can be compared across versions:
+#
+#   python benchmarks/run_benchmarks.py -o results-1.1.2.json
+#
+# The sources next to this directory are measured, not an installed oscsim.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import timeit
+from datetime import datetime
+from functools import partial
+from threading import Thread
+from time import perf_counter, process_time
+
+SOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, SOURCES)
+
+from oscsim import run  # noqa: E402
+from oscsim.modules import arguments, async_engine, helper, stats  # noqa: E402
+
+# some "consts"
+# a WeatherObserved-like mix of attributes, NGSI-LD and SensorThings take the
+# numbers and strings only
+ATTRIBUTES_NGSI_V2 = [
+    "-y",
+    "WeatherObserved",
+    "-an",
+    "temperature,f,-10,35",
+    "-an",
+    "relativeHumidity,i,0,100",
+    "-an",
+    "atmosphericPressure,f,1013.25",
+    "-as",
+    "source",
+    "http://weather.example.com",
+    "-ad",
+    "dateObserved",
+    "-al",
+    "location,51.7,8.7,51.8,8.8",
+    "-ab",
+    "raining",
+    "toggle",
+]
+ATTRIBUTES_NGSI_LD = [
+    "-y",
+    "WeatherObserved",
+    "-an",
+    "temperature,f,-10,35",
+    "-an",
+    "relativeHumidity,i,0,100",
+    "-an",
+    "atmosphericPressure,f,1013.25",
+    "-as",
+    "source",
+    "http://weather.example.com",
+]
+ATTRIBUTES_SENSOR_THINGS = [
+    "-an",
+    "temperature,f,-10,35",
+    "-an",
+    "relativeHumidity,i,0,100",
+]
+MQTT_PORT = 1883  # the one oscsim connects to
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of oscsim: the creation of payloads and the messages "
+        "per second of a single sender against oscsim-mock."
+    )
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="file",
+        dest="output",
+        help="Write the results (JSON) to the given file instead of stdout.",
+    )
+
+    parser.add_argument(
+        "--seconds",
+        metavar="seconds",
+        dest="seconds",
+        help="Define how long each micro benchmark runs (per repetition). "
+        "[Default: 0.5]",
+        default=0.5,
+        type=float,
+    )
+
+    parser.add_argument(
+        "--messages",
+        metavar="number",
+        dest="messages",
+        help="Define the number of messages sent per send benchmark. [Default: 2000]",
+        default=2000,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--micro-only",
+        dest="micro_only",
+        action="store_true",
+        help="Skip the send benchmarks (and oscsim-mock).",
+    )
+
+    return parser.parse_args()
+
+
+def create_args(protocol, attributes, server="http://127.0.0.1:8080", more=None):
+    # the same args as parsed by oscsim itself
+    cli_args = ["-s", server, "-p", protocol] + attributes + (more or [])
+
+    return arguments.parse_arguments(cli_args)
+
+
+def measure(function, seconds):
+    # returns the best of 5 repetitions in operations per second
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * seconds / elapsed))
+
+    best = min(timer.repeat(repeat=5, number=number))
+
+    return number / best
+
+
+def run_micro_benchmarks(seconds):
+    v2 = create_args(helper.PROTOCOL_NGSI_V2, ATTRIBUTES_NGSI_V2)
+    ld = create_args(helper.PROTOCOL_NGSI_LD, ATTRIBUTES_NGSI_LD)
+    batch = list(range(1, 101))
+
+    benchmarks = [
+        ("create_id", lambda: helper.create_id(4711, "Station", None, 0, False)),
+        (
+            "create_id (NGSI-LD, aligned)",
+            lambda: helper.create_id(4711, "Station", "-a", 20, True),
+        ),
+        (
+            "create_payload_ngsi_v2",
+            lambda: helper.create_payload_ngsi_v2(4711, True, v2),
+        ),
+        (
+            "create_payload_ngsi_v2 (attributes only)",
+            lambda: helper.create_payload_ngsi_v2(None, False, v2),
+        ),
+        (
+            "create_batch_payload_ngsi_v2 (100 entities)",
+            lambda: helper.create_batch_payload_ngsi_v2(batch, "append", v2),
+        ),
+        (
+            "create_payload_ngsi_ld",
+            lambda: helper.create_payload_ngsi_ld(4711, ld, True),
+        ),
+        (
+            "create_batch_payload_ngsi_ld (100 entities)",
+            lambda: helper.create_batch_payload_ngsi_ld(batch, ld),
+        ),
+        ("create_thing_payload", lambda: helper.create_thing_payload("4711", 0)),
+        (
+            "create_observation_payload",
+            lambda: helper.create_observation_payload(21.5, 0),
+        ),
+    ]
+
+    results = []
+    for name, function in benchmarks:
+        ops = measure(function, seconds)
+        print(
+            "%-45s %12.0f ops/sec %9.2f us/op" % (name, ops, 1e6 / ops), file=sys.stderr
+        )
+        results.append({"name": name, "ops_per_sec": ops, "us_per_op": 1e6 / ops})
+
+    return results
+
+
+def find_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(port, mqtt_port):
+    # returns the process, once it's listening (or None if it failed to)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SOURCES + os.pathsep + env.get("PYTHONPATH", "")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "oscsim.mock",
+            "-P",
+            str(port),
+            "--mqtt-port",
+            str(mqtt_port),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        universal_newlines=True,
+    )
+
+    for line in process.stdout:
+        if line.startswith("Running"):
+            # the progress is not of any interest
+            Thread(target=process.stdout.read, daemon=True).start()
+            return process
+
+    process.wait()
+    return None
+
+
+def stop_mock(process):
+    # it prints its result and exits then
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def send(args, engine, mqtt_client):
+    # sends args.num_messages messages by a single sender, returns its stats
+    worker = stats.Stats("benchmark")
+    max_id_length = helper.calculate_max_id_length(args, args.num_messages)
+
+    if engine == helper.ENGINE_ASYNC:
+        async_engine.run(
+            mqtt_client,
+            args,
+            [0],
+            max_id_length,
+            partial(run.count_message, worker, None),
+            run.is_halted,
+            None,
+            run.cache,
+        )
+    elif args.batch_size > 1 and args.protocol in (
+        helper.PROTOCOL_NGSI_V2,
+        helper.PROTOCOL_NGSI_LD,
+    ):
+        run.do_send_batches(
+            run.create_session(1), None, worker, args, 0, max_id_length, None
+        )
+    else:
+        run.do_send(
+            mqtt_client,
+            run.create_session(1),
+            None,
+            worker,
+            args,
+            0,
+            max_id_length,
+            None,
+        )
+
+    return worker
+
+
+def run_send_benchmarks(num_messages):
+    port = find_free_port()
+    mock = start_mock(port, MQTT_PORT)
+    if mock is None:
+        # there's a broker running already
+        print(
+            "Port %i is in use, skipping SensorThings-MQTT" % MQTT_PORT, file=sys.stderr
+        )
+        mock = start_mock(port, 0)
+        with_mqtt = False
+    else:
+        with_mqtt = True
+    if mock is None:
+        print(
+            "Error starting oscsim-mock, skipping the send benchmarks", file=sys.stderr
+        )
+        return []
+
+    server = "http://127.0.0.1:%i" % port
+    messages = ["-m", str(num_messages)]
+    batches = ["--batch-size", "100"]
+    benchmarks = [
+        (
+            "NGSI-V2",
+            helper.PROTOCOL_NGSI_V2,
+            ATTRIBUTES_NGSI_V2,
+            [],
+            helper.ENGINE_THREAD,
+        ),
+        (
+            "NGSI-V2 (async)",
+            helper.PROTOCOL_NGSI_V2,
+            ATTRIBUTES_NGSI_V2,
+            [],
+            helper.ENGINE_ASYNC,
+        ),
+        (
+            "NGSI-V2 (batches of 100)",
+            helper.PROTOCOL_NGSI_V2,
+            ATTRIBUTES_NGSI_V2,
+            batches,
+            helper.ENGINE_THREAD,
+        ),
+        (
+            "NGSI-LD",
+            helper.PROTOCOL_NGSI_LD,
+            ATTRIBUTES_NGSI_LD,
+            [],
+            helper.ENGINE_THREAD,
+        ),
+        (
+            "NGSI-LD (batches of 100)",
+            helper.PROTOCOL_NGSI_LD,
+            ATTRIBUTES_NGSI_LD,
+            batches,
+            helper.ENGINE_THREAD,
+        ),
+        (
+            "SensorThings-HTTP",
+            helper.PROTOCOL_SENSOR_THINGS_HTTP,
+            ATTRIBUTES_SENSOR_THINGS,
+            [],
+            helper.ENGINE_THREAD,
+        ),
+        (
+            "SensorThings-HTTP (batches of 100)",
+            helper.PROTOCOL_SENSOR_THINGS_HTTP,
+            ATTRIBUTES_SENSOR_THINGS,
+            batches,
+            helper.ENGINE_THREAD,
+        ),
+    ]
+    if with_mqtt:
+        benchmarks.append(
+            (
+                "SensorThings-MQTT",
+                helper.PROTOCOL_SENSOR_THINGS_MQTT,
+                ATTRIBUTES_SENSOR_THINGS,
+                [],
+                helper.ENGINE_THREAD,
+            )
+        )
+
+    results = []
+    try:
+        for name, protocol, attributes, more, engine in benchmarks:
+            args = create_args(protocol, attributes, server, messages + more)
+            mqtt_client = run.create_mqtt_client(args)
+
+            # the first run creates the entities (Things and Datastreams), the
+            # second one measures the updates
+            send(args, engine, mqtt_client)
+            start_time = perf_counter()
+            start_cpu = process_time()
+            worker = send(args, engine, mqtt_client)
+            seconds = perf_counter() - start_time
+            cpu_seconds = process_time() - start_cpu
+
+            if mqtt_client is not None:
+                mqtt_client.loop_stop()
+                mqtt_client.disconnect()
+
+            rate = worker.messages / seconds
+            # what one core could send, if the server wasn't waited for
+            rate_per_core = worker.messages / cpu_seconds if cpu_seconds > 0 else 0
+            print(
+                "%-45s %8.0f msg/sec %8.0f msg/sec per core %6i error(s)"
+                % (name, rate, rate_per_core, worker.errors),
+                file=sys.stderr,
+            )
+            results.append(
+                {
+                    "name": name,
+                    "protocol": protocol,
+                    "engine": engine,
+                    "messages": worker.messages,
+                    "errors": worker.errors,
+                    "seconds": seconds,
+                    "cpu_seconds": cpu_seconds,
+                    "messages_per_sec": rate,
+                    "messages_per_sec_per_core": rate_per_core,
+                }
+            )
+    finally:
+        stop_mock(mock)
+
+    return results
+
+
+def main():
+    args = parse_arguments()
+
+    # stdout is for the result only, whatever oscsim prints (e.g. while connecting
+    # to the MQTT-broker) goes to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        result = {
+            "version": helper.get_version(),
+            "time": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "micro": run_micro_benchmarks(args.seconds),
+            "send": [] if args.micro_only else run_send_benchmarks(args.messages),
+        }
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -41,7 +41,9 @@ setup(
     ],
     package_dir={'': 'src'},
     packages=find_packages('src'),
-    entry_points={'console_scripts': ['oscsim = oscsim.run:main']},
+    entry_points={'console_scripts': ['oscsim = oscsim.run:main',
+                                      'oscsim-mock = oscsim.mock:main',
+                                      'oscsim-agent = oscsim.agent:main']},
     python_requires='>=3.6',
     install_requires=install_requires
 )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import multiprocessing
+import signal
+import socket
+import sys
+
+from . import run
+from .modules import agent_arguments, output
+
+
+def serve(server):
+    # one controller at a time, every run in a process of its own (see
+    # run.serve_controller)
+    while True:
+        connection, address = server.accept()
+        print("Controller %s:%i connected" % address[:2], flush=True)
+
+        p = multiprocessing.Process(target=run.serve_controller, args=(connection,))
+        p.start()
+        # the process has its own copy
+        connection.close()
+
+        try:
+            p.join()
+        except KeyboardInterrupt:
+            p.terminate()
+            raise
+
+        print("Controller %s:%i done, waiting..." % address[:2], flush=True)
+
+
+def create_server(host, port):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        server.bind((host, port))
+        server.listen(1)
+    except OSError:
+        server.close()
+        raise
+
+    return server
+
+
+def main(args=None):
+    output.print_version()
+    args = agent_arguments.parse_arguments(args)
+
+    try:
+        server = create_server(args.bind, args.port)
+    except OSError as e:
+        print("Error listening: %s\nExiting..." % e)
+        sys.exit(0)
+
+    print("Agent listening on %s:%i" % (args.bind, args.port), flush=True)
+
+    # noinspection PyTypeChecker
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    print("Waiting for a controller... (Ctrl-C to stop)", flush=True)
+
+    try:
+        serve(server)
+    except KeyboardInterrupt:
+        pass
+
+    server.close()
+    print("\nStopped")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import signal
+import sys
+from datetime import datetime
+from threading import Thread
+from time import sleep
+
+from .modules import mock_arguments, mock_broker, mock_server, output
+
+
+def print_progress(mock, broker, last):
+    # last is (time, requests, MQTT-messages) of the previous call
+    now = datetime.now()
+    requests, _, injected, observations = mock.get_stats()
+    messages = broker.get_stats()[1] if broker is not None else 0
+    seconds = (now - last[0]).total_seconds()
+
+    line = "\rRequests: %i (%i req/sec), errors injected: %i, Observations: %i" % (
+        requests,
+        (requests - last[1]) / seconds if seconds > 0 else 0,
+        injected,
+        observations,
+    )
+    if broker is not None:
+        line += ", MQTT-messages: %i (%i msg/sec)" % (
+            messages,
+            (messages - last[2]) / seconds if seconds > 0 else 0,
+        )
+    print(line + "      ", end="", flush=True)
+
+    return now, requests, messages
+
+
+def print_result(mock, broker, start):
+    requests, statuses, injected, observations = mock.get_stats()
+
+    print("\n\nRequests: %i, by status:" % requests)
+    for status in sorted(statuses.keys()):
+        print("%i time(s) %i" % (statuses[status], status))
+    if injected > 0:
+        print("Errors injected: %i" % injected)
+    if observations > 0:
+        print("Observations: %i" % observations)
+    if broker is not None:
+        connections, messages = broker.get_stats()
+        print("MQTT-messages: %i (%i connection(s))" % (messages, connections))
+
+    end = datetime.now()
+    output.print_delimiter()
+    output.print_time_spent(int((end - start).total_seconds() * 1000))
+    output.print_duration("Mock", start, end)
+
+
+def main(args=None):
+    output.print_version()
+    args = mock_arguments.parse_arguments(args)
+
+    mock = mock_server.Mock(args.latency, args.error_rate, args.error_status)
+    broker = mock_broker.Broker(mock.get_delay) if args.mqtt_port > 0 else None
+
+    servers = []
+    try:
+        servers.append(mock.create_server(args.bind, args.port))
+        print("HTTP-server listening on %s:%i" % (args.bind, args.port), flush=True)
+        if broker is not None:
+            servers.append(broker.create_server(args.bind, args.mqtt_port))
+            print(
+                "MQTT-broker listening on %s:%i" % (args.bind, args.mqtt_port),
+                flush=True,
+            )
+    except OSError as e:
+        print("Error listening: %s\nExiting..." % e)
+        sys.exit(0)
+
+    if args.latency[1] > 0:
+        print("Latency: %g to %g ms" % args.latency, flush=True)
+    if args.error_rate > 0:
+        print(
+            "Errors: %g%% with status %i" % (args.error_rate, args.error_status),
+            flush=True,
+        )
+
+    for server in servers:
+        Thread(target=server.serve_forever, daemon=True).start()
+
+    # noinspection PyTypeChecker
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    print("Running... (Ctrl-C to stop)", flush=True)
+
+    start = datetime.now()
+    last = (start, 0, 0)
+    try:
+        while True:
+            sleep(1)
+            last = print_progress(mock, broker, last)
+    except KeyboardInterrupt:
+        pass
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+    print_result(mock, broker, start)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
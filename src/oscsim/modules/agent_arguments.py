@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+
+
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(
+        prog="oscsim-agent",
+        description="Agent of oscsim: runs the threads the controller (oscsim with "
+        "'--agents') assigns to it and reports their stats back.",
+        allow_abbrev=False,
+    )
+
+    parser.epilog = (
+        "Example: oscsim-agent -b 0.0.0.0 -P 7070 on every host sending, "
+        "oscsim --agents host-1:7070,host-2:7070 -n 20 -u -l 60 ... on the "
+        "controlling one. Anyone able to connect can let the agent send anything, "
+        "so run it in a trusted network only."
+    )
+
+    parser.add_argument(
+        "-b",
+        "--bind",
+        metavar="address",
+        dest="bind",
+        help="Define the address to listen on, use 0.0.0.0 to be reachable from "
+        "other hosts. [Default: 127.0.0.1]",
+        default="127.0.0.1",
+    )
+
+    parser.add_argument(
+        "-P",
+        "--port",
+        metavar="port",
+        dest="port",
+        help="Define the port the controller connects to. [Default: 7070]",
+        default=7070,
+        type=int,
+    )
+
+    args = parser.parse_args(args)
+
+    check_arguments(parser, args)
+
+    return args
+
+
+def check_arguments(parser, args):
+    if not 0 < args.port < 65536:
+        parser.error("Please define a valid port [0 < -P/--port < 65536]")
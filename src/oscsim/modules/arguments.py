@@ -4,10 +4,24 @@ import argparse
 import shutil
 import textwrap as _textwrap
 
-from . import helper
+from . import capacity, helper, pacer, payload_plan, profile, remote, scenario
 
+RATE_UNITS = {"s": 1.0, "m": 60.0, "h": 3600.0}
 
-def parse_arguments():
+
+def rate(value):
+    # "5000", "5000/s", "300/m" or "10/h" - returned as messages per second
+    number, _, unit = value.partition("/")
+
+    try:
+        return float(number) / RATE_UNITS[unit if unit else "s"]
+    except (ValueError, KeyError):
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a rate like '5000/s', '300/m' or '10/h'" % value
+        )
+
+
+def parse_arguments(args=None):
     class MultiLineFormatter(argparse.HelpFormatter):
         def __init__(self, prog, indent_increment=2, max_help_position=24):
             argparse.HelpFormatter.__init__(
@@ -146,6 +160,15 @@ def parse_arguments():
         type=int,
     )
 
+    parser.add_argument(
+        "--id-cache",
+        metavar="file",
+        dest="id_cache",
+        help="[Only SensorThings!] If set, the ids of the Things and Datastreams found "
+        "(or created) are kept in this file, so later runs against the same server "
+        "do not have to search for them again. The file is created if missing.",
+    )
+
     parser.add_argument(
         "-H",
         "--header",
@@ -202,6 +225,80 @@ def parse_arguments():
         type=int,
     )
 
+    parser.add_argument(
+        "--engine",
+        choices=[helper.ENGINE_THREAD, helper.ENGINE_ASYNC],
+        default=helper.ENGINE_THREAD,
+        dest="engine",
+        help="Define how the senders (see '-n/--num-threads') are run: '%s' starts "
+        "one thread per sender, '%s' runs every sender as a coroutine with its "
+        "own non-blocking connection within a single thread (use this for "
+        "thousands of senders). [Default: %s]"
+        % (helper.ENGINE_THREAD, helper.ENGINE_ASYNC, helper.ENGINE_THREAD),
+    )
+
+    parser.add_argument(
+        "--processes",
+        metavar="num",
+        dest="processes",
+        help="Define, how many processes shall be used. The threads (see "
+        "'-n/--num-threads') and their ranges of ids are split across the "
+        "processes, so more than one CPU core can be used. [Default: 1]",
+        default=1,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--agents",
+        metavar="host:port[,host:port...]",
+        dest="agents",
+        help="Run the threads on the given agents (see 'oscsim-agent') instead of "
+        "here: the threads, their ranges of ids and the rate are split across "
+        "the agents (and their processes, see '--processes'), they are started at "
+        "once and their stats are merged into one result.",
+        type=remote.addresses,
+    )
+
+    parser.add_argument(
+        "--pool-size",
+        metavar="num",
+        dest="pool_size",
+        help="Define, how many connections are kept open for the threads sharing "
+        "one session. [Default: the number of threads]",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--session-per-thread",
+        dest="session_per_thread",
+        action="store_true",
+        default=False,
+        help="If set, every thread uses a session (with a connection) of its own "
+        "instead of sharing one session with all other threads.",
+    )
+
+    parser.add_argument(
+        "--producers",
+        metavar="num",
+        dest="producers",
+        help="Define, how many threads (per process) create the requests ahead of "
+        "the threads sending them (NGSI-V2/-LD only). The requests are kept in a "
+        "queue (see '--queue-size'), the progress shows how full it is. "
+        "[Default: 0, every thread creates its requests itself]",
+        default=0,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        metavar="num",
+        dest="queue_size",
+        help="Define, how many requests (or batches) the producers (see "
+        "'--producers') may create ahead. [Default: 1000]",
+        default=1000,
+        type=int,
+    )
+
     parser.add_argument(
         "-m",
         "--messages",
@@ -236,6 +333,99 @@ def parse_arguments():
         type=int,
     )
 
+    parser.add_argument(
+        "--rate",
+        metavar="num[/s|/m|/h]",
+        dest="rate",
+        help="If set, messages are sent at this overall rate (for all threads "
+        "together) following a schedule that does not wait for any response. "
+        "Response-times are measured from the time a message was due to be sent, "
+        "so a slow server shows up in them instead of lowering the load. When "
+        "deleting [-d/--delete], this is the maximum rate of deletes instead.",
+        type=rate,
+    )
+
+    parser.add_argument(
+        "--arrival",
+        choices=[pacer.ARRIVAL_FIXED, pacer.ARRIVAL_POISSON],
+        default=pacer.ARRIVAL_FIXED,
+        dest="arrival",
+        help="Only in conjunction with '--rate': Define, if the time between two "
+        "messages is fixed or follows a poisson process. [Default: %s]"
+        % pacer.ARRIVAL_FIXED,
+    )
+
+    parser.add_argument(
+        "--stages",
+        metavar="duration:workers[,...]",
+        dest="stages",
+        help="If set, the number of threads sending follows the given stages "
+        "(e.g. '60s:200,10m:200,60s:0' ramps up to 200 threads within 60 seconds, "
+        "keeps them for 10 minutes and ramps down again). Each stage goes linearly "
+        "from the number of the stage before (0 for the first one) to its own. "
+        "The run lasts as long as the stages, the number of threads is the highest "
+        "one of the stages and the result shows the messages per stage.",
+        type=profile.stages,
+    )
+
+    parser.add_argument(
+        "--rate-curve",
+        metavar="file",
+        dest="rate_curve",
+        help="If set, messages are sent at a rate following the given CSV-file of "
+        "'seconds,rate' rows (msg/sec, e.g. one row per hour of a day), going "
+        "linearly from one row to the next. Like '--rate' (see there), but the run "
+        "lasts until the last row and the result shows the messages between every "
+        "two rows.",
+        type=profile.rate_curve,
+    )
+
+    parser.add_argument(
+        "--search",
+        metavar="rate,step[,max-rate]",
+        dest="search",
+        help="If set, searches the highest throughput that meets the SLO (see "
+        "'--slo-latency' and '--slo-errors'): messages are sent at the given rate "
+        "(msg/sec, like '--rate'), which goes up by step every '--step-duration' "
+        "seconds, until the SLO is breached (or max-rate is done). The result shows "
+        "the response-times of every step and the knee, the highest throughput "
+        "meeting the SLO. Without max-rate, there are %i steps at most."
+        % capacity.MAX_STEPS,
+        type=capacity.search,
+    )
+
+    parser.add_argument(
+        "--step-duration",
+        metavar="duration",
+        dest="step_duration",
+        help="Only in conjunction with '--search': Define how long each step lasts "
+        "(e.g. '30s' or '2m'). [Default: 30s]",
+        default=30.0,
+        type=profile.duration,
+    )
+
+    parser.add_argument(
+        "--slo-latency",
+        metavar="pPERCENTILE:ms",
+        dest="slo_latency",
+        help="Only in conjunction with '--search': A step breaches the SLO, if the "
+        "given percentile of its response-times is above the given milliseconds "
+        "(e.g. 'p99:250').",
+        type=capacity.slo_latency,
+    )
+
+    parser.add_argument(
+        "--slo-errors",
+        metavar="percent",
+        dest="slo_errors",
+        help="Only in conjunction with '--search': A step breaches the SLO, if more "
+        "than the given percentage of its messages failed. Besides, a step breaches "
+        "it, if less than %i%%%% of its rate were sent successfully. [Default: 1]"
+        % int(capacity.MIN_THROUGHPUT * 100),
+        default=1.0,
+        type=float,
+    )
+
     parser.add_argument(
         "-l",
         "--limit-time",
@@ -246,6 +436,41 @@ def parse_arguments():
         type=int,
     )
 
+    parser.add_argument(
+        "--batch-size",
+        metavar="num",
+        dest="batch_size",
+        help="[Only NGSI-V2, NGSI-LD and SensorThings-HTTP!] If set, the messages are "
+        "sent in batches of up to 'num' messages per request (via '/v2/op/update', "
+        "'/ngsi-ld/v1/entityOperations/' resp. 'CreateObservations' or '$batch', see "
+        "'--batch-type'). [Default: 1]",
+        default=1,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--batch-type",
+        choices=[helper.BATCH_DATA_ARRAY, helper.BATCH_JSON],
+        default=helper.BATCH_DATA_ARRAY,
+        dest="batch_type",
+        help="[Only SensorThings-HTTP!] Define how the Observations of a batch are "
+        "sent: '%s' uses the 'CreateObservations' extension (FROST) with one "
+        "dataArray per Datastream, '%s' uses the JSON '$batch' endpoint with one "
+        "request per Observation. [Default: %s]"
+        % (helper.BATCH_DATA_ARRAY, helper.BATCH_JSON, helper.BATCH_DATA_ARRAY),
+    )
+
+    parser.add_argument(
+        "--flush-interval",
+        metavar="milliseconds",
+        dest="flush_interval",
+        help="[Only SensorThings-HTTP!] Only in conjunction with '--batch-size': If "
+        "set, a batch is sent as soon as its oldest message waits for the given time, "
+        "even if the batch is not full yet (useful together with '-q/--frequency' "
+        "or '--rate').",
+        type=int,
+    )
+
     parser.add_argument(
         "-y",
         "--type",
@@ -336,6 +561,19 @@ def parse_arguments():
         "by repeating -ab.",
     )
 
+    parser.add_argument(
+        "--scenario",
+        metavar="file",
+        dest="scenario",
+        help="[Only NGSI-V2 and NGSI-LD!] Send a mix of entity classes defined in the "
+        "given JSON- (or YAML-) file instead of a single type: every class has a "
+        "name, a weight (its share of the messages), a range of ids (first-id, "
+        "ids), a type, a prefix, a postfix and its attributes (e.g. "
+        '"attribute-number": ["occupancy,i,0,1"]). The result shows the messages, '
+        "errors and response-times per class.",
+        type=scenario.scenario,
+    )
+
     parser.add_argument(
         "-ai",
         "--attribute-indent",
@@ -367,6 +605,72 @@ def parse_arguments():
         help="Generate verbose output.",
     )
 
+    parser.add_argument(
+        "--verbose-file",
+        metavar="file",
+        dest="verbose_file",
+        help="Write the verbose output to the given file instead of the console, "
+        "which will show the progress then. Implies -v.",
+    )
+
+    parser.add_argument(
+        "--verbose-every",
+        metavar="num",
+        dest="verbose_every",
+        help="Show only every n-th message of each thread in the verbose output. "
+        "Implies -v. [Default: 1]",
+        default=1,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--verbose-errors",
+        dest="verbose_errors",
+        action="store_true",
+        default=False,
+        help="Show only failed messages in the verbose output. Implies -v.",
+    )
+
+    parser.add_argument(
+        "--verbose-rate",
+        metavar="lines",
+        dest="verbose_rate",
+        help="Show at most the given number of lines per second in the verbose "
+        "output, the others are skipped. Implies -v.",
+        type=float,
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        metavar="file",
+        dest="metrics_file",
+        help="If set, one row per interval (see '--metrics-interval') is written to "
+        "the given file while sending: messages sent, succeeded and failed (by "
+        "status class), the throughput and the response-times within the "
+        "interval. The file is written as CSV if it ends with '.csv', as JSON "
+        "Lines otherwise.",
+    )
+
+    parser.add_argument(
+        "--metrics-interval",
+        metavar="seconds",
+        dest="metrics_interval",
+        help="Define the interval of the rows written to the metrics-file (see "
+        "'--metrics-file'). [Default: 1]",
+        default=1.0,
+        type=float,
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        metavar="port",
+        dest="metrics_port",
+        help="If set, the metrics of the run (messages, errors, response-times, "
+        "current rate and active workers) are served in the text format of "
+        "Prometheus at 'http://<host>:<port>/metrics' while sending.",
+        type=int,
+    )
+
     parser.add_argument(
         "-d",
         "--delete",
@@ -375,18 +679,94 @@ def parse_arguments():
         type=int,
         nargs=2,
         help="If set, the entities within the given range "
-        '(including "from" and "to") will be deleted.',
+        '(including "from" and "to") will be deleted. The range is split across '
+        "the threads (see '-n/--num-threads' and '--processes').",
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(args)
 
     check_arguments(parser, args)
 
+    # the attributes are parsed only once, not for each message
+    args.plan = payload_plan.PayloadPlan(args)
+
     return args
 
 
 def check_arguments(parser, args):
+    # valid for sending as well as for deleting
+    if args.id_cache is not None and (
+        args.protocol != helper.PROTOCOL_SENSOR_THINGS_HTTP
+        and args.protocol != helper.PROTOCOL_SENSOR_THINGS_MQTT
+    ):
+        parser.error("The ID-cache [--id-cache] is only valid for SensorThings!")
+
+    if args.stages is not None:
+        # the number of threads needed at most
+        args.num_threads = args.stages.get_maximum()
+
+    if args.num_threads <= 0:
+        parser.error(
+            "Without any thread, no messages will be sent at all! "
+            "[-n/--num-threads > 0]"
+        )
+
+    if args.processes <= 0:
+        parser.error("Please define a positive number for processes [--processes > 0]")
+
+    if args.processes > args.num_threads:
+        parser.error(
+            "Each process needs at least one thread! [--processes <= "
+            "-n/--num-threads]"
+        )
+
+    if args.agents is not None and args.num_threads < len(args.agents) * args.processes:
+        parser.error(
+            "Each process of each agent needs at least one thread! "
+            "[-n/--num-threads >= agents [--agents] * --processes]"
+        )
+
+    if args.pool_size is not None and args.pool_size <= 0:
+        parser.error(
+            "Please define a positive number for the pool size [--pool-size > 0]"
+        )
+
+    if args.rate is not None and args.rate <= 0:
+        parser.error("Please define a positive number for rate [--rate]")
+
+    if args.verbose_every <= 0:
+        parser.error(
+            "Please define a positive number for the verbose output "
+            "[--verbose-every > 0]"
+        )
+
+    if args.verbose_rate is not None and args.verbose_rate <= 0:
+        parser.error(
+            "Please define a positive number for the verbose output "
+            "[--verbose-rate > 0]"
+        )
+
+    if (
+        args.verbose_file is not None
+        or args.verbose_every > 1
+        or args.verbose_errors
+        or args.verbose_rate is not None
+    ):
+        args.verbose = True
+
+    # see check_profile
+    args.profile = None
+
     if args.delete is not None:
+        if (
+            args.stages is not None
+            or args.rate_curve is not None
+            or args.search is not None
+        ):
+            parser.error(
+                "Stages [--stages], rate-curves [--rate-curve] and searches [--search] "
+                "cannot be used when deleting messages [-d/--delete]!"
+            )
         if args.delete[0] > args.delete[1]:
             # switch the indexes
             t = args.delete[0]
@@ -397,16 +777,99 @@ def check_arguments(parser, args):
                 "The switch '-u/--unlimited' cannot be used when deleting messages "
                 "[-d/--delete]!"
             )
+        if args.metrics_file is not None:
+            parser.error(
+                "The metrics-file [--metrics-file] cannot be used when deleting "
+                "messages [-d/--delete]!"
+            )
+        if args.metrics_port is not None:
+            parser.error(
+                "The metrics-port [--metrics-port] cannot be used when deleting "
+                "messages [-d/--delete]!"
+            )
+        if args.agents is not None:
+            parser.error(
+                "Agents [--agents] cannot be used when deleting messages "
+                "[-d/--delete]!"
+            )
+        if args.scenario is not None:
+            parser.error(
+                "A scenario [--scenario] cannot be used when deleting messages "
+                "[-d/--delete]!"
+            )
     else:
+        check_profile(parser, args)
+
         if args.datastream_id is not None and args.datastream_id < 0:
             parser.error(
                 "Please define a positive number for Datastream-Id [-a/--datastream-id]"
             )
 
-        if args.num_threads == 0:
+        if args.batch_size <= 0:
+            parser.error(
+                "Please define a positive number for the batch size [--batch-size > 0]"
+            )
+
+        if args.batch_size > 1 and args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT:
+            parser.error("Batches [--batch-size] are not valid for SensorThings-MQTT!")
+
+        if (
+            args.batch_size > 1
+            and args.protocol == helper.PROTOCOL_SENSOR_THINGS_HTTP
+            and args.engine == helper.ENGINE_ASYNC
+        ):
+            parser.error(
+                "Batches [--batch-size] for SensorThings-HTTP are not valid in "
+                "conjunction with [--engine %s]!" % helper.ENGINE_ASYNC
+            )
+
+        if args.flush_interval is not None:
+            if args.flush_interval <= 0:
+                parser.error(
+                    "Please define a positive number for the flush interval "
+                    "[--flush-interval > 0]"
+                )
+
+            if (
+                args.batch_size <= 1
+                or args.protocol != helper.PROTOCOL_SENSOR_THINGS_HTTP
+            ):
+                parser.error(
+                    "Flush interval [--flush-interval] is only valid for batches "
+                    "[--batch-size] of SensorThings-HTTP!"
+                )
+
+        if args.metrics_interval <= 0:
             parser.error(
-                "Without any thread, no messages will be sent at all! "
-                "[-n/--num-threads > 0]"
+                "Please define a positive number for the metrics-interval "
+                "[--metrics-interval > 0]"
+            )
+
+        if args.metrics_port is not None and not 0 < args.metrics_port < 65536:
+            parser.error(
+                "Please define a valid port for the metrics [0 < --metrics-port < 65536]"
+            )
+
+        if args.producers < 0:
+            parser.error(
+                "Please define a positive number for producers [--producers >= 0]"
+            )
+
+        if args.queue_size <= 0:
+            parser.error(
+                "Please define a positive number for the queue size [--queue-size > 0]"
+            )
+
+        if args.producers > 0 and (
+            args.protocol == helper.PROTOCOL_SENSOR_THINGS_HTTP
+            or args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT
+        ):
+            parser.error("Producers [--producers] are not valid for SensorThings!")
+
+        if args.producers > 0 and args.engine == helper.ENGINE_ASYNC:
+            parser.error(
+                "Producers [--producers] are not valid in conjunction with "
+                "[--engine %s]!" % helper.ENGINE_ASYNC
             )
 
         if args.num_messages <= 0:
@@ -428,192 +891,298 @@ def check_arguments(parser, args):
                 "Please define a positive number for frequency [-q/--frequency]"
             )
 
-        if args.numbers is not None:
-            for number in args.numbers:
-                attribute_args = number[0].split(",")
-                if len(attribute_args) < 3 or len(attribute_args) > 4:
+        if args.rate is not None and args.frequency is not None:
+            parser.error(
+                "Please define either a frequency [-q/--frequency] or a rate [--rate]!"
+            )
+
+        if args.scenario is not None:
+            check_scenario(parser, args)
+        else:
+            check_payload(parser, args)
+
+        # check scheme?
+        if args.insert_always and (
+            args.protocol != helper.PROTOCOL_NGSI_V2
+            and args.protocol != helper.PROTOCOL_NGSI_LD
+        ):
+            parser.error(
+                "Insert always scheme [-i/--insert-always] is only valid "
+                "for NGSI-V2 and NGSI-LD!"
+            )
+
+    return True
+
+
+def check_payload(parser, args):
+    # the attributes of the run (or of a class of its scenario, see check_scenario)
+    if args.numbers is not None:
+        for number in args.numbers:
+            attribute_args = number[0].split(",")
+            if len(attribute_args) < 3 or len(attribute_args) > 4:
+                parser.error(
+                    "-an argument ['-an %s'] expects 3 or 4 comma-delimited "
+                    "parameters!" % ",".join(attribute_args)
+                )
+            if attribute_args[1] == "i":
+                t = 0
+                f = 0
+                try:
+                    f = int(attribute_args[2])
+                except ValueError:
                     parser.error(
-                        "-an argument ['-an %s'] expects 3 or 4 comma-delimited "
-                        "parameters!" % ",".join(attribute_args)
+                        'Please check attribute "%s": "number" must be an '
+                        "integer!" % attribute_args[0]
                     )
-                if attribute_args[1] == "i":
-                    t = 0
-                    f = 0
+                if len(attribute_args) == 4:
                     try:
-                        f = int(attribute_args[2])
+                        t = int(attribute_args[3])
                     except ValueError:
                         parser.error(
-                            'Please check attribute "%s": "number" must be an '
-                            "integer!" % attribute_args[0]
+                            'Please check attribute "%s": "max-number" must '
+                            "be an integer!" % attribute_args[0]
+                        )
+                    if t < f:
+                        parser.error(
+                            'Please check attribute "%s": "max-number" must '
+                            "be greater "
+                            'than or equal to "number"!' % attribute_args[0]
                         )
-                    if len(attribute_args) == 4:
-                        try:
-                            t = int(attribute_args[3])
-                        except ValueError:
-                            parser.error(
-                                'Please check attribute "%s": "max-number" must '
-                                "be an integer!" % attribute_args[0]
-                            )
-                        if t < f:
-                            parser.error(
-                                'Please check attribute "%s": "max-number" must '
-                                "be greater "
-                                'than or equal to "number"!' % attribute_args[0]
-                            )
-                elif attribute_args[1] == "f":
-                    t = 0.0
-                    f = 0.0
+            elif attribute_args[1] == "f":
+                t = 0.0
+                f = 0.0
+                try:
+                    f = float(attribute_args[2])
+                except ValueError:
+                    parser.error(
+                        'Please check attribute "%s": "number" must be a '
+                        "floating point number!" % attribute_args[0]
+                    )
+                if len(attribute_args) == 4:
                     try:
-                        f = float(attribute_args[2])
+                        t = float(attribute_args[3])
                     except ValueError:
                         parser.error(
-                            'Please check attribute "%s": "number" must be a '
+                            'Please check attribute "%s": "max-number" must be a '
                             "floating point number!" % attribute_args[0]
                         )
-                    if len(attribute_args) == 4:
-                        try:
-                            t = float(attribute_args[3])
-                        except ValueError:
-                            parser.error(
-                                'Please check attribute "%s": "max-number" must be a '
-                                "floating point number!" % attribute_args[0]
-                            )
-                        if t < f:
-                            parser.error(
-                                'Please check attribute "%s": "max-number" must be '
-                                "greater "
-                                'than or equal to "number"!' % attribute_args[0]
-                            )
-                else:
-                    parser.error(
-                        'Please check attribute "%s": type must be one of [i | f]!'
-                        % attribute_args[0]
-                    )
+                    if t < f:
+                        parser.error(
+                            'Please check attribute "%s": "max-number" must be '
+                            "greater "
+                            'than or equal to "number"!' % attribute_args[0]
+                        )
+            else:
+                parser.error(
+                    'Please check attribute "%s": type must be one of [i | f]!'
+                    % attribute_args[0]
+                )
 
-        if args.locations is not None:
-            for location in args.locations:
-                attribute_args = location[0].split(",")
-                if len(attribute_args) != 3 and len(attribute_args) != 5:
-                    parser.error(
-                        "-al argument ['-al %s'] expects 3 or 5 comma-delimited "
-                        "parameters!" % ",".join(attribute_args)
-                    )
-                lat_from = 0.0
-                lat_to = 0.0
-                long_from = 0.0
-                long_to = 0.0
+    if args.locations is not None:
+        for location in args.locations:
+            attribute_args = location[0].split(",")
+            if len(attribute_args) != 3 and len(attribute_args) != 5:
+                parser.error(
+                    "-al argument ['-al %s'] expects 3 or 5 comma-delimited "
+                    "parameters!" % ",".join(attribute_args)
+                )
+            lat_from = 0.0
+            lat_to = 0.0
+            long_from = 0.0
+            long_to = 0.0
+            try:
+                lat_from = float(attribute_args[1])
+            except ValueError:
+                parser.error(
+                    'Please check attribute "%s": "lat" must be a floating '
+                    "point number!" % attribute_args[0]
+                )
+            if lat_from < -90.0 or lat_from > 90.0:
+                parser.error(
+                    'Please check attribute "%s": "lat" must be in a range from '
+                    "-90.0 to 90.0!" % attribute_args[0]
+                )
+
+            try:
+                long_from = float(attribute_args[2])
+            except ValueError:
+                parser.error(
+                    'Please check attribute "%s": "long" must be a floating '
+                    "point number!" % attribute_args[0]
+                )
+            if long_from < -180.0 or long_from > 180.0:
+                parser.error(
+                    'Please check attribute "%s": "long" must be in a range from '
+                    "-180.0 to 180.0!" % attribute_args[0]
+                )
+
+            if len(attribute_args) == 5:
                 try:
-                    lat_from = float(attribute_args[1])
+                    lat_to = float(attribute_args[3])
                 except ValueError:
                     parser.error(
-                        'Please check attribute "%s": "lat" must be a floating '
+                        'Please check attribute "%s": "max-lat" must be a '
+                        "floating "
                         "point number!" % attribute_args[0]
                     )
-                if lat_from < -90.0 or lat_from > 90.0:
+
+                if lat_to < -90.0 or lat_to > 90.0:
                     parser.error(
-                        'Please check attribute "%s": "lat" must be in a range from '
-                        "-90.0 to 90.0!" % attribute_args[0]
+                        'Please check attribute "%s": "max-lat" must be in a '
+                        "range "
+                        "from -90.0 to 90.0!" % attribute_args[0]
                     )
 
                 try:
-                    long_from = float(attribute_args[2])
+                    long_to = float(attribute_args[4])
                 except ValueError:
                     parser.error(
-                        'Please check attribute "%s": "long" must be a floating '
-                        "point number!" % attribute_args[0]
+                        'Please check attribute "%s": "max-long" must be a '
+                        "floating point number!" % attribute_args[0]
                     )
-                if long_from < -180.0 or long_from > 180.0:
+                if long_to < -180.0 or long_to > 180.0:
                     parser.error(
-                        'Please check attribute "%s": "long" must be in a range from '
-                        "-180.0 to 180.0!" % attribute_args[0]
+                        'Please check attribute "%s": "max-long" must be in a '
+                        "range "
+                        "from -180.0 to 180.0!" % attribute_args[0]
                     )
 
-                if len(attribute_args) == 5:
-                    try:
-                        lat_to = float(attribute_args[3])
-                    except ValueError:
-                        parser.error(
-                            'Please check attribute "%s": "max-lat" must be a '
-                            "floating "
-                            "point number!" % attribute_args[0]
-                        )
-
-                    if lat_to < -90.0 or lat_to > 90.0:
-                        parser.error(
-                            'Please check attribute "%s": "max-lat" must be in a '
-                            "range "
-                            "from -90.0 to 90.0!" % attribute_args[0]
-                        )
-
-                    try:
-                        long_to = float(attribute_args[4])
-                    except ValueError:
-                        parser.error(
-                            'Please check attribute "%s": "max-long" must be a '
-                            "floating point number!" % attribute_args[0]
-                        )
-                    if long_to < -180.0 or long_to > 180.0:
-                        parser.error(
-                            'Please check attribute "%s": "max-long" must be in a '
-                            "range "
-                            "from -180.0 to 180.0!" % attribute_args[0]
-                        )
-
-                    if lat_to < lat_from:
-                        parser.error(
-                            'Please check attribute "%s": "max-lat" must be greater '
-                            "than "
-                            'or equal to "lat"!' % attribute_args[0]
-                        )
-
-                    if long_to < long_from:
-                        parser.error(
-                            'Please check attribute "%s": "max-long" must be greater '
-                            "than "
-                            'or equal to "long"!' % attribute_args[0]
-                        )
+                if lat_to < lat_from:
+                    parser.error(
+                        'Please check attribute "%s": "max-lat" must be greater '
+                        "than "
+                        'or equal to "lat"!' % attribute_args[0]
+                    )
 
-        if args.booleans is not None:
-            for boolean in args.booleans:
-                if (
-                    boolean[1] != "true"
-                    and boolean[1] != "false"
-                    and boolean[1] != "toggle"
-                ):
+                if long_to < long_from:
                     parser.error(
-                        'Please check attribute "%s": "value" must be one '
-                        'of "true", '
-                        '"false" or "toggle"!' % boolean[0]
+                        'Please check attribute "%s": "max-long" must be greater '
+                        "than "
+                        'or equal to "long"!' % attribute_args[0]
                     )
 
-        if not args.delete:
-            # check scheme?
-            if args.insert_always and (
-                args.protocol != helper.PROTOCOL_NGSI_V2
-                and args.protocol != helper.PROTOCOL_NGSI_LD
+    if args.booleans is not None:
+        for boolean in args.booleans:
+            if (
+                boolean[1] != "true"
+                and boolean[1] != "false"
+                and boolean[1] != "toggle"
             ):
                 parser.error(
-                    "Insert always scheme [-i/--insert-always] is only valid "
-                    "for NGSI-V2 and NGSI-LD!"
+                    'Please check attribute "%s": "value" must be one '
+                    'of "true", '
+                    '"false" or "toggle"!' % boolean[0]
                 )
 
-            # is there any payload?
-            if (
-                args.protocol == helper.PROTOCOL_NGSI_V2
-                or args.protocol != helper.PROTOCOL_NGSI_LD
-            ):
-                if (
-                    ((args.numbers is None) or (len(args.numbers) == 0))
-                    and ((args.booleans is None) or (len(args.booleans) == 0))
-                    and ((args.locations is None) or (len(args.locations) == 0))
-                    and ((args.strings is None) or (len(args.strings) == 0))
-                    and ((args.date_times is None) or (len(args.date_times) == 0))
-                ):
-                    parser.error("Please define any payload!")
-            else:
-                if ((args.numbers is None) or (len(args.numbers) == 0)) and (
-                    (args.strings is None) or (len(args.strings) == 0)
-                ):
-                    parser.error("Please define any payload!")
+    # is there any payload?
+    if (
+        args.protocol == helper.PROTOCOL_NGSI_V2
+        or args.protocol != helper.PROTOCOL_NGSI_LD
+    ):
+        if (
+            ((args.numbers is None) or (len(args.numbers) == 0))
+            and ((args.booleans is None) or (len(args.booleans) == 0))
+            and ((args.locations is None) or (len(args.locations) == 0))
+            and ((args.strings is None) or (len(args.strings) == 0))
+            and ((args.date_times is None) or (len(args.date_times) == 0))
+        ):
+            parser.error("Please define any payload!")
+    else:
+        if ((args.numbers is None) or (len(args.numbers) == 0)) and (
+            (args.strings is None) or (len(args.strings) == 0)
+        ):
+            parser.error("Please define any payload!")
 
-    return True
+
+def check_scenario(parser, args):
+    # the type, the ids and the attributes are those of the classes
+    if args.protocol not in [helper.PROTOCOL_NGSI_V2, helper.PROTOCOL_NGSI_LD]:
+        parser.error("A scenario [--scenario] is only valid for NGSI-V2 and NGSI-LD!")
+
+    if (
+        args.type is not None
+        or args.prefix is not None
+        or args.postfix is not None
+        or args.first_id != 1
+        or args.numbers is not None
+        or args.strings is not None
+        or args.date_times is not None
+        or args.locations is not None
+        or args.booleans is not None
+    ):
+        parser.error(
+            "The type [-y], the ids [-f, -e, -o] and the attributes [-an, -as, -ad, "
+            "-al, -ab] are defined per class by the scenario [--scenario]!"
+        )
+
+    if args.producers > 0:
+        parser.error(
+            "Producers [--producers] are not valid in conjunction with a scenario "
+            "[--scenario]!"
+        )
+
+    for definition in args.scenario:
+        class_args = scenario.create_args(definition, args)
+        if (
+            args.protocol == helper.PROTOCOL_NGSI_LD
+            and class_args.numbers is None
+            and class_args.strings is None
+        ):
+            parser.error(
+                'The class "%s" of the scenario [--scenario] needs any number or '
+                "string attribute for NGSI-LD!" % definition["name"]
+            )
+        check_payload(parser, class_args)
+
+    args.scenario = scenario.Scenario(args.scenario, args)
+
+
+def check_profile(parser, args):
+    # the stages (or the rate-curve, or the steps of a search) define how long the
+    # run lasts
+    options = [args.stages, args.rate_curve, args.search]
+    if len([option for option in options if option is not None]) > 1:
+        parser.error(
+            "Please define either stages [--stages], a rate-curve [--rate-curve] or "
+            "a search [--search]!"
+        )
+
+    if args.search is None and (args.slo_latency is not None or args.slo_errors != 1.0):
+        parser.error(
+            "An SLO [--slo-latency, --slo-errors] is only valid in conjunction with "
+            "a search [--search]!"
+        )
+
+    if args.stages is not None:
+        args.profile = args.stages
+    elif args.rate_curve is not None:
+        args.profile = args.rate_curve
+    elif args.search is not None:
+        if not 0 <= args.slo_errors <= 100:
+            parser.error(
+                "Please define a percentage for the SLO [0 <= --slo-errors <= 100]"
+            )
+        args.profile = capacity.create_profile(
+            args.search[0], args.search[1], args.search[2], args.step_duration
+        )
+    else:
+        return
+
+    if args.profile.kind == profile.KIND_RATE and (
+        args.rate is not None or args.frequency is not None
+    ):
+        parser.error(
+            "A rate-curve [--rate-curve] or a search [--search] cannot be used in "
+            "conjunction with a rate [--rate] or a frequency [-q/--frequency]!"
+        )
+
+    if args.limit_time is not None:
+        parser.error(
+            "Limiting the time [-l/--limit-time] is not valid in conjunction with "
+            "stages [--stages], a rate-curve [--rate-curve] or a search [--search], "
+            "they last as long as they are defined!"
+        )
+
+    args.unlimited = True
+    # rounded up, to let the last stage end
+    args.limit_time = int(args.profile.duration + 0.999)
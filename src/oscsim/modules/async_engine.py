@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import ssl
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from requests.utils import requote_uri
+
+from . import exchange, helper, ngsi, pacer, sensor_things
+
+END_OF_HEADERS = (b"\r\n", b"\n", b"")
+# what's sent again on a fresh connection, if a kept-alive one fails (sending the
+# same attributes by PATCH twice doesn't change anything)
+RETRY_METHODS = ("GET", "HEAD", "PUT", "DELETE", "PATCH")
+
+# all connections ever used, just for counting
+connections = []
+
+
+class Response:
+    # just what oscsim needs from a requests.Response
+    def __init__(self, status_code, headers, content, elapsed):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", "replace")
+
+
+class Connection:
+    # A single keep-alive HTTP/1.1 connection - one per virtual client
+    def __init__(self, host):
+        url = urlsplit(host)
+        self.host = url.netloc
+        self.host_name = url.hostname
+        self.secure = url.scheme == "https"
+        if url.port is not None:
+            self.port = url.port
+        else:
+            self.port = 443 if self.secure else 80
+        self.reader = None
+        self.writer = None
+        self.num_connections = 0
+        self.num_requests = 0
+        # if anything of the response to the last request was read at all
+        self.received = False
+
+    async def open(self):
+        ssl_context = ssl.create_default_context() if self.secure else None
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host_name, self.port, ssl=ssl_context
+        )
+        self.num_connections += 1
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, url, data=None, headers=None):
+        target = urlsplit(requote_uri(url))
+        path = target.path if target.path else "/"
+        if target.query:
+            path += "?" + target.query
+
+        if data is None:
+            body = b""
+        elif isinstance(data, str):
+            body = data.encode("utf-8")
+        else:
+            body = data
+
+        lines = [
+            "%s %s HTTP/1.1" % (method, path),
+            "Host: %s" % self.host,
+            "User-Agent: oscsim/%s" % helper.get_version(),
+            "Accept: */*",
+            "Connection: keep-alive",
+        ]
+        if headers is not None:
+            for key, value in headers.items():
+                lines.append("%s: %s" % (key, value))
+        if method in ("POST", "PUT", "PATCH") or len(body) > 0:
+            lines.append("Content-Length: %i" % len(body))
+
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+        if self.reader is not None and self.reader.at_eof():
+            # the server has closed the kept-alive connection in the meantime
+            self.close()
+
+        if self.writer is not None:
+            try:
+                return await self.exchange(method, raw)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server might have closed the kept-alive connection just now, so
+                # give it another try with a fresh one - unless it may have been
+                # processed already: a POST is never sent twice.
+                if self.received or method not in RETRY_METHODS:
+                    raise
+
+        return await self.exchange(method, raw)
+
+    async def exchange(self, method, raw):
+        if self.writer is None:
+            await self.open()
+
+        self.num_requests += 1
+        self.received = False
+        start = datetime.now()
+        try:
+            self.writer.write(raw)
+            await self.writer.drain()
+            return await self.read_response(method, start)
+        except Exception:
+            self.close()
+            raise
+
+    async def read_response(self, method, start):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        self.received = True
+
+        status_code = int(status_line.split(None, 2)[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in END_OF_HEADERS:
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        elapsed = datetime.now() - start
+
+        if method == "HEAD" or status_code in (204, 304) or status_code < 200:
+            content = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            content = await self.read_chunked()
+        elif "content-length" in headers:
+            content = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            # no length at all: the body ends with the connection
+            content = await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+
+        return Response(status_code, headers, content, elapsed)
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # skip trailers, if any
+                while (await self.reader.readline()) not in END_OF_HEADERS:
+                    pass
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+def count_connections():
+    # returns the number of connections opened and requests sent
+    new_connections = 0
+    num_requests = 0
+
+    for connection in connections:
+        new_connections += connection.num_connections
+        num_requests += connection.num_requests
+
+    return new_connections, num_requests
+
+
+async def perform(connection, mqtt_client, flow):
+    # see run.perform
+    answer = None
+    try:
+        while True:
+            step = flow.send(answer)
+            if isinstance(step, exchange.Locked):
+                async with step.cache.get_key_lock(step.key, asyncio.Lock):
+                    try:
+                        answer = await perform(connection, mqtt_client, step.flow)
+                    finally:
+                        step.cache.release_key_lock(step.key)
+            elif isinstance(step, exchange.Publish):
+                answer = sensor_things.publish_observation(
+                    mqtt_client, step.data_stream_id, step.payload
+                )
+            else:
+                try:
+                    answer = await connection.request(
+                        step.method, step.url, step.payload, step.headers
+                    )
+                except Exception:
+                    answer = None
+    except StopIteration as e:
+        return e.value
+
+
+async def wait_for_turn(gate, is_halted):
+    # see run.wait_for_turn
+    while gate is not None and not is_halted():
+        delay = gate.get_delay()
+        if delay == 0:
+            return
+        await asyncio.sleep(delay)
+
+
+async def wait_for_slot(rate_pacer, is_halted):
+    # see run.wait_for_slot
+    slot = rate_pacer.next_slot()
+
+    delay = pacer.get_delay(slot)
+    while delay > 0 and not is_halted():
+        await asyncio.sleep(min(delay, pacer.WAIT_STEP))
+        delay = pacer.get_delay(slot)
+
+    return slot
+
+
+async def do_send(
+    connection,
+    mqtt_client,
+    args,
+    offset,
+    max_id_length,
+    count_message,
+    is_halted,
+    rate_pacer,
+    cache,
+    gate=None,
+    mix=None,
+):
+    first_id = args.first_id + offset
+    host = helper.create_host_url(args.server)
+    # see run.do_send
+    message_args = args
+    class_stats = None
+
+    # see run.do_send for the caching of both
+    thing_id = sensor_things.INVALID_ID
+    data_stream_id = sensor_things.INVALID_ID
+
+    num_messages = 1000000000 if args.unlimited else args.num_messages
+
+    num_sent = 0
+
+    while num_sent < num_messages:
+        await wait_for_turn(gate, is_halted)
+
+        if rate_pacer is not None:
+            slot = await wait_for_slot(rate_pacer, is_halted)
+
+        start_time_ms = datetime.now()
+
+        if is_halted():
+            return
+
+        num_entities = 1
+
+        if args.batch_size > 1:
+            num_entities = min(args.batch_size, num_messages - num_sent)
+            if mix is not None:
+                message_args, first_ids, class_stats = mix.take(num_entities)
+            else:
+                first_ids = ngsi.create_batch_ids(
+                    first_id, num_entities, args.static_id
+                )
+
+            okay, resp, ms, payload, batch_errors = await perform(
+                connection,
+                mqtt_client,
+                ngsi.send_batch(host, first_ids, message_args),
+            )
+
+            if rate_pacer is not None:
+                ms = pacer.get_ms_since(slot)
+
+            count_message(
+                message_args,
+                okay,
+                resp,
+                ms,
+                first_ids[0],
+                payload,
+                max_id_length,
+                num_entities,
+                batch_errors,
+                class_stats,
+            )
+        elif (
+            args.protocol == helper.PROTOCOL_NGSI_V2
+            or args.protocol == helper.PROTOCOL_NGSI_LD
+        ):
+            if mix is not None:
+                message_args, first_ids, class_stats = mix.take(1)
+                first_id = first_ids[0]
+
+            okay, resp, ms, payload = await perform(
+                connection, mqtt_client, ngsi.send(host, first_id, message_args)
+            )
+
+            if rate_pacer is not None:
+                ms = pacer.get_ms_since(slot)
+
+            count_message(
+                message_args,
+                okay,
+                resp,
+                ms,
+                first_id,
+                payload,
+                max_id_length,
+                1,
+                class_stats=class_stats,
+            )
+        else:
+            thing_id, data_stream_id, okay, resp, ms, _ = await perform(
+                connection,
+                mqtt_client,
+                sensor_things.send(
+                    host, first_id, thing_id, data_stream_id, args, cache, False
+                ),
+            )
+
+            if rate_pacer is not None:
+                ms = pacer.get_ms_since(slot)
+
+            count_message(args, okay, resp, ms, first_id, None, max_id_length, 1)
+
+        num_sent += num_entities
+        if not args.static_id:
+            thing_id = sensor_things.INVALID_ID
+            first_id += num_entities
+
+        if args.frequency is not None:
+            await asyncio.sleep(helper.get_frequency_delay(args, start_time_ms))
+
+
+async def run_clients(
+    mqtt_client,
+    args,
+    offsets,
+    max_id_length,
+    count_message,
+    is_halted,
+    rate_pacer,
+    cache,
+    gates,
+    mixes,
+):
+    host = helper.create_host_url(args.server)
+    clients = [Connection(host) for _ in offsets]
+    connections.extend(clients)
+
+    if gates is None:
+        gates = [None] * len(offsets)
+    if mixes is None:
+        mixes = [None] * len(offsets)
+
+    try:
+        await asyncio.gather(
+            *[
+                do_send(
+                    connection,
+                    mqtt_client,
+                    args,
+                    offset,
+                    max_id_length,
+                    count_message,
+                    is_halted,
+                    rate_pacer,
+                    cache,
+                    gate,
+                    mix,
+                )
+                for connection, offset, gate, mix in zip(clients, offsets, gates, mixes)
+            ]
+        )
+    finally:
+        for connection in clients:
+            connection.close()
+
+
+def run(
+    mqtt_client,
+    args,
+    offsets,
+    max_id_length,
+    count_message,
+    is_halted,
+    rate_pacer,
+    cache,
+    gates=None,
+    mixes=None,
+):
+    # runs all clients in the calling thread (with its own event loop), gates are
+    # those of the clients (see profile.Gate) if the number of them changes over time,
+    # mixes those of a scenario (see scenario.Mix)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    try:
+        loop.run_until_complete(
+            run_clients(
+                mqtt_client,
+                args,
+                offsets,
+                max_id_length,
+                count_message,
+                is_halted,
+                rate_pacer,
+                cache,
+                gates,
+                mixes,
+            )
+        )
+    finally:
+        loop.close()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+
+from . import profile
+
+# some "consts"
+# a step is failed, if less than this share of the rate offered was sent successfully
+MIN_THROUGHPUT = 0.9
+# without a maximum rate, the search stops after this many steps
+MAX_STEPS = 100
+
+
+class Search:
+    # Finds the highest throughput that meets the SLO: the rate goes up step by step
+    # (see create_profile), every step is checked as soon as it is over (see check).
+    # The SLO is a percentile of the response-times (if any) and the share of errors,
+    # besides the rate of the step has to be reached at all.
+    def __init__(self, load_profile, slo_latency, slo_errors):
+        self.profile = load_profile
+        self.slo_latency = slo_latency
+        self.slo_errors = slo_errors
+        # (result of the step, what was breached), see profile.create_result
+        self.steps = []
+        self.breached = False
+
+    def check(self, results):
+        # checks the steps that are over, returns True once the SLO is breached
+        while not self.breached and len(self.steps) < len(results):
+            result = results[len(self.steps)]
+            breaches = self.get_breaches(result)
+            self.steps.append((result, breaches))
+            self.breached = len(breaches) > 0
+
+        return self.breached
+
+    def get_breaches(self, result):
+        index, _, _, messages, errors, throughput, response_times = result
+        breaches = []
+
+        rate = self.profile.stages[index][2]
+        if throughput < rate * MIN_THROUGHPUT:
+            breaches.append("%i of %g msg/sec" % (throughput, rate))
+
+        if messages > 0 and errors * 100.0 / messages > self.slo_errors:
+            breaches.append("%.1f%% errors" % (errors * 100.0 / messages))
+
+        if self.slo_latency is not None:
+            percentile, limit = self.slo_latency
+            value = response_times.get_percentile(percentile)
+            if response_times.count == 0 or value > limit:
+                breaches.append("p%g: %s ms" % (percentile, value or "--"))
+
+        return breaches
+
+    def get_knee(self):
+        # the step with the highest throughput meeting the SLO (or None)
+        passed = [result for result, breaches in self.steps if len(breaches) == 0]
+        if len(passed) == 0:
+            return None
+
+        return max(passed, key=lambda result: result[5])
+
+
+def search(value):
+    # "rate,step[,max-rate]" (msg/sec) - returned as (rate, step, max-rate)
+    try:
+        numbers = [float(number) for number in value.split(",")]
+    except ValueError:
+        numbers = []
+
+    if len(numbers) == 2:
+        numbers.append(numbers[0] + (MAX_STEPS - 1) * numbers[1])
+
+    if len(numbers) != 3 or min(numbers) <= 0 or numbers[2] < numbers[0]:
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a search like '100,100' or '100,100,5000' "
+            "(rate,step[,max-rate] in msg/sec)" % value
+        )
+
+    return numbers[0], numbers[1], numbers[2]
+
+
+def slo_latency(value):
+    # "p99:250" - returned as (percentile, milliseconds)
+    percentile, _, limit = value.partition(":")
+
+    try:
+        result = float(percentile.lstrip("p")), int(limit)
+    except ValueError:
+        result = None
+
+    if result is None or not 0 < result[0] <= 100 or result[1] <= 0:
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a latency like 'p99:250' (percentile:milliseconds)" % value
+        )
+
+    return result
+
+
+def create_profile(rate, step, max_rate, step_duration):
+    # one stage per step, keeping its rate
+    stages = []
+
+    while rate <= max_rate + 1e-9:
+        stages.append((step_duration, rate, rate))
+        rate += step
+
+    return profile.Profile(profile.KIND_RATE, stages)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# The requests of a message (and how their responses are evaluated) are written once
+# for both engines, as generators ("flows"): a flow yields what is to be sent and gets
+# the response back - or None, if the request failed at all. Its return value is what
+# run.perform (the threads) and async_engine.perform (the event loop) return, so
+# these two do nothing but the I/O.
+
+
+class Request:
+    # an HTTP-request, answered by the response
+    def __init__(self, method, url, payload=None, headers=None):
+        self.method = method
+        self.url = url
+        self.payload = payload
+        self.headers = headers
+
+
+class Publish:
+    # an Observation sent by MQTT, answered by a simulated response (see
+    # sensor_things.publish_observation)
+    def __init__(self, data_stream_id, payload):
+        self.data_stream_id = data_stream_id
+        self.payload = payload
+
+
+class Locked:
+    # Another flow, run while holding the lock of the key (see
+    # id_cache.IdCache.get_key_lock) - answered by what that flow returns.
+    def __init__(self, cache, key, flow):
+        self.cache = cache
+        self.key = key
+        self.flow = flow
+
+
+def get_ms(resp):
+    # the response-time of a request (0, if it failed at all)
+    if resp is None:
+        return 0
+
+    return int(resp.elapsed.total_seconds() * 1000)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+
+from . import helper
+
+# some "consts"
+PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# the buckets of the response-times [ms]
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+# the current rate is the one of the last seconds
+RATE_WINDOW = 5.0
+# The class of an error as given by the server: {"error": "NotFound", ...} (NGSI-V2),
+# {"type": ".../ResourceNotFound", ...} (NGSI-LD) or {"type": "error", ...} (FROST).
+# The text of an error is cut (see helper.create_error_string), so it's searched for.
+ERROR_CLASS = re.compile(r'"(?:error|type)"\s*:\s*"(?:[^"]*/)?(\w{1,40})"')
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Exporter:
+    # Serves the latest snapshot (see update and run.publish_metrics) at
+    # http://<host>:<port>/metrics in the text format of Prometheus. The snapshot is
+    # replaced as a whole, so there's no need for a lock.
+    def __init__(self, port, protocol):
+        self.protocol = protocol
+        self.snapshot = None
+        # (time, successful messages) of the latest updates, for the current rate
+        self.samples = deque()
+        self.server = Server(("", port), create_handler(self))
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def update(self, snapshot):
+        now = datetime.now().timestamp()
+        self.samples.append((now, snapshot["messages"] - snapshot["errors"]))
+        while now - self.samples[0][0] > RATE_WINDOW:
+            self.samples.popleft()
+
+        first_time, first_messages = self.samples[0]
+        if now > first_time:
+            snapshot["rate"] = int(
+                (self.samples[-1][1] - first_messages) / (now - first_time)
+            )
+        else:
+            snapshot["rate"] = 0
+
+        self.snapshot = snapshot
+
+    def render(self):
+        snapshot = self.snapshot
+        lines = []
+
+        add_metric(
+            lines,
+            "oscsim_info",
+            "gauge",
+            "Version of oscsim and type of server.",
+            [({"version": helper.get_version(), "protocol": self.protocol}, 1)],
+        )
+
+        if snapshot is None:
+            return "\n".join(lines) + "\n"
+
+        add_metric(
+            lines,
+            "oscsim_start_time_seconds",
+            "gauge",
+            "Start of the run since the epoch.",
+            [({}, snapshot["start"])],
+        )
+        add_metric(
+            lines,
+            "oscsim_messages_total",
+            "counter",
+            "Messages sent (every entity of a batch is a message).",
+            [({}, snapshot["messages"])],
+        )
+        add_metric(
+            lines,
+            "oscsim_requests_total",
+            "counter",
+            "Requests sent.",
+            [({}, snapshot["requests"])],
+        )
+        add_metric(
+            lines,
+            "oscsim_errors_total",
+            "counter",
+            "Messages failed, by status (connection errors are 'other').",
+            [
+                ({"status": status}, num)
+                for status, num in get_errors_by_status(
+                    snapshot["unique_errors"]
+                ).items()
+            ],
+        )
+        add_metric(
+            lines,
+            "oscsim_unique_errors_total",
+            "counter",
+            "Messages failed, by status and class of the error (the full text is "
+            "in the result).",
+            [
+                ({"status": status, "error": error_class}, num)
+                for (status, error_class), num in get_errors_by_class(
+                    snapshot["unique_errors"]
+                ).items()
+            ],
+        )
+
+        response_times = snapshot["response_times"]
+        cumulative_counts = response_times.get_cumulative_counts(BUCKETS)
+        add_metric(
+            lines,
+            "oscsim_response_time_milliseconds",
+            "histogram",
+            "Response-times of successful messages.",
+            [
+                ({"le": str(limit)}, num)
+                for limit, num in zip(BUCKETS, cumulative_counts)
+            ]
+            + [({"le": "+Inf"}, response_times.count)],
+            "_bucket",
+        )
+        lines.append("oscsim_response_time_milliseconds_sum %i" % response_times.sum)
+        lines.append(
+            "oscsim_response_time_milliseconds_count %i" % response_times.count
+        )
+
+        add_metric(
+            lines,
+            "oscsim_rate_messages_per_second",
+            "gauge",
+            "Successful messages per second within the last seconds.",
+            [({}, snapshot["rate"])],
+        )
+        add_metric(
+            lines,
+            "oscsim_active_workers",
+            "gauge",
+            "Threads still sending (the async clients run in a thread).",
+            [({}, snapshot["active_workers"])],
+        )
+
+        return "\n".join(lines) + "\n"
+
+
+def create_handler(exporter):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != PATH:
+                self.send_error(404)
+                return
+
+            body = exporter.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header(helper.CONTENT_TYPE, CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            # don't mess up the progress
+            pass
+
+    return Handler
+
+
+def get_errors_by_status(unique_errors):
+    errors_by_status = dict()
+
+    for key, num in unique_errors.items():
+        status = get_status(key)
+        errors_by_status[status] = errors_by_status.get(status, 0) + num
+
+    return errors_by_status
+
+
+def get_errors_by_class(unique_errors):
+    # the text of the errors would make a series of each one
+    errors_by_class = dict()
+
+    for key, num in unique_errors.items():
+        match = ERROR_CLASS.search(key)
+        error_class = (get_status(key), match.group(1) if match else "")
+        errors_by_class[error_class] = errors_by_class.get(error_class, 0) + num
+
+    return errors_by_class
+
+
+def get_status(error_as_string):
+    # connection errors (and anything else) are "other"
+    return error_as_string[:3] if error_as_string[:3].isdigit() else "other"
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def add_metric(lines, name, metric_type, description, samples, suffix=""):
+    lines.append("# HELP %s %s" % (name, description))
+    lines.append("# TYPE %s %s" % (name, metric_type))
+
+    for labels, value in samples:
+        if labels:
+            label_string = "{%s}" % ",".join(
+                '%s="%s"' % (key, escape(str(label))) for key, label in labels.items()
+            )
+        else:
+            label_string = ""
+        lines.append("%s%s%s %s" % (name, suffix, label_string, value))
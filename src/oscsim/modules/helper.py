@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import json
-import random
 from datetime import datetime
 
+from . import json_template
+
 # some "consts"
 VERSION = "1.1.2"
 CONTENT_TYPE = "Content-Type"
@@ -15,6 +16,13 @@ PROTOCOL_NGSI_V2 = "NGSI-V2"
 PROTOCOL_NGSI_LD = "NGSI-LD"
 PROTOCOL_SENSOR_THINGS_HTTP = "SensorThings-HTTP"
 PROTOCOL_SENSOR_THINGS_MQTT = "SensorThings-MQTT"
+ENGINE_THREAD = "thread"
+ENGINE_ASYNC = "async"
+BATCH_DATA_ARRAY = "dataArray"
+BATCH_JSON = "batch"
+
+# the templates of an Observation, by indent
+observation_templates = dict()
 
 
 def get_version():
@@ -46,22 +54,30 @@ def create_host_url(host):
     return "https://" + host
 
 
-def create_value_from_attribute_args(attribute_args):
-    value = None
-    if attribute_args[1] == "i":
-        f = int(attribute_args[2])
-        value = f
-        if len(attribute_args) > 3:
-            t = int(attribute_args[3])
-            value = random.randint(f, t)
-    elif attribute_args[1] == "f":
-        f = float(attribute_args[2])
-        value = f
-        if len(attribute_args) > 3:
-            t = float(attribute_args[3])
-            value = round(random.uniform(f, t), 1)
+def get_response_text(resp, length):
+    # The body as one line. It's decoded as UTF-8 right away: resp.text would guess the
+    # encoding first (if the server didn't tell), which takes far longer than sending.
+    content = resp.content if resp.content is not None else b""
+
+    return " ".join(content.decode("utf-8", "replace").split())[0:length]
+
+
+def create_error_string(resp, length):
+    # for failures only, the body of a successful response isn't decoded at all
+    if resp is None:
+        return "Connection Error"
 
-    return value
+    return str(resp.status_code) + " " + get_response_text(resp, length)
+
+
+def get_frequency_delay(args, start_time):
+    # seconds to wait for the next message of -q/--frequency, start_time is when the
+    # current one was started
+    delta = datetime.now() - start_time
+    sleep_for_ms = args.frequency - int(delta.total_seconds() * 1000)
+    sleep_for_ms -= 10  # give some extra for the call itself
+
+    return max(0, sleep_for_ms) / 1000
 
 
 def create_thing_payload(thing_name, indent):
@@ -129,6 +145,27 @@ def create_data_stream_payload(data_stream_name, indent):
 
 
 def create_observation_payload(value, indent):
+    # spliced into a template, like the payloads of NGSI-V2/-LD (bytes)
+    template = observation_templates.get(indent)
+    if template is None:
+        template = json_template.Template(
+            {
+                "result": json_template.VALUE,
+                "phenomenonTime": json_template.TEXT,
+                "resultTime": json_template.TEXT,
+            },
+            indent,
+        )
+        observation_templates[indent] = template
+
+    time_string = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.00Z").encode("ascii")
+
+    return template.render(
+        [json_template.encode_value(value), time_string, time_string]
+    )
+
+
+def create_observation(value):
     payload = dict()
 
     time_string = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.00Z")
@@ -137,196 +174,75 @@ def create_observation_payload(value, indent):
     payload["phenomenonTime"] = time_string
     payload["resultTime"] = time_string
 
+    return payload
+
+
+def create_data_array_payload(observations, groups, indent):
+    # CreateObservations: one dataArray per Datastream (see
+    # sensor_things.group_observations for the order of the observations)
+    time_string = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.00Z")
+
+    payload = []
+    for data_stream_id, indices in groups.items():
+        data_array = dict()
+        data_array["Datastream"] = {"@iot.id": data_stream_id}
+        data_array["components"] = ["result", "phenomenonTime", "resultTime"]
+        data_array["dataArray@iot.count"] = len(indices)
+        data_array["dataArray"] = [
+            [observations[index][1], time_string, time_string] for index in indices
+        ]
+        payload.append(data_array)
+
+    return dump_payload(payload, indent)
+
+
+def create_json_batch_payload(observations, indent):
+    # $batch: one request per observation, the id is the index of the observation
+    payload = dict()
+
+    payload["requests"] = [
+        {
+            "id": str(index),
+            "method": "post",
+            "url": "Datastreams(%i)/Observations" % data_stream_id,
+            "body": create_observation(value),
+        }
+        for index, (data_stream_id, value) in enumerate(observations)
+    ]
+
+    return dump_payload(payload, indent)
+
+
+def dump_payload(payload, indent):
     if indent > 0:
         return json.dumps(payload, indent=indent)
     else:
         return json.dumps(payload)
 
 
+# The payloads of NGSI-V2/-LD are spliced into templates by the payload plan (see
+# arguments.parse_arguments), they are bytes - ready to be sent.
 def create_payload_ngsi_v2(first_id, meta_data, args):
-    payload = dict()
-    if meta_data:
-        if first_id is not None:
-            payload["id"] = create_id(
-                first_id,
-                args.prefix,
-                args.postfix,
-                0,
-                args.protocol == PROTOCOL_NGSI_LD,
-            )
-        if args.type is not None:
-            payload["type"] = args.type
-
-    if args.date_times is not None:
-        for date_time in args.date_times:
-            attr = {
-                "type": "DateTime",
-                "value": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.00Z"),
-            }
-            payload[date_time[0]] = attr
-
-    if args.numbers is not None:
-        for number in args.numbers:
-            attribute_args = number[0].split(",")
-
-            attr = {}
-
-            # type
-            if attribute_args[1] == "i" or attribute_args[1] == "f":
-                attr["type"] = "Number"
-
-            # value
-            value = create_value_from_attribute_args(attribute_args)
-            attr["value"] = value
-            payload[attribute_args[0]] = attr
-
-    if args.strings is not None:
-        for string in args.strings:
-            attr = {"type": "Text", "value": string[1]}
-            payload[string[0]] = attr
-
-    if args.booleans is not None:
-        for boolean in args.booleans:
-            attr = {"type": "Boolean"}
-
-            # value
-            if boolean[1] == "false":
-                attr["value"] = False
-            elif boolean[1] == "true":
-                attr["value"] = True
-            else:
-                attr["value"] = bool(random.getrandbits(1))
-            payload[boolean[0]] = attr
-
-    if args.locations is not None:
-        for location in args.locations:
-            attribute_args = location[0].split(",")
-
-            attr = {"type": "geo:json"}
-
-            # value
-            coord = {"type": "Point"}
-            lat_from = float(attribute_args[1])
-            long_from = float(attribute_args[2])
-            coord["coordinates"] = [lat_from, long_from]
-
-            if len(attribute_args) > 3:
-                lat_to = float(attribute_args[3])
-                long_to = float(attribute_args[4])
-                coord["coordinates"] = [
-                    random.uniform(lat_from, lat_to),
-                    random.uniform(long_from, long_to),
-                ]
-
-            attr["value"] = coord
-            payload[attribute_args[0]] = attr
-
-    if args.indent > 0:
-        return json.dumps(payload, indent=args.indent)
-    else:
-        return json.dumps(payload)
+    return args.plan.create_payload_ngsi_v2(first_id, meta_data)
+
+
+def create_batch_payload_ngsi_v2(first_ids, action_type, args):
+    return args.plan.create_batch_payload_ngsi_v2(first_ids, action_type)
 
 
 def create_payload_ngsi_ld(first_id, args, is_post):
-    payload = dict()
+    return args.plan.create_payload_ngsi_ld(first_id, is_post)
 
-    if first_id is not None:
-        context = {
-            "id": create_id(
-                first_id,
-                args.prefix,
-                args.postfix,
-                0,
-                args.protocol == PROTOCOL_NGSI_LD,
-            ),
-            "type": args.type,
-        }
-    else:
-        context = {"type": args.type}
-    payload["@context"] = context
-
-    if is_post:
-        if first_id is not None:
-            payload["id"] = create_id(
-                first_id,
-                args.prefix,
-                args.postfix,
-                0,
-                args.protocol == PROTOCOL_NGSI_LD,
-            )
-        payload["type"] = args.type
-
-    if args.date_times is not None:
-        for date_time in args.date_times:
-            attr = {
-                "type": "DateTime",
-                "value": datetime.now().strftime("%Y-%m-%dT%H:%M:%S.00Z"),
-            }
-            payload[date_time[0]] = attr
-
-    if args.numbers is not None:
-        for number in args.numbers:
-            attribute_args = number[0].split(",")
-
-            attr = {}
-
-            # type
-            if attribute_args[1] == "i" or attribute_args[1] == "f":
-                attr["type"] = "Property"  # TODO: "Number" must be accepted!
-
-            # value
-            value = create_value_from_attribute_args(attribute_args)
-            attr["value"] = value
-            payload[attribute_args[0]] = attr
-
-    if args.strings is not None:
-        for string in args.strings:
-            attr = {"type": "Text", "value": string[1]}
-            payload[string[0]] = attr
-
-    if args.booleans is not None:
-        for boolean in args.booleans:
-            attr = {"type": "Boolean"}
-
-            # value
-            if boolean[1] == "false":
-                attr["value"] = False
-            elif boolean[1] == "true":
-                attr["value"] = True
-            else:
-                attr["value"] = bool(random.getrandbits(1))
-            payload[boolean[0]] = attr
-
-    if args.locations is not None:
-        for location in args.locations:
-            attribute_args = location[0].split(",")
-
-            attr = {"type": "geo:json"}
-
-            # value
-            coord = {"type": "Point"}
-            lat_from = float(attribute_args[1])
-            long_from = float(attribute_args[2])
-            coord["coordinates"] = [lat_from, long_from]
-
-            if len(attribute_args) > 3:
-                lat_to = float(attribute_args[3])
-                long_to = float(attribute_args[4])
-                coord["coordinates"] = [
-                    random.uniform(lat_from, lat_to),
-                    random.uniform(long_from, long_to),
-                ]
-
-            attr["value"] = coord
-            payload[attribute_args[0]] = attr
-
-    if args.indent > 0:
-        return json.dumps(payload, indent=args.indent)
-    else:
-        return json.dumps(payload)
+
+def create_batch_payload_ngsi_ld(first_ids, args):
+    return args.plan.create_batch_payload_ngsi_ld(first_ids)
 
 
 def calculate_max_id_length(args, msg_num):
+    if args.scenario is not None:
+        # the ids are those of the classes
+        return args.scenario.get_max_id_length()
+
     if args.delete:
         max_id_length = len(str(args.delete[1]))
         if args.prefix is not None:
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from operator import add, sub
+
+# Layout as in HdrHistogram: values are grouped by their highest bit into buckets, each
+# bucket is split into SUB_BUCKET_HALF_COUNT linear sub-buckets. This gives a precision
+# of two significant digits with a fixed amount of memory.
+SUB_BUCKET_HALF_COUNT_MAGNITUDE = 7
+SUB_BUCKET_HALF_COUNT = 1 << SUB_BUCKET_HALF_COUNT_MAGNITUDE
+SUB_BUCKET_MASK = (SUB_BUCKET_HALF_COUNT << 1) - 1
+# values up to about 2^36 (ms: more than two years) can be recorded
+BUCKET_COUNT = 36 - SUB_BUCKET_HALF_COUNT_MAGNITUDE
+COUNTS_LENGTH = (BUCKET_COUNT + 1) * SUB_BUCKET_HALF_COUNT
+HIGHEST_VALUE = (1 << 36) - 1
+
+PERCENTILES = [50.0, 90.0, 99.0, 99.9]
+
+
+def get_index(value):
+    bucket_index = (value | SUB_BUCKET_MASK).bit_length() - (
+        SUB_BUCKET_HALF_COUNT_MAGNITUDE + 1
+    )
+    sub_bucket_index = value >> bucket_index
+
+    return (bucket_index << SUB_BUCKET_HALF_COUNT_MAGNITUDE) + sub_bucket_index
+
+
+def get_highest_equivalent_value(index):
+    bucket_index = (index >> SUB_BUCKET_HALF_COUNT_MAGNITUDE) - 1
+    sub_bucket_index = (index & (SUB_BUCKET_HALF_COUNT - 1)) + SUB_BUCKET_HALF_COUNT
+
+    if bucket_index < 0:
+        # the very first bucket is exact
+        return index
+
+    return ((sub_bucket_index + 1) << bucket_index) - 1
+
+
+def get_lowest_equivalent_value(index):
+    bucket_index = (index >> SUB_BUCKET_HALF_COUNT_MAGNITUDE) - 1
+    sub_bucket_index = (index & (SUB_BUCKET_HALF_COUNT - 1)) + SUB_BUCKET_HALF_COUNT
+
+    if bucket_index < 0:
+        return index
+
+    return sub_bucket_index << bucket_index
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * COUNTS_LENGTH
+        self.count = 0
+        self.sum = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value, count=1):
+        value = min(max(0, int(value)), HIGHEST_VALUE)
+
+        self.counts[get_index(value)] += count
+        self.sum += value * count
+
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += count
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+
+        # done for every worker at each progress, so let map do the loop
+        self.counts = list(map(add, self.counts, other.counts))
+
+        if self.count == 0 or other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        self.count += other.count
+        self.sum += other.sum
+
+    def get_difference(self, earlier):
+        # what was recorded since "earlier" (a copy of this one taken before), min and
+        # max are only as precise as the sub-buckets
+        difference = Histogram()
+        difference.counts = list(map(sub, self.counts, earlier.counts))
+        difference.count = self.count - earlier.count
+        difference.sum = self.sum - earlier.sum
+
+        if difference.count > 0:
+            indices = [index for index, num in enumerate(difference.counts) if num]
+            difference.min = max(self.min, get_lowest_equivalent_value(indices[0]))
+            difference.max = min(get_highest_equivalent_value(indices[-1]), self.max)
+
+        return difference
+
+    def copy(self):
+        other = Histogram()
+        other.merge(self)
+        return other
+
+    def get_percentile(self, percentile):
+        if self.count == 0:
+            return 0
+
+        wanted = max(1, int(round(percentile / 100.0 * self.count)))
+        seen = 0
+
+        for index, num in enumerate(self.counts):
+            seen += num
+            if seen >= wanted:
+                return max(self.min, min(get_highest_equivalent_value(index), self.max))
+
+        return self.max
+
+    def get_cumulative_counts(self, limits):
+        # how many values are at or below each of the (ascending) limits, as precise as
+        # the sub-buckets are
+        cumulative_counts = []
+        seen = 0
+        index = 0
+
+        for limit in limits:
+            while (
+                index < COUNTS_LENGTH and get_highest_equivalent_value(index) <= limit
+            ):
+                seen += self.counts[index]
+                index += 1
+            cumulative_counts.append(seen)
+
+        return cumulative_counts
+
+    def get_percentiles(self):
+        return [self.get_percentile(percentile) for percentile in PERCENTILES]
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import os
+from threading import Lock
+
+
+class IdCache:
+    # Remembers the ids of Things (by their name) and Datastreams (by the id of their
+    # Thing and their name), shared by all senders. If a file is given, the ids are
+    # kept for later runs against the same server (the file may hold several servers).
+    def __init__(self, host, file_name=None):
+        self.host = host
+        self.file_name = file_name
+        self.lock = Lock()
+        self.things = dict()
+        self.data_streams = dict()
+        # what is gone has to be removed from the file as well (see save)
+        self.removed_things = set()
+        self.removed_data_streams = set()
+        # the lock of a key and the number of senders using it (see get_key_lock)
+        self.key_locks = dict()
+
+        if file_name is not None:
+            self.load()
+
+    def get_thing_id(self, thing_name):
+        with self.lock:
+            return self.things.get(thing_name)
+
+    def put_thing_id(self, thing_name, thing_id):
+        with self.lock:
+            self.things[thing_name] = thing_id
+            self.removed_things.discard(thing_id)
+
+    def get_data_stream_id(self, thing_id, data_stream_name):
+        with self.lock:
+            return self.data_streams.get((thing_id, data_stream_name))
+
+    def put_data_stream_id(self, thing_id, data_stream_name, data_stream_id):
+        with self.lock:
+            self.data_streams[(thing_id, data_stream_name)] = data_stream_id
+            self.removed_data_streams.discard((thing_id, data_stream_name))
+
+    def remove_data_stream(self, thing_id, data_stream_name):
+        with self.lock:
+            self.data_streams.pop((thing_id, data_stream_name), None)
+            self.removed_data_streams.add((thing_id, data_stream_name))
+
+    def remove_thing(self, thing_id):
+        # the Datastreams of a Thing are gone with it
+        with self.lock:
+            for thing_name in [k for k, v in self.things.items() if v == thing_id]:
+                del self.things[thing_name]
+            for key in [k for k in self.data_streams.keys() if k[0] == thing_id]:
+                del self.data_streams[key]
+            self.removed_things.add(thing_id)
+
+    def get_key_lock(self, key, create_lock=Lock):
+        # One lock per Thing (or Datastream) being searched for: the senders asking for
+        # the same one wait for a single request, different ones are searched in
+        # parallel. (The async engine passes asyncio.Lock as create_lock.) Every
+        # caller has to call release_key_lock, once it's done.
+        with self.lock:
+            if key not in self.key_locks:
+                self.key_locks[key] = [create_lock(), 0]
+            entry = self.key_locks[key]
+            entry[1] += 1
+            return entry[0]
+
+    def release_key_lock(self, key):
+        # the lock is kept as long as anybody holds it or waits for it, so a sender
+        # coming after a failed search still waits for the one retrying it
+        with self.lock:
+            entry = self.key_locks[key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.key_locks[key]
+
+    def load(self):
+        things, data_streams = get_entries(read_file(self.file_name), self.host)
+
+        with self.lock:
+            self.things.update(things)
+            self.data_streams.update(data_streams)
+
+    def save(self):
+        if self.file_name is None:
+            return
+
+        # Other processes may have saved their ids in the meantime, so merge them
+        # with the own ones (except for the ones known to be gone).
+        content = read_file(self.file_name)
+        things, data_streams = get_entries(content, self.host)
+
+        with self.lock:
+            things.update(self.things)
+            data_streams.update(self.data_streams)
+
+            things = {k: v for k, v in things.items() if v not in self.removed_things}
+            data_streams = {
+                k: v
+                for k, v in data_streams.items()
+                if k not in self.removed_data_streams
+                and k[0] not in self.removed_things
+            }
+
+        content[self.host] = {
+            "things": things,
+            # the key is "<thing id>/<datastream name>"
+            "datastreams": {"%i/%s" % k: v for k, v in data_streams.items()},
+        }
+
+        # write the whole file at once
+        temp_file_name = "%s.%i" % (self.file_name, os.getpid())
+        with open(temp_file_name, "w") as file:
+            json.dump(content, file, indent=2)
+        os.replace(temp_file_name, self.file_name)
+
+
+def get_entries(content, host):
+    entries = content.get(host, {})
+
+    data_streams = dict()
+    for key, data_stream_id in entries.get("datastreams", {}).items():
+        thing_id, data_stream_name = key.split("/", 1)
+        data_streams[(int(thing_id), data_stream_name)] = data_stream_id
+
+    return dict(entries.get("things", {})), data_streams
+
+
+def read_file(file_name):
+    try:
+        with open(file_name) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return dict()
+    except (OSError, ValueError):
+        print("\nIgnoring the ID-cache '%s' since it cannot be read!" % file_name)
+        return dict()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import re
+
+# Markers for what is filled in per message. json.dumps writes "\x00" as "\u0000",
+# which can't be part of any argument given on the command line.
+# VALUE stands for a whole JSON value (number, boolean, ...), the quotes around it
+# are dropped. TEXT stands for a part of a string, the quotes are kept.
+VALUE = "\x00v\x00"
+TEXT = "\x00t\x00"
+MARKERS = re.compile(r'"\\u0000v\\u0000"|\\u0000t\\u0000')
+
+TRUE = b"true"
+FALSE = b"false"
+
+
+class Template:
+    # The JSON of a payload rendered once (exactly like json.dumps does) and split at
+    # the markers, so each message only has to join the static parts with its values.
+    def __init__(self, payload, indent, depth=0):
+        if indent > 0:
+            text = json.dumps(payload, indent=indent)
+        else:
+            text = json.dumps(payload)
+
+        self.parts = [part.encode("utf-8") for part in MARKERS.split(text)]
+
+        if indent > 0 and depth > 0:
+            # nested into a list or object of a depth of "depth"
+            new_line = b"\n" + b" " * (indent * depth)
+            self.parts = [part.replace(b"\n", new_line) for part in self.parts]
+
+        self.num_values = len(self.parts) - 1
+
+    def render(self, values):
+        # values: the bytes of each marker, in the order they appear in the payload
+        parts = [None] * (2 * self.num_values + 1)
+        parts[::2] = self.parts
+        parts[1::2] = values
+
+        return b"".join(parts)
+
+    def join(self, items):
+        # a template of two values: what's before, between and after the items
+        return self.parts[0] + self.parts[1].join(items) + self.parts[2]
+
+
+def encode_value(value):
+    # the same as json.dumps(value).encode() for the values generated
+    if value is True:
+        return TRUE
+    elif value is False:
+        return FALSE
+    elif isinstance(value, int):
+        return int.__repr__(value).encode("ascii")
+    elif isinstance(value, float):
+        return float.__repr__(value).encode("ascii")
+
+    return json.dumps(value).encode("utf-8")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import csv
+import json
+from datetime import datetime
+
+from . import histogram, stats
+
+# some "consts"
+FORMAT_CSV = "csv"
+FORMAT_JSON_LINES = "jsonl"
+FIELDS = [
+    "time",
+    "elapsed",
+    "sent",
+    "succeeded",
+    "failed",
+    "failed_4xx",
+    "failed_5xx",
+    "failed_other",
+    "throughput",
+    "requests",
+    "min",
+    "p50",
+    "p90",
+    "p99",
+    "p99.9",
+    "max",
+]
+
+
+class MetricsWriter:
+    # Writes one row per interval (CSV or JSON Lines, see get_format) with what
+    # happened within that interval. update is given the current totals (a
+    # stats.Stats, see run.collect_stats) on every tick of the progress, so a row is
+    # written on the first tick after its interval is over.
+    def __init__(self, file_name, interval):
+        self.file_name = file_name
+        self.format = get_format(file_name)
+        self.interval = interval
+        self.file = None
+        self.writer = None
+        self.start_time = None
+        self.last_time = None
+        self.last_stats = None
+        self.num_intervals = 1
+
+    def start(self):
+        self.file = open(self.file_name, "w", newline="")
+        if self.format == FORMAT_CSV:
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(FIELDS)
+            self.file.flush()
+
+        self.start_time = datetime.now()
+        self.last_time = self.start_time
+        self.last_stats = stats.Stats()
+
+    def stop(self, current):
+        # the last interval may be a short one
+        self.write_row(datetime.now(), current)
+        self.file.close()
+
+    def update(self, current):
+        now = datetime.now()
+        elapsed = (now - self.start_time).total_seconds()
+        if elapsed < self.num_intervals * self.interval:
+            return
+
+        self.write_row(now, current)
+        # the intervals are kept to the start, no matter how long writing takes (if
+        # shorter than a tick, the ones in between are left out)
+        self.num_intervals = int(elapsed / self.interval) + 1
+
+    def write_row(self, now, current):
+        row = create_row(
+            now,
+            (now - self.start_time).total_seconds(),
+            (now - self.last_time).total_seconds(),
+            current,
+            self.last_stats,
+        )
+
+        if self.format == FORMAT_CSV:
+            self.writer.writerow([row[field] for field in FIELDS])
+        else:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+        self.last_time = now
+        self.last_stats = current
+
+
+def get_format(file_name):
+    if file_name.lower().endswith("." + FORMAT_CSV):
+        return FORMAT_CSV
+
+    return FORMAT_JSON_LINES
+
+
+def get_status_class(error_as_string):
+    # "404 ..." is a 4xx, connection errors (and anything else) are "other"
+    status = error_as_string[:3]
+    if status.isdigit() and status[0] in "45":
+        return "failed_%sxx" % status[0]
+
+    return "failed_other"
+
+
+def create_row(now, elapsed, seconds, current, last):
+    sent = current.messages - last.messages
+    failed = current.errors - last.errors
+
+    failed_by_class = {"failed_4xx": 0, "failed_5xx": 0, "failed_other": 0}
+    for key, num in current.unique_errors.items():
+        failed_by_class[get_status_class(key)] += num - last.unique_errors.get(key, 0)
+
+    response_times = current.response_times.get_difference(last.response_times)
+    if response_times.count > 0:
+        percentiles = response_times.get_percentiles()
+    else:
+        percentiles = [None] * len(histogram.PERCENTILES)
+
+    row = {
+        "time": now.isoformat(timespec="milliseconds"),
+        "elapsed": round(elapsed, 3),
+        "sent": sent,
+        "succeeded": sent - failed,
+        "failed": failed,
+        "throughput": int((sent - failed) / seconds) if seconds > 0 else 0,
+        "requests": current.requests - last.requests,
+        "min": response_times.min if response_times.count > 0 else None,
+        "max": response_times.max if response_times.count > 0 else None,
+    }
+    row.update(failed_by_class)
+    row.update(zip(["p50", "p90", "p99", "p99.9"], percentiles))
+
+    return {field: row[field] for field in FIELDS}
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+
+
+def latency(value):
+    # "20" or "10,50" (milliseconds) - returned as (min, max)
+    try:
+        numbers = [float(number) for number in value.split(",")]
+    except ValueError:
+        numbers = []
+
+    if len(numbers) == 1:
+        numbers.append(numbers[0])
+
+    if len(numbers) != 2 or numbers[0] < 0 or numbers[1] < numbers[0]:
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a latency like '20' or '10,50' (milliseconds)" % value
+        )
+
+    return numbers[0], numbers[1]
+
+
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(
+        prog="oscsim-mock",
+        description="Stand-in for Orion Context Broker/FROST-Server (incl. an MQTT "
+        "broker) to measure how fast oscsim itself can go.",
+        allow_abbrev=False,
+    )
+
+    parser.epilog = (
+        "Example: oscsim-mock --latency 5,20 --error-rate 1 in one console, "
+        "oscsim -s http://localhost:8080 -n 10 -l 60 -u in another one."
+    )
+
+    parser.add_argument(
+        "-b",
+        "--bind",
+        metavar="address",
+        dest="bind",
+        help="Define the address to listen on. [Default: 127.0.0.1]",
+        default="127.0.0.1",
+    )
+
+    parser.add_argument(
+        "-P",
+        "--port",
+        metavar="port",
+        dest="port",
+        help="Define the port of the HTTP-server (NGSI-V2, NGSI-LD and "
+        "SensorThings-HTTP). [Default: 8080]",
+        default=8080,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--mqtt-port",
+        metavar="port",
+        dest="mqtt_port",
+        help="Define the port of the MQTT-broker (SensorThings-MQTT, oscsim connects "
+        "to 1883). Use 0 to do without. [Default: 1883]",
+        default=1883,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--latency",
+        metavar="ms[,max-ms]",
+        dest="latency",
+        help="Delay every response by the given milliseconds - or by a random time "
+        "between both, if two are given. [Default: 0]",
+        default=(0.0, 0.0),
+        type=latency,
+    )
+
+    parser.add_argument(
+        "--error-rate",
+        metavar="percent",
+        dest="error_rate",
+        help="Let the given share of the requests fail - for batches, the share of "
+        "their entities (or Observations). [Default: 0]",
+        default=0.0,
+        type=float,
+    )
+
+    parser.add_argument(
+        "--error-status",
+        metavar="status",
+        dest="error_status",
+        help="Define the status of the failing requests. [Default: 500]",
+        default=500,
+        type=int,
+    )
+
+    args = parser.parse_args(args)
+
+    check_arguments(parser, args)
+
+    return args
+
+
+def check_arguments(parser, args):
+    if not 0 < args.port < 65536:
+        parser.error("Please define a valid port [0 < -P/--port < 65536]")
+
+    if not 0 <= args.mqtt_port < 65536:
+        parser.error("Please define a valid port [0 <= --mqtt-port < 65536]")
+
+    if not 0 <= args.error_rate <= 100:
+        parser.error("Please define a percentage for errors [0 <= --error-rate <= 100]")
+
+    if not 400 <= args.error_status < 600:
+        parser.error("Please define a status of an error [400 <= --error-status < 600]")
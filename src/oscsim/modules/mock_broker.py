@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import struct
+from socketserver import StreamRequestHandler, ThreadingMixIn, TCPServer
+from threading import Lock
+from time import sleep
+
+# some "consts"
+# the types of the MQTT (3.1.1) control packets
+CONNECT = 1
+PUBLISH = 3
+PUBREL = 6
+SUBSCRIBE = 8
+UNSUBSCRIBE = 10
+PINGREQ = 12
+DISCONNECT = 14
+
+
+class Server(ThreadingMixIn, TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+
+class Broker:
+    # Just enough of an MQTT broker for SensorThings-MQTT: the clients may connect,
+    # publish (with any QoS), subscribe and ping. The messages are counted only, they
+    # are not passed on to any subscriber. Acknowledgements are delayed like the
+    # responses of the HTTP mock (see mock_server.Mock.get_delay).
+    def __init__(self, get_delay):
+        self.get_delay = get_delay
+        self.lock = Lock()
+        self.connections = 0
+        self.messages = 0
+
+    def create_server(self, host, port):
+        return Server((host, port), create_handler(self))
+
+    def count_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def count_message(self):
+        with self.lock:
+            self.messages += 1
+
+    def get_stats(self):
+        # (connections, messages published)
+        with self.lock:
+            return self.connections, self.messages
+
+
+def read_packet(stream):
+    # returns (type, flags, body) or None if the client is gone
+    header = stream.read(1)
+    if len(header) == 0:
+        return None
+
+    # the remaining length is encoded in up to four bytes, 7 bits each
+    length = 0
+    for shift in range(0, 28, 7):
+        byte = stream.read(1)
+        if len(byte) == 0:
+            return None
+        length |= (byte[0] & 0x7F) << shift
+        if byte[0] & 0x80 == 0:
+            break
+
+    body = stream.read(length) if length > 0 else b""
+    if len(body) < length:
+        return None
+
+    return header[0] >> 4, header[0] & 0x0F, body
+
+
+def create_packet(packet_type, flags, body):
+    # all of the answers are shorter than 128 bytes
+    return bytes([(packet_type << 4) | flags, len(body)]) + body
+
+
+def create_handler(broker):
+    class Handler(StreamRequestHandler):
+        disable_nagle_algorithm = True
+
+        def handle(self):
+            broker.count_connection()
+
+            while True:
+                packet = read_packet(self.rfile)
+                if packet is None:
+                    return
+
+                packet_type, flags, body = packet
+                answer = None
+
+                if packet_type == CONNECT:
+                    # CONNACK: no session present, accepted
+                    answer = create_packet(2, 0, b"\x00\x00")
+                elif packet_type == PUBLISH:
+                    broker.count_message()
+                    qos = (flags >> 1) & 0x03
+                    if qos > 0:
+                        # the packet id follows the topic
+                        position = 2 + struct.unpack_from("!H", body)[0]
+                        packet_id = body[position:][0:2]
+                        # PUBACK (QoS 1) or PUBREC (QoS 2)
+                        answer = create_packet(4 if qos == 1 else 5, 0, packet_id)
+                elif packet_type == PUBREL:
+                    # PUBCOMP
+                    answer = create_packet(7, 0, body[0:2])
+                elif packet_type == SUBSCRIBE:
+                    # SUBACK: every topic is granted with QoS 0
+                    num_topics = 0
+                    position = 2
+                    while position < len(body):
+                        # the topic (with its length) and the requested QoS
+                        position += 2 + struct.unpack_from("!H", body, position)[0] + 1
+                        num_topics += 1
+                    answer = create_packet(9, 0, body[0:2] + b"\x00" * num_topics)
+                elif packet_type == UNSUBSCRIBE:
+                    # UNSUBACK
+                    answer = create_packet(11, 0, body[0:2])
+                elif packet_type == PINGREQ:
+                    # PINGRESP
+                    answer = create_packet(13, 0, b"")
+                elif packet_type == DISCONNECT:
+                    return
+
+                if answer is not None:
+                    delay = broker.get_delay()
+                    if delay > 0:
+                        sleep(delay)
+                    self.wfile.write(answer)
+
+    return Handler
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import random
+import re
+from http import HTTPStatus
+from threading import Event, Lock
+from urllib.parse import unquote
+
+from . import helper
+
+# some "consts"
+INJECTED = "Injected by oscsim-mock"
+V2_NOT_FOUND = {
+    "error": "NotFound",
+    "description": "The requested entity has not been found. Check type and id",
+}
+V2_ALREADY_EXISTS = {"error": "Unprocessable", "description": "Already Exists"}
+V2_INJECTED = {"error": "InternalServerError", "description": INJECTED}
+LD_ERRORS = "https://uri.etsi.org/ngsi-ld/errors/"
+# the clients open all their connections at once
+BACKLOG = 1024
+
+
+class Mock:
+    # A stand-in for Orion (NGSI-V2), an NGSI-LD broker and FROST, answering (just)
+    # the requests oscsim sends - see route for the endpoints. The entities, Things
+    # and Datastreams are kept by their ids only, the attributes and Observations are
+    # not kept at all. latency is (min, max) in milliseconds, error_rate the share of
+    # requests (or of the entities and Observations of a batch) that fail.
+    # All requests are answered within the event loop of the Server, so only the
+    # counters (read by the progress) need a lock.
+    def __init__(self, latency, error_rate, error_status):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.entities = set()
+        self.things = dict()
+        self.data_streams = dict()
+        self.next_id = 1
+        # what has been answered so far, see get_stats
+        self.lock = Lock()
+        self.requests = 0
+        self.statuses = dict()
+        self.injected = 0
+        self.observations = 0
+
+    def create_server(self, host, port):
+        return Server(self, host, port)
+
+    def get_delay(self):
+        # in seconds
+        if self.latency[1] > 0:
+            return random.uniform(self.latency[0], self.latency[1]) / 1000.0
+
+        return 0.0
+
+    def get_stats(self):
+        # (requests, by status, failures injected, Observations)
+        with self.lock:
+            return self.requests, dict(self.statuses), self.injected, self.observations
+
+    def is_failing(self):
+        if self.error_rate > 0 and random.random() * 100.0 < self.error_rate:
+            with self.lock:
+                self.injected += 1
+            return True
+
+        return False
+
+    def create_id(self):
+        new_id = self.next_id
+        self.next_id += 1
+        return new_id
+
+    def answer(self, method, target, body):
+        # returns the status and the body of the response (as bytes)
+        path, _, query = target.partition("?")
+
+        try:
+            status, content, num_observations = self.route(
+                method, unquote(path), unquote(query), body
+            )
+        except (ValueError, KeyError, TypeError, AttributeError):
+            status, content, num_observations = 400, None, 0
+
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.observations += num_observations
+
+        return status, json.dumps(content).encode("utf-8") if content else b""
+
+    def route(self, method, path, query, body):
+        # returns (status, body or None, number of Observations)
+        if path.startswith("/v2/"):
+            return self.route_ngsi_v2(method, path, query, body)
+        if path.startswith("/ngsi-ld/v1/"):
+            return self.route_ngsi_ld(method, path, query, body)
+        if path.startswith("/v1.1/"):
+            return self.route_sensor_things(method, path, query, body)
+
+        return 404, None, 0
+
+    def route_ngsi_v2(self, method, path, query, body):
+        match = re.match(r"^/v2/entities/([^/]+)(/attrs)?/?$", path)
+
+        if method == "POST" and re.match(r"^/v2/entities/?$", path):
+            if self.is_failing():
+                return self.error_status, V2_INJECTED, 0
+            entity_id = json.loads(body)["id"]
+            exists = entity_id in self.entities
+            if exists and "options=upsert" not in query:
+                return 422, V2_ALREADY_EXISTS, 0
+            self.entities.add(entity_id)
+            return 204 if exists else 201, None, 0
+
+        if method == "PATCH" and match is not None and match.group(2):
+            if self.is_failing():
+                return self.error_status, V2_INJECTED, 0
+            if match.group(1) not in self.entities:
+                return 404, V2_NOT_FOUND, 0
+            return 204, None, 0
+
+        if method == "DELETE" and match is not None and not match.group(2):
+            return self.delete_entity(match.group(1), V2_NOT_FOUND, V2_INJECTED)
+
+        if method == "POST" and re.match(r"^/v2/op/update/?$", path):
+            if self.is_failing():
+                return self.error_status, V2_INJECTED, 0
+            request = json.loads(body)
+            entity_ids = [entity["id"] for entity in request["entities"]]
+            # just like Orion, the batch fails as a whole if one is missing
+            if request["actionType"] == "update" and not self.entities.issuperset(
+                entity_ids
+            ):
+                return 404, V2_NOT_FOUND, 0
+            self.entities.update(entity_ids)
+            return 204, None, 0
+
+        return 404, None, 0
+
+    def route_ngsi_ld(self, method, path, query, body):
+        match = re.match(r"^/ngsi-ld/v1/entities/([^/]+)(/attrs)?/?$", path)
+        injected = create_ld_error("InternalError", INJECTED, self.error_status)
+        not_found = create_ld_error("ResourceNotFound", "Entity not found", 404)
+
+        if method == "POST" and re.match(r"^/ngsi-ld/v1/entities/?$", path):
+            if self.is_failing():
+                return self.error_status, injected, 0
+            entity_id = json.loads(body)["id"]
+            if entity_id in self.entities and "options=upsert" not in query:
+                return (
+                    409,
+                    create_ld_error("AlreadyExists", "Entity already exists", 409),
+                    0,
+                )
+            self.entities.add(entity_id)
+            return 201, None, 0
+
+        if method == "PATCH" and match is not None and match.group(2):
+            if self.is_failing():
+                return self.error_status, injected, 0
+            if match.group(1) not in self.entities:
+                return 404, not_found, 0
+            return 204, None, 0
+
+        if method == "DELETE" and match is not None and not match.group(2):
+            return self.delete_entity(match.group(1), not_found, injected)
+
+        match = re.match(r"^/ngsi-ld/v1/entityOperations/(\w+)/?$", path)
+        if method == "POST" and match is not None:
+            return self.do_entity_operation(match.group(1), json.loads(body))
+
+        return 404, None, 0
+
+    def do_entity_operation(self, action_type, entities):
+        # errors per entity are answered with "207 Multi-Status"
+        success = []
+        errors = []
+
+        for entity in entities:
+            entity_id = entity["id"]
+            exists = entity_id in self.entities
+
+            if self.is_failing():
+                error = create_ld_error("BadRequestData", INJECTED, 400)
+            elif action_type == "create" and exists:
+                error = create_ld_error("AlreadyExists", "Entity already exists", 409)
+            elif action_type == "update" and not exists:
+                error = create_ld_error("ResourceNotFound", "Entity not found", 404)
+            else:
+                self.entities.add(entity_id)
+                success.append(entity_id)
+                continue
+
+            errors.append({"entityId": entity_id, "error": error})
+
+        if len(errors) > 0:
+            return 207, {"success": success, "errors": errors}, 0
+        if action_type == "update":
+            return 204, None, 0
+
+        return 201, success, 0
+
+    def delete_entity(self, entity_id, not_found, injected):
+        if self.is_failing():
+            return self.error_status, injected, 0
+
+        if entity_id not in self.entities:
+            return 404, not_found, 0
+        self.entities.remove(entity_id)
+
+        return 204, None, 0
+
+    def route_sensor_things(self, method, path, query, body):
+        injected = {"code": self.error_status, "type": "error", "message": INJECTED}
+
+        if path == "/v1.1/Things":
+            if method == "GET":
+                return 200, create_query_result(query, self.things), 0
+            if method == "POST":
+                if self.is_failing():
+                    return self.error_status, injected, 0
+                self.things[json.loads(body)["name"]] = self.create_id()
+                return 201, None, 0
+
+        match = re.match(r"^/v1.1/Things\((\d+)\)(/Datastreams)?$", path)
+        if match is not None:
+            thing_id = int(match.group(1))
+            data_streams = self.data_streams.setdefault(thing_id, dict())
+            if match.group(2) and method == "GET":
+                return 200, create_query_result(query, data_streams), 0
+            if match.group(2) and method == "POST":
+                if self.is_failing():
+                    return self.error_status, injected, 0
+                data_streams[json.loads(body)["name"]] = self.create_id()
+                return 201, None, 0
+            if not match.group(2) and method == "DELETE":
+                if self.is_failing():
+                    return self.error_status, injected, 0
+                for name, value in list(self.things.items()):
+                    if value == thing_id:
+                        del self.things[name]
+                        return 200, None, 0
+                return 404, None, 0
+
+        if method != "POST":
+            return 404, None, 0
+
+        if re.match(r"^/v1.1/Datastreams\((\d+)\)/Observations$", path):
+            if self.is_failing():
+                return self.error_status, injected, 0
+            return 201, None, 1
+
+        if path == "/v1.1/CreateObservations":
+            # one self link (or "error...") per Observation
+            links = []
+            for data_array in json.loads(body):
+                for _ in data_array["dataArray"]:
+                    if self.is_failing():
+                        links.append("error " + INJECTED)
+                    else:
+                        links.append("v1.1/Observations(%i)" % self.create_id())
+            return 201, links, len(links)
+
+        if path == "/v1.1/$batch":
+            responses = []
+            for request in json.loads(body)["requests"]:
+                if self.is_failing():
+                    responses.append(
+                        {"id": request["id"], "status": 400, "body": injected}
+                    )
+                else:
+                    responses.append({"id": request["id"], "status": 201})
+            return 200, {"responses": responses}, len(responses)
+
+        return 404, None, 0
+
+
+class Server:
+    # A keep-alive HTTP/1.1 server with an event loop of its own, just enough for
+    # oscsim (see async_engine.Connection for the client side). It's run by a thread
+    # of its own, the interface is the one of socketserver.
+    def __init__(self, mock, host, port):
+        self.mock = mock
+        self.loop = asyncio.new_event_loop()
+        self.stopped = Event()
+        # fails right here, if the port is in use
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, host, port, backlog=BACKLOG)
+        )
+
+    def serve_forever(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.stopped.set()
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.stopped.wait()
+
+    def server_close(self):
+        self.server.close()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                length = 0
+                keep_alive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    key = key.strip().lower()
+                    if key == "content-length":
+                        length = int(value)
+                    elif key == "connection":
+                        keep_alive = value.strip().lower() != "close"
+
+                body = await reader.readexactly(length) if length > 0 else b""
+
+                delay = self.mock.get_delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                status, payload = self.mock.answer(method, target, body)
+                writer.write(create_response(status, payload))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def create_response(status, payload):
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = "Unknown"
+
+    lines = ["HTTP/1.1 %i %s" % (status, reason), "Content-Length: %i" % len(payload)]
+    if len(payload) > 0:
+        lines.append("%s: %s" % (helper.CONTENT_TYPE, helper.APPLICATION_JSON))
+
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+
+
+def create_ld_error(error_type, title, status):
+    return {"type": LD_ERRORS + error_type, "title": title, "status": status}
+
+
+def create_query_result(query, ids_by_name):
+    # answers "$select=name,id&$filter=name eq '...'" like FROST does
+    match = re.search(r"name eq '(.*)'", query)
+    if match is None or match.group(1) not in ids_by_name:
+        return {"value": []}
+
+    return {"value": [{"name": match.group(1), "@iot.id": ids_by_name[match.group(1)]}]}
@@ -1,37 +1,54 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import requests
+import json
 
-from . import helper
+from . import exchange, helper
 
 # some "consts"
 V2_ENTITIES = "/v2/entities/"
 LD_ENTITIES = "/ngsi-ld/v1/entities/"
+V2_OP_UPDATE = "/v2/op/update"
+LD_ENTITY_OPERATIONS = "/ngsi-ld/v1/entityOperations/"
+ACTION_APPEND = "append"
+ACTION_UPDATE = "update"
+ACTION_CREATE = "create"
+ACTION_UPSERT = "upsert"
+NOT_FOUND = "ResourceNotFound"
 OPTIONS_UPSERT = "?options=upsert"
 ATTRS = "/attrs/"
 TYPE_IS = "?type="
 
 
-def do_delete(session, host, ngsi_id, headers, args):
+def create_headers(args):
+    if args.protocol == helper.PROTOCOL_NGSI_V2:
+        headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
+    else:
+        headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON_LD}
+
+    if args.headers is not None:
+        headers.update(args.headers)
+
+    return headers
+
+
+def delete(host, ngsi_id, headers, args):
+    # flow (see exchange), returns the response
     if args.protocol == helper.PROTOCOL_NGSI_V2:
         url = host + V2_ENTITIES
     else:
         url = host + LD_ENTITIES
 
-    try:
-        url_delete = url + helper.create_id(
-            ngsi_id,
-            args.prefix,
-            args.postfix,
-            0,
-            args.protocol == helper.PROTOCOL_NGSI_LD,
-        )
-        return session.delete(url_delete, headers=headers)
-    except (requests.exceptions.RequestException, Exception):
-        return None
+    url_delete = url + helper.create_id(
+        ngsi_id,
+        args.prefix,
+        args.postfix,
+        0,
+        args.protocol == helper.PROTOCOL_NGSI_LD,
+    )
+    return (yield exchange.Request("DELETE", url_delete, headers=headers))
 
 
-def do_post(session, host, first_id, headers, upsert, args):
+def create_post_request(host, first_id, upsert, args):
     if args.protocol == helper.PROTOCOL_NGSI_V2:
         url = host + V2_ENTITIES
         if upsert:
@@ -43,15 +60,94 @@ def do_post(session, host, first_id, headers, upsert, args):
             url += OPTIONS_UPSERT
         payload = helper.create_payload_ngsi_ld(first_id, args, True)
 
-    try:
-        resp = session.post(url, data=payload, headers=headers)
-    except (requests.exceptions.RequestException, Exception):
-        return None, payload
+    return url, payload
+
+
+def post(host, first_id, headers, upsert, args, request=None):
+    # flow (see exchange), returns the response and the payload - the request may
+    # have been created ahead (see producer.Producer)
+    if request is None:
+        request = create_post_request(host, first_id, upsert, args)
+    url, payload = request
+
+    resp = yield exchange.Request("POST", url, payload, headers)
+    return resp, payload
+
 
+def create_batch_ids(first_id, num_entities, static_id):
+    if static_id:
+        return [first_id] * num_entities
+
+    return list(range(first_id, first_id + num_entities))
+
+
+def create_batch_request(host, first_ids, action_type, args):
+    if args.protocol == helper.PROTOCOL_NGSI_V2:
+        url = host + V2_OP_UPDATE
+        payload = helper.create_batch_payload_ngsi_v2(first_ids, action_type, args)
+    else:
+        # the action is part of the url, the payload is a plain array of entities
+        url = host + LD_ENTITY_OPERATIONS + action_type
+        payload = helper.create_batch_payload_ngsi_ld(first_ids, args)
+
+    return url, payload
+
+
+def batch(host, first_ids, headers, action_type, args, request=None):
+    # see post
+    if request is None:
+        request = create_batch_request(host, first_ids, action_type, args)
+    url, payload = request
+
+    resp = yield exchange.Request("POST", url, payload, headers)
     return resp, payload
 
 
-def do_patch(session, host, first_id, headers, args):
+def get_batch_errors(resp):
+    # NGSI-LD answers with "207 Multi-Status" and a BatchOperationResult if some of the
+    # entities failed: {"success": [...], "errors": [{"entityId": ..., "error": {...}}]}
+    try:
+        result = json.loads(resp.content)
+        batch_errors = []
+        for error in result["errors"]:
+            details = error["error"]
+            status = details.get("status", resp.status_code)
+            title = details.get("title", details.get("type", ""))
+            not_found = status == 404 or NOT_FOUND in str(details.get("type", ""))
+            batch_errors.append(
+                (error["entityId"], "%s %s" % (status, title), not_found)
+            )
+        return batch_errors
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def get_entity_errors(resp, num_entities):
+    # one error per failed entity of a batch, even if the batch failed as a whole
+    if resp is None:
+        return ["Connection Error"] * num_entities
+
+    if resp.status_code == 207:
+        batch_errors = get_batch_errors(resp)
+        if batch_errors is not None:
+            return [error for _, error, _ in batch_errors]
+    elif resp.status_code == 201 or resp.status_code == 204:
+        return []
+
+    return [helper.create_error_string(resp, 160)] * num_entities
+
+
+def get_missing_ids(first_ids, batch_errors, args):
+    missing = set(entity_id for entity_id, _, not_found in batch_errors if not_found)
+
+    return [
+        first_id
+        for first_id in first_ids
+        if helper.create_id(first_id, args.prefix, args.postfix, 0, True) in missing
+    ]
+
+
+def create_patch_request(host, first_id, args):
     if args.protocol == helper.PROTOCOL_NGSI_V2:
         url = (
             host
@@ -73,9 +169,113 @@ def do_patch(session, host, first_id, headers, args):
         )
         payload = helper.create_payload_ngsi_ld(None, args, False)
 
-    try:
-        resp = session.patch(url, data=payload, headers=headers)
-    except (requests.exceptions.RequestException, Exception):
-        return None, payload
+    return url, payload
+
+
+def patch(host, first_id, headers, args, request=None):
+    # see post
+    if request is None:
+        request = create_patch_request(host, first_id, args)
+    url, payload = request
 
+    resp = yield exchange.Request("PATCH", url, payload, headers)
     return resp, payload
+
+
+def send(host, first_id, args, request=None):
+    # Flow (see exchange) of a single message, returns (okay, resp, ms, payload).
+    # request: the first request, if created ahead (see producer.Producer)
+    headers = create_headers(args)
+
+    if args.insert_always:
+        resp, payload = yield from post(host, first_id, headers, True, args, request)
+        if resp is None:
+            return False, resp, 0, payload
+
+        ms = exchange.get_ms(resp)
+        return resp.status_code == 204 or resp.status_code == 201, resp, ms, payload
+
+    resp, payload = yield from patch(host, first_id, headers, args, request)
+    if resp is None:
+        return False, resp, 0, payload
+
+    ms = exchange.get_ms(resp)
+    if resp.status_code == 404:
+        # It would be very okay not to use "options=upsert" in this POST, but when
+        # running more than one thread, those POSTs will interfere each other!
+        # TODO: Orion-LD (currently) does not support upsert at all! As soon as
+        # this works, use upsert for NGSI-LD again
+        resp, payload = yield from post(
+            host,
+            first_id,
+            headers,
+            args.protocol == helper.PROTOCOL_NGSI_V2,
+            args,
+        )
+        if resp is None:
+            return False, resp, 0, payload
+        ms += exchange.get_ms(resp)
+
+    # At this point, the status code has to be either 204 (after PATCH) or 201 (after
+    # POST) in order to be "okay"
+    return resp.status_code == 204 or resp.status_code == 201, resp, ms, payload
+
+
+def send_batch_ngsi_ld(host, first_ids, headers, args, request=None):
+    action_type = ACTION_UPSERT if args.insert_always else ACTION_UPDATE
+    resp, payload = yield from batch(
+        host, first_ids, headers, action_type, args, request
+    )
+    if resp is None:
+        return False, resp, 0, payload, None
+
+    ms = exchange.get_ms(resp)
+    if resp.status_code not in [201, 204, 207]:
+        return False, resp, ms, payload, None
+
+    batch_errors = []
+    if resp.status_code == 207:
+        batch_errors = get_batch_errors(resp)
+        if batch_errors is None:
+            return False, resp, ms, payload, None
+
+    missing_ids = []
+    if action_type == ACTION_UPDATE:
+        missing_ids = get_missing_ids(first_ids, batch_errors, args)
+
+    if len(missing_ids) == 0:
+        return True, resp, ms, payload, [error for _, error, _ in batch_errors]
+
+    # the same as POST after PATCH returned 404: create the entities not existing yet
+    entity_errors = [error for _, error, not_found in batch_errors if not not_found]
+    resp, _ = yield from batch(host, missing_ids, headers, ACTION_CREATE, args)
+    ms += exchange.get_ms(resp)
+    entity_errors += get_entity_errors(resp, len(missing_ids))
+
+    return True, resp, ms, payload, entity_errors
+
+
+def send_batch(host, first_ids, args, request=None):
+    # Flow (see exchange) of a batch, returns (okay, resp, ms, payload, errors of
+    # the entities or None). request: see send
+    headers = create_headers(args)
+
+    if args.protocol == helper.PROTOCOL_NGSI_LD:
+        return (yield from send_batch_ngsi_ld(host, first_ids, headers, args, request))
+
+    action_type = ACTION_APPEND if args.insert_always else ACTION_UPDATE
+    resp, payload = yield from batch(
+        host, first_ids, headers, action_type, args, request
+    )
+    if resp is None:
+        return False, resp, 0, payload, None
+
+    ms = exchange.get_ms(resp)
+    if resp.status_code == 404 and action_type == ACTION_UPDATE:
+        # at least one of the entities is new, so append them all
+        resp, payload = yield from batch(host, first_ids, headers, ACTION_APPEND, args)
+        if resp is None:
+            return False, resp, 0, payload, None
+        ms += exchange.get_ms(resp)
+
+    return resp.status_code == 204, resp, ms, payload, None
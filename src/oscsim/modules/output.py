@@ -2,7 +2,13 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from . import helper
+from . import capacity, helper, sensor_things
+
+# some "consts"
+# with more workers, only those with the fewest and the most messages are shown
+MAX_WORKERS_SHOWN = 20
+# a rate-curve may have many stages, the first ones are enough to tell what it does
+MAX_STAGES_SHOWN = 5
 
 
 def print_version():
@@ -43,16 +49,43 @@ def print_time_spent(ms):
         print("Time spent: %i:%02i" % (minutes, ms / 1000), flush=True)
 
 
-def show_result(delete, start, errors, unique_errors):
+def show_result(
+    delete,
+    start,
+    errors,
+    unique_errors,
+    response_times,
+    connections,
+    workers=None,
+    stages=None,
+    search=None,
+    classes=None,
+):
     if errors > 0:
         print("\nErrors:", flush=True)
         for key in unique_errors.keys():
             print('%i time(s) "%s"' % (unique_errors[key], key))
 
+    if response_times is not None and response_times.count > 0:
+        print_response_times(response_times)
+
+    if search is not None:
+        print_search_result(search)
+    elif stages is not None and len(stages) > 0:
+        print_stages(stages)
+
+    if workers is not None and len(workers) > 1:
+        print_workers(workers, delete)
+
     end = datetime.now()
     delta = end - start
     ms = int(delta.total_seconds() * 1000)
 
+    if classes is not None:
+        print_classes(classes, ms)
+
+    print_connections(connections[0], connections[1])
+
     print_delimiter()
     print_time_spent(ms)
 
@@ -74,7 +107,36 @@ def print_type_of_server(protocol):
 
 
 def print_schema(args):
-    if args.protocol == helper.PROTOCOL_NGSI_V2:
+    if args.protocol == helper.PROTOCOL_NGSI_V2 and args.batch_size > 1:
+        print(
+            "Note: Batches of up to %i entities are sent via '/v2/op/update' (%s). "
+            "(Use --help to get more information)"
+            % (args.batch_size, "append" if args.insert_always else "update/append"),
+            flush=True,
+        )
+    elif args.protocol == helper.PROTOCOL_NGSI_LD and args.batch_size > 1:
+        print(
+            "Note: Batches of up to %i entities are sent via "
+            "'/ngsi-ld/v1/entityOperations/' (%s). "
+            "(Use --help to get more information)"
+            % (args.batch_size, "upsert" if args.insert_always else "update/create"),
+            flush=True,
+        )
+    elif args.protocol == helper.PROTOCOL_SENSOR_THINGS_HTTP and args.batch_size > 1:
+        print(
+            "Note: Batches of up to %i messages are sent via '%s'. "
+            "(Use --help to get more information)"
+            % (
+                args.batch_size,
+                (
+                    "$batch"
+                    if args.batch_type == helper.BATCH_JSON
+                    else "CreateObservations"
+                ),
+            ),
+            flush=True,
+        )
+    elif args.protocol == helper.PROTOCOL_NGSI_V2:
         if args.insert_always:
             print(
                 "Note: POST-always schema is used to store contexts. "
@@ -89,6 +151,36 @@ def print_schema(args):
             )
 
 
+def print_scenario(send_scenario):
+    classes = []
+    for entity in send_scenario.classes:
+        ids = [
+            helper.create_id(
+                first_id,
+                entity.args.prefix,
+                entity.args.postfix,
+                0,
+                entity.args.protocol == helper.PROTOCOL_NGSI_LD,
+            )
+            for first_id in [entity.first_id, entity.first_id + entity.num_ids - 1]
+        ]
+        classes.append(
+            '%s (%g%%, ids "%s" to "%s")'
+            % (
+                entity.name,
+                entity.weight * 100.0 / send_scenario.total_weight,
+                ids[0],
+                ids[1],
+            )
+        )
+
+    print(
+        "The messages are a mix of %i class(es): %s."
+        % (len(classes), ", ".join(classes)),
+        flush=True,
+    )
+
+
 def print_data_stream_id_used(datastream_id):
     print(
         "The Datastream-Id %i will be used for ALL Observations! "
@@ -159,23 +251,39 @@ def print_id_used(args, msg_num):
 
 
 def print_payload(args):
-    if args.protocol == helper.PROTOCOL_NGSI_V2:
+    if args.protocol == helper.PROTOCOL_NGSI_V2 and args.batch_size > 1:
+        print(
+            "The payload of a batch will look like:\n%s"
+            % helper.create_batch_payload_ngsi_v2(
+                [args.first_id, args.first_id + 1], "append", args
+            ).decode(),
+            flush=True,
+        )
+    elif args.protocol == helper.PROTOCOL_NGSI_LD and args.batch_size > 1:
+        print(
+            "The payload of a batch will look like:\n%s"
+            % helper.create_batch_payload_ngsi_ld(
+                [args.first_id, args.first_id + 1], args
+            ).decode(),
+            flush=True,
+        )
+    elif args.protocol == helper.PROTOCOL_NGSI_V2:
         if args.insert_always:
             print(
                 "The payload will look like:\n%s"
-                % helper.create_payload_ngsi_v2(args.first_id, True, args),
+                % helper.create_payload_ngsi_v2(args.first_id, True, args).decode(),
                 flush=True,
             )
         else:
             print(
                 "The payload will look like:\n%s"
-                % helper.create_payload_ngsi_v2(None, False, args),
+                % helper.create_payload_ngsi_v2(None, False, args).decode(),
                 flush=True,
             )
     elif args.protocol == helper.PROTOCOL_NGSI_LD:
         print(
             "The payload will look like:\n%s"
-            % helper.create_payload_ngsi_ld(args.first_id, args, True),
+            % helper.create_payload_ngsi_ld(args.first_id, args, True).decode(),
             flush=True,
         )
     else:
@@ -187,20 +295,35 @@ def print_payload(args):
             args.protocol == helper.PROTOCOL_NGSI_LD,
         )
 
+        if args.batch_size > 1:
+            observations = [(1, 1.5), (2, 2.5), (1, 3.5)]
+            if args.batch_type == helper.BATCH_JSON:
+                observation = helper.create_json_batch_payload(
+                    observations, args.indent
+                )
+            else:
+                observation = helper.create_data_array_payload(
+                    observations,
+                    sensor_things.group_observations(observations),
+                    args.indent,
+                )
+        else:
+            observation = helper.create_observation_payload(1.5, args.indent).decode()
+
         print(
             "The payload will look like:\nThing:\n%s\n\nDatastream: \n%s\n\nObservation: \n%s"
             % (
                 helper.create_thing_payload(thing_name, args.indent),
                 helper.create_data_stream_payload("AttributeName", args.indent),
-                helper.create_observation_payload(1.5, args.indent),
+                observation,
             ),
             flush=True,
         )
 
 
-def print_will_delete(args):
+def print_will_delete(args, workers, processes):
     print(
-        'Will delete %i contexts from "%s" to "%s".'
+        'Will delete %i contexts from "%s" to "%s" in %i thread(s)%s.'
         % (
             args.delete[1] - args.delete[0] + 1,
             helper.create_id(
@@ -217,6 +340,8 @@ def print_will_delete(args):
                 0,
                 args.protocol == helper.PROTOCOL_NGSI_LD,
             ),
+            workers,
+            "" if processes == 1 else " split across %i processes" % processes,
         ),
         flush=True,
     )
@@ -260,27 +385,286 @@ def print_frequency(frequency, more_than_one_thread):
         )
 
 
-def print_messages_send(overall_messages, errors, overall_time, ms, msg_num, unlimited):
+def print_rate(rate, arrival):
+    print(
+        "Messages will be sent at a rate of %s msg/sec (%s arrival) - response-times "
+        "are measured from the time a message was due." % ("%g" % rate, arrival),
+        flush=True,
+    )
+
+
+def print_profile(load_profile):
+    stages = [
+        load_profile.describe_stage(index) for index in range(len(load_profile.stages))
+    ]
+    if len(stages) > MAX_STAGES_SHOWN:
+        stages = stages[0:MAX_STAGES_SHOWN] + ["..."]
+
+    print(
+        "The load follows %i stage(s) within %g seconds: %s."
+        % (len(load_profile.stages), load_profile.duration, ", ".join(stages)),
+        flush=True,
+    )
+
+
+def print_search(args):
+    slo = ["errors <= %g%%" % args.slo_errors]
+    if args.slo_latency is not None:
+        slo.insert(0, "p%g <= %i ms" % args.slo_latency)
+
+    print(
+        "Will search the capacity from %g to %g msg/sec in steps of %g msg/sec every "
+        "%g seconds, until the SLO (%s, at least %i%% of the rate sent) is breached."
+        % (
+            args.search[0],
+            args.profile.stages[-1][2],
+            args.search[1],
+            args.step_duration,
+            ", ".join(slo),
+            int(capacity.MIN_THROUGHPUT * 100),
+        ),
+        flush=True,
+    )
+
+
+def print_response_times(response_times):
+    p50, p90, p99, p999 = response_times.get_percentiles()
+
+    print(
+        "\nResponse-times of %i successful message(s) [ms]: min: %i, p50: %i, p90: %i, "
+        "p99: %i, p99.9: %i, max: %i"
+        % (
+            response_times.count,
+            response_times.min,
+            p50,
+            p90,
+            p99,
+            p999,
+            response_times.max,
+        ),
+        flush=True,
+    )
+
+
+def print_workers(workers, delete):
+    # workers: see stats.Stats.get_summary
+    workers = sorted(workers, key=lambda worker: worker[1])
+    num_messages = [worker[1] for worker in workers]
+
+    print(
+        "\nMessages per worker: min: %i, avg: %i, max: %i"
+        % (
+            num_messages[0],
+            int(sum(num_messages) / len(num_messages)),
+            num_messages[-1],
+        ),
+        flush=True,
+    )
+
+    if delete:
+        print("%-16s %10s %10s %10s" % ("Worker", "deleted", "not found", "errors"))
+    else:
+        print(
+            "%-16s %10s %10s %10s %10s"
+            % ("Worker", "messages", "errors", "avg. [ms]", "p99 [ms]")
+        )
+
+    half = int(MAX_WORKERS_SHOWN / 2)
+    for index, worker in enumerate(workers):
+        if len(workers) > MAX_WORKERS_SHOWN and half <= index < len(workers) - half:
+            if index == half:
+                print("...")
+            continue
+
+        name, messages, errors, deleted, not_deleted, avg, p99 = worker
+        if delete:
+            print("%-16s %10i %10i %10i" % (name, deleted, not_deleted, errors))
+        else:
+            print(
+                "%-16s %10i %10i %10s %10i"
+                % (name, messages, errors, str(avg) if avg >= 0 else "--", p99)
+            )
+
+
+def print_classes(classes, ms):
+    # classes: the stats.Stats of each class of the scenario
+    total = sum(entity.messages for entity in classes)
+
+    print(
+        "\n%-16s %8s %10s %10s %10s %10s %10s %10s"
+        % (
+            "Class",
+            "share",
+            "messages",
+            "errors",
+            "msg/sec",
+            "avg. [ms]",
+            "p50 [ms]",
+            "p99 [ms]",
+        ),
+        flush=True,
+    )
+
+    for entity in classes:
+        net_messages = entity.messages - entity.errors
+        response_times = entity.response_times
+
+        print(
+            "%-16s %7.1f%% %10i %10i %10i %10s %10s %10s"
+            % (
+                entity.name,
+                entity.messages * 100.0 / total if total > 0 else 0,
+                entity.messages,
+                entity.errors,
+                entity.messages * 1000 / ms if ms > 0 else 0,
+                int(entity.time / net_messages) if net_messages > 0 else "--",
+                response_times.get_percentile(50.0) if response_times.count else "--",
+                response_times.get_percentile(99.0) if response_times.count else "--",
+            )
+        )
+
+
+def print_stages(stages):
+    # stages: see profile.create_result
+    print(
+        "\n%-32s %8s %10s %10s %10s %10s %10s"
+        % ("Stage", "seconds", "messages", "errors", "msg/sec", "p50 [ms]", "p99 [ms]"),
+        flush=True,
+    )
+
+    for _, name, seconds, messages, errors, throughput, response_times in stages:
+        print(
+            "%-32s %8i %10i %10i %10i %10s %10s"
+            % (
+                name,
+                int(seconds),
+                messages,
+                errors,
+                throughput,
+                response_times.get_percentile(50.0) if response_times.count else "--",
+                response_times.get_percentile(99.0) if response_times.count else "--",
+            )
+        )
+
+
+def print_search_result(search):
+    # see capacity.Search, the steps are results of profile.create_result
+    print(
+        "\n%10s %8s %10s %8s %10s %8s %8s %8s %8s %8s  %s"
+        % (
+            "rate",
+            "seconds",
+            "messages",
+            "errors",
+            "msg/sec",
+            "p50",
+            "p90",
+            "p99",
+            "p99.9",
+            "max",
+            "SLO",
+        ),
+        flush=True,
+    )
+
+    for result, breaches in search.steps:
+        index, _, seconds, messages, errors, throughput, response_times = result
+        rate = search.profile.stages[index][2]
+
+        if response_times.count > 0:
+            latencies = response_times.get_percentiles() + [response_times.max]
+        else:
+            latencies = ["--"] * 5
+
+        print(
+            "%10g %8i %10i %8i %10i %8s %8s %8s %8s %8s  %s"
+            % tuple(
+                [rate, int(seconds), messages, errors, throughput]
+                + latencies
+                + ["breached: " + ", ".join(breaches) if breaches else "met"]
+            )
+        )
+
+    knee = search.get_knee()
+    if knee is None:
+        print("\nNo step met the SLO.", flush=True)
+    else:
+        print(
+            "\nKnee: %i msg/sec (at a rate of %g msg/sec) meeting the SLO%s."
+            % (
+                knee[5],
+                search.profile.stages[knee[0]][2],
+                "" if search.breached else " - the SLO was never breached",
+            ),
+            flush=True,
+        )
+
+
+def print_connections(new_connections, reused_connections):
+    print(
+        "\nConnections: %i new, %i reused" % (new_connections, reused_connections),
+        flush=True,
+    )
+
+
+def print_messages_send(
+    overall_messages,
+    overall_requests,
+    errors,
+    overall_time,
+    response_times,
+    ms,
+    msg_num,
+    unlimited,
+    producer_stats=None,
+):
     net_messages = overall_messages - errors
     msg_per_second = 0
     response_time = -1
+    load = "0 msg/sec"
 
     if net_messages > 0:
         response_time = int(overall_time / net_messages)
 
+    if response_times.count > 0:
+        percentiles = "%i/%i/%i" % (
+            response_times.get_percentile(50.0),
+            response_times.get_percentile(99.0),
+            response_times.max,
+        )
+    else:
+        percentiles = "--"
+
     if ms > 0:
         msg_per_second = max(0, int(((overall_messages - errors) * 1000) / ms))
+        load = "%i msg/sec" % msg_per_second
+
+        # with batches, there are (a lot) less requests than messages
+        if overall_requests < overall_messages:
+            load += " (%i req/sec)" % int((overall_requests * 1000) / ms)
+
+        if producer_stats is not None:
+            # if the queue runs empty, the producers can't keep up with the senders
+            depth, size, produced, consumed, starved = producer_stats
+            load += ", queue: %i/%i, produced/taken: %i/%i msg/sec, empty: %i" % (
+                depth,
+                size,
+                int((produced * 1000) / ms),
+                int((consumed * 1000) / ms),
+                starved,
+            )
 
     if unlimited:
         # In this case, there is no percentage
         msg = (
             "\rMessages sent: %i with %i error(s), "
-            "avg. response-time: %s ms, load: %i msg/sec      "
+            "avg. response-time: %s ms, p50/p99/max: %s ms, load: %s      "
             % (
                 overall_messages,
                 errors,
                 str(response_time) if response_time >= 0 else "--",
-                msg_per_second,
+                percentiles,
+                load,
             )
         )
     else:
@@ -288,13 +672,14 @@ def print_messages_send(overall_messages, errors, overall_time, ms, msg_num, unl
         percentage = (overall_messages / msg_num) * 100
         msg = (
             "\rMessages sent: %i (%i%%) with %i error(s), "
-            "avg. response-time: %s ms, load: %i msg/sec      "
+            "avg. response-time: %s ms, p50/p99/max: %s ms, load: %s      "
             % (
                 overall_messages,
                 percentage,
                 errors,
                 str(response_time) if response_time >= 0 else "--",
-                msg_per_second,
+                percentiles,
+                load,
             )
         )
 
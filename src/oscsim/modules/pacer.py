@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+from threading import Lock
+from time import perf_counter
+
+# some "consts"
+ARRIVAL_FIXED = "fixed"
+ARRIVAL_POISSON = "poisson"
+# a rate curve is followed (and while it's at 0, the schedule is moved on) in steps
+# of (seconds)
+PAUSE = 0.1
+# how long (in seconds) a sender waits for its slot before it looks for a halt again
+WAIT_STEP = 0.1
+
+
+class Pacer:
+    # Hands out the intended send times of one global schedule (open loop).
+    # The schedule never waits for any response, so if the server slows down, the
+    # senders fall behind the schedule and this delay shows up in the response-times.
+    # Without catching up, the schedule is a cap only: a sender being late does not
+    # make up for the missed slots by sending faster afterwards.
+    # With a curve (a profile.Profile of rates), the rate follows the curve and rate
+    # is the share of it (of this process).
+    def __init__(self, rate, arrival, catch_up=True, curve=None):
+        self.rate = rate
+        self.poisson = arrival == ARRIVAL_POISSON
+        self.catch_up = catch_up
+        self.curve = curve
+        self.lock = Lock()
+        self.next_time = None
+
+    def next_slot(self):
+        with self.lock:
+            if self.next_time is None:
+                self.next_time = self.skip_pause(perf_counter())
+            elif not self.catch_up:
+                self.next_time = self.skip_pause(max(self.next_time, perf_counter()))
+
+            slot = self.next_time
+            # the gap in messages: a fixed one, or Poisson with one on average
+            gap = random.expovariate(1.0) if self.poisson else 1.0
+            self.next_time = self.advance(slot, gap)
+
+        return slot
+
+    def get_elapsed(self, slot):
+        # the time of the curve (which isn't perf_counter) at the slot
+        return self.curve.get_elapsed() + slot - perf_counter()
+
+    def skip_pause(self, slot):
+        # no slot at all while there are to be no messages (until the curve is over)
+        if self.curve is None:
+            return slot
+
+        elapsed = self.get_elapsed(slot)
+        while self.curve.get_value(elapsed) <= 0 and elapsed < self.curve.duration:
+            slot += PAUSE
+            elapsed += PAUSE
+
+        return slot
+
+    def advance(self, slot, gap):
+        # the time the given number of messages after the slot is due
+        if self.curve is None:
+            return slot + gap / self.rate
+
+        # The curve is read again at least every PAUSE (at the middle of each step),
+        # so the gap is the integral of the rate: on a ramp starting at 0, a tiny rate
+        # at the slot doesn't push the next one far into the future.
+        elapsed = self.get_elapsed(slot)
+        while elapsed < self.curve.duration:
+            rate = self.curve.get_value(elapsed + PAUSE / 2) * self.rate
+            if rate * PAUSE >= gap:
+                return slot + gap / rate
+            gap -= rate * PAUSE
+            slot += PAUSE
+            elapsed += PAUSE
+
+        # the curve is over, its last rate is kept (the run is about to end anyway)
+        rate = self.curve.get_value(elapsed) * self.rate
+        return slot + (gap / rate if rate > 0 else PAUSE)
+
+
+def get_delay(slot):
+    # seconds to wait until the slot is due (if not already late)
+    return max(0.0, slot - perf_counter())
+
+
+def get_ms_since(slot):
+    # the response-time is taken from the intended send time (not the actual one),
+    # which corrects for coordinated omission
+    return int((perf_counter() - slot) * 1000)
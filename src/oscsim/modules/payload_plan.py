@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import random
+from datetime import datetime
+
+from . import helper, json_template
+
+# some "consts" - the kinds of values an attribute can have
+CONSTANT = 0
+RANDOM_INT = 1
+RANDOM_FLOAT = 2
+RANDOM_BOOLEAN = 3
+RANDOM_LOCATION = 4
+DATE_TIME = 5
+
+
+class PayloadPlan:
+    # The attributes (-ad, -an, -as, -ab, -al) are parsed once after checking the
+    # arguments, so each message only has to fill in the values that change.
+    # Each attribute is a tuple of:
+    # (name, type for NGSI-V2, type for NGSI-LD, kind of value, parameters of value)
+    def __init__(self, args):
+        self.prefix = args.prefix
+        self.postfix = args.postfix
+        self.type = args.type
+        self.indent = args.indent
+        self.is_ngsi_ld = args.protocol == helper.PROTOCOL_NGSI_LD
+        self.attributes = []
+        # the attributes relevant for SensorThings (numbers and strings)
+        self.sensor_things_attributes = []
+
+        if args.date_times is not None:
+            for date_time in args.date_times:
+                self.attributes.append(
+                    (date_time[0], "DateTime", "DateTime", DATE_TIME, None)
+                )
+
+        if args.numbers is not None:
+            for number in args.numbers:
+                attribute = compile_number(number[0].split(","))
+                self.attributes.append(attribute)
+                self.sensor_things_attributes.append(attribute)
+
+        if args.strings is not None:
+            for string in args.strings:
+                attribute = (string[0], "Text", "Text", CONSTANT, string[1])
+                self.attributes.append(attribute)
+                self.sensor_things_attributes.append(attribute)
+
+        if args.booleans is not None:
+            for boolean in args.booleans:
+                if boolean[1] == "false":
+                    kind, value = CONSTANT, False
+                elif boolean[1] == "true":
+                    kind, value = CONSTANT, True
+                else:
+                    kind, value = RANDOM_BOOLEAN, None
+                self.attributes.append((boolean[0], "Boolean", "Boolean", kind, value))
+
+        if args.locations is not None:
+            for location in args.locations:
+                self.attributes.append(compile_location(location[0].split(",")))
+
+        # the attributes whose value changes from message to message
+        self.variable_attributes = [
+            (kind, parameters)
+            for _, _, _, kind, parameters in self.attributes
+            if kind != CONSTANT
+        ]
+        self.num_attribute_values = sum(
+            2 if kind == RANDOM_LOCATION else 1 for kind, _ in self.variable_attributes
+        )
+
+        # rendered on first use, by (kind of payload, ...)
+        self.templates = dict()
+        # a fixed value of the DateTime-attributes instead of the current time (see
+        # producer.Producer)
+        self.date_time = None
+
+    def get_template(self, key, create_payload, depth=0):
+        template = self.templates.get(key)
+        if template is None:
+            template = json_template.Template(create_payload(), self.indent, depth)
+            self.templates[key] = template
+        return template
+
+    def add_attributes(self, payload, ngsi_ld):
+        # the skeleton of the attributes, with markers for the values changing
+        for name, type_v2, type_ld, kind, parameters in self.attributes:
+            attr = {}
+
+            attribute_type = type_ld if ngsi_ld else type_v2
+            if attribute_type is not None:
+                attr["type"] = attribute_type
+
+            if kind == CONSTANT:
+                attr["value"] = parameters
+            elif kind == DATE_TIME:
+                attr["value"] = json_template.TEXT
+            elif kind == RANDOM_LOCATION:
+                attr["value"] = {
+                    "type": "Point",
+                    "coordinates": [json_template.VALUE, json_template.VALUE],
+                }
+            else:
+                attr["value"] = json_template.VALUE
+
+            payload[name] = attr
+
+    def create_attribute_values(self):
+        # the bytes of the markers of add_attributes, in the same order
+        values = []
+        date_time = None
+
+        for kind, parameters in self.variable_attributes:
+            if kind == DATE_TIME:
+                if date_time is None:
+                    date_time = (self.date_time or create_date_time()).encode("ascii")
+                values.append(date_time)
+            elif kind == RANDOM_LOCATION:
+                values.append(
+                    encode_float(random.uniform(parameters[0], parameters[1]))
+                )
+                values.append(
+                    encode_float(random.uniform(parameters[2], parameters[3]))
+                )
+            else:
+                values.append(
+                    json_template.encode_value(create_value(kind, parameters))
+                )
+
+        return values
+
+    def create_id(self, first_id):
+        return helper.create_id(first_id, self.prefix, self.postfix, 0, self.is_ngsi_ld)
+
+    def create_id_value(self, first_id):
+        return str(first_id).encode("ascii")
+
+    def create_entity_skeleton_ngsi_v2(self, with_id, meta_data):
+        payload = dict()
+
+        if meta_data:
+            if with_id:
+                payload["id"] = self.create_id(json_template.TEXT)
+            if self.type is not None:
+                payload["type"] = self.type
+
+        self.add_attributes(payload, False)
+
+        return payload
+
+    def create_entity_skeleton_ngsi_ld(self, with_id, is_post):
+        payload = dict()
+
+        if with_id:
+            payload["@context"] = {
+                "id": self.create_id(json_template.TEXT),
+                "type": self.type,
+            }
+        else:
+            payload["@context"] = {"type": self.type}
+
+        if is_post:
+            if with_id:
+                payload["id"] = self.create_id(json_template.TEXT)
+            payload["type"] = self.type
+
+        self.add_attributes(payload, True)
+
+        return payload
+
+    def render_entity(self, template, first_id):
+        # the id markers come first in both, NGSI-V2 and NGSI-LD
+        num_ids = template.num_values - self.num_attribute_values
+        values = [self.create_id_value(first_id)] * num_ids
+        values += self.create_attribute_values()
+
+        return template.render(values)
+
+    def create_payload_ngsi_v2(self, first_id, meta_data, depth=0):
+        with_id = first_id is not None
+        template = self.get_template(
+            ("v2", with_id, meta_data, depth),
+            lambda: self.create_entity_skeleton_ngsi_v2(with_id, meta_data),
+            depth,
+        )
+
+        return self.render_entity(template, first_id)
+
+    def create_payload_ngsi_ld(self, first_id, is_post, depth=0):
+        with_id = first_id is not None
+        template = self.get_template(
+            ("ld", with_id, is_post, depth),
+            lambda: self.create_entity_skeleton_ngsi_ld(with_id, is_post),
+            depth,
+        )
+
+        return self.render_entity(template, first_id)
+
+    def create_batch_payload_ngsi_v2(self, first_ids, action_type):
+        batch = self.get_template(
+            ("v2 batch", action_type),
+            lambda: {
+                "actionType": action_type,
+                "entities": [json_template.VALUE, json_template.VALUE],
+            },
+        )
+
+        # the entities are nested in the object's list
+        return batch.join(
+            self.create_payload_ngsi_v2(first_id, True, 2) for first_id in first_ids
+        )
+
+    def create_batch_payload_ngsi_ld(self, first_ids):
+        batch = self.get_template(
+            "ld batch", lambda: [json_template.VALUE, json_template.VALUE]
+        )
+
+        return batch.join(
+            self.create_payload_ngsi_ld(first_id, True, 1) for first_id in first_ids
+        )
+
+    def create_sensor_things_values(self):
+        # one (name of the Datastream, value) per attribute
+        return [
+            (name, create_value(kind, parameters))
+            for name, _, _, kind, parameters in self.sensor_things_attributes
+        ]
+
+
+def compile_number(attribute_args):
+    # type
+    if attribute_args[1] == "i" or attribute_args[1] == "f":
+        type_v2 = "Number"
+        type_ld = "Property"  # TODO: "Number" must be accepted!
+    else:
+        type_v2 = None
+        type_ld = None
+
+    # value
+    kind = CONSTANT
+    parameters = None
+    if attribute_args[1] == "i":
+        parameters = int(attribute_args[2])
+        if len(attribute_args) > 3:
+            kind = RANDOM_INT
+            parameters = (parameters, int(attribute_args[3]))
+    elif attribute_args[1] == "f":
+        parameters = float(attribute_args[2])
+        if len(attribute_args) > 3:
+            kind = RANDOM_FLOAT
+            parameters = (parameters, float(attribute_args[3]))
+
+    return attribute_args[0], type_v2, type_ld, kind, parameters
+
+
+def compile_location(attribute_args):
+    lat_from = float(attribute_args[1])
+    long_from = float(attribute_args[2])
+
+    if len(attribute_args) > 3:
+        kind = RANDOM_LOCATION
+        parameters = (
+            lat_from,
+            float(attribute_args[3]),
+            long_from,
+            float(attribute_args[4]),
+        )
+    else:
+        kind = CONSTANT
+        parameters = {"type": "Point", "coordinates": [lat_from, long_from]}
+
+    return attribute_args[0], "geo:json", "geo:json", kind, parameters
+
+
+def create_value(kind, parameters):
+    if kind == CONSTANT:
+        return parameters
+    elif kind == RANDOM_INT:
+        return random.randint(parameters[0], parameters[1])
+    elif kind == RANDOM_FLOAT:
+        return round(random.uniform(parameters[0], parameters[1]), 1)
+    elif kind == RANDOM_BOOLEAN:
+        return bool(random.getrandbits(1))
+    elif kind == RANDOM_LOCATION:
+        return {
+            "type": "Point",
+            "coordinates": [
+                random.uniform(parameters[0], parameters[1]),
+                random.uniform(parameters[2], parameters[3]),
+            ],
+        }
+    else:
+        return create_date_time()
+
+
+def encode_float(value):
+    return float.__repr__(value).encode("ascii")
+
+
+def create_date_time():
+    return datetime.now().strftime("%Y-%m-%dT%H:%M:%S.00Z")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+
+from . import helper, ngsi, payload_plan
+
+# some "consts"
+# how long (in seconds) to wait for the queue before checking for a halt again
+POLL_INTERVAL = 0.1
+# what the producers put in place of the DateTime-attributes (-ad), replaced by the
+# current time once a sender takes the request (see Producer.get)
+DATE_TIME_MARKER = b"0000-00-00T00:00:00.00Z"
+
+
+class Producer:
+    # Creates the requests (url and payload) of the senders ahead of time in threads
+    # of its own. The senders take them from a bounded queue and only send them.
+    # The chunks are the offsets (see run.create_offsets) per producer thread.
+    def __init__(self, args, chunks, queue_size, num_senders, is_halted):
+        self.queue = Queue(queue_size)
+        self.queue_size = queue_size
+        self.num_senders = num_senders
+        self.is_halted = is_halted
+        self.lock = Lock()
+        self.running = len(chunks)
+        # the number of messages (not batches) put into and taken from the queue
+        self.produced = 0
+        self.consumed = 0
+        # how often a sender found the queue empty and had to wait for a producer
+        self.starved = 0
+        # the DateTime-attributes would be outdated by the time the request is sent
+        self.has_date_time = args.date_times is not None
+        if self.has_date_time:
+            args = argparse.Namespace(**vars(args))
+            args.plan = payload_plan.PayloadPlan(args)
+            args.plan.date_time = DATE_TIME_MARKER.decode("ascii")
+        self.threads = [
+            Thread(target=self.produce, args=(args, offsets), daemon=True)
+            for offsets in chunks
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def produce(self, args, offsets):
+        try:
+            for item in create_requests(args, offsets):
+                if not self.put(item):
+                    return
+        finally:
+            with self.lock:
+                self.running -= 1
+                last = self.running == 0
+
+            # the last one tells every sender there's nothing left
+            if last:
+                for i in range(self.num_senders):
+                    if not self.put(None):
+                        return
+
+    def put(self, item):
+        while True:
+            if self.is_halted():
+                return False
+
+            try:
+                self.queue.put(item, timeout=POLL_INTERVAL)
+                break
+            except Full:
+                continue
+
+        if item is not None:
+            with self.lock:
+                self.produced += get_num_messages(item)
+
+        return True
+
+    def get(self):
+        # returns (first id(s), (url, payload)) or None if there's nothing left
+        try:
+            item = self.queue.get_nowait()
+        except Empty:
+            with self.lock:
+                self.starved += 1
+
+            while True:
+                if self.is_halted():
+                    return None
+
+                try:
+                    item = self.queue.get(timeout=POLL_INTERVAL)
+                    break
+                except Empty:
+                    continue
+
+        if item is None:
+            return None
+
+        with self.lock:
+            self.consumed += get_num_messages(item)
+
+        if self.has_date_time:
+            first_ids, (url, payload) = item
+            date_time = payload_plan.create_date_time().encode("ascii")
+            item = first_ids, (url, payload.replace(DATE_TIME_MARKER, date_time))
+
+        return item
+
+    def get_stats(self):
+        with self.lock:
+            return (
+                self.queue.qsize(),
+                self.queue_size,
+                self.produced,
+                self.consumed,
+                self.starved,
+            )
+
+
+def get_num_messages(item):
+    first_ids = item[0]
+    return len(first_ids) if isinstance(first_ids, list) else 1
+
+
+def create_requests(args, offsets):
+    # The same ids as the senders would create themselves (see run.do_send and
+    # run.do_send_batches), the threads' ranges are interleaved.
+    host = helper.create_host_url(args.server)
+    num_messages = 1000000000 if args.unlimited else args.num_messages
+
+    if args.batch_size > 1:
+        if args.protocol == helper.PROTOCOL_NGSI_LD:
+            action_type = (
+                ngsi.ACTION_UPSERT if args.insert_always else ngsi.ACTION_UPDATE
+            )
+        else:
+            action_type = (
+                ngsi.ACTION_APPEND if args.insert_always else ngsi.ACTION_UPDATE
+            )
+
+        for num_sent in range(0, num_messages, args.batch_size):
+            for offset in offsets:
+                first_id = args.first_id + offset
+                if not args.static_id:
+                    first_id += num_sent
+                first_ids = ngsi.create_batch_ids(
+                    first_id,
+                    min(args.batch_size, num_messages - num_sent),
+                    args.static_id,
+                )
+                yield first_ids, ngsi.create_batch_request(
+                    host, first_ids, action_type, args
+                )
+    else:
+        for i in range(num_messages):
+            for offset in offsets:
+                first_id = args.first_id + offset
+                if not args.static_id:
+                    first_id += i
+                if args.insert_always:
+                    yield first_id, ngsi.create_post_request(host, first_id, True, args)
+                else:
+                    yield first_id, ngsi.create_patch_request(host, first_id, args)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import csv
+from time import time
+
+from . import stats
+
+# some "consts"
+KIND_WORKERS = "workers"
+KIND_RATE = "msg/sec"
+DURATION_UNITS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+# how long (in seconds) a paused worker waits before it looks again
+PAUSE = 0.1
+
+
+class Profile:
+    # The load over time: every stage is (duration in seconds, value at its start,
+    # value at its end) and goes linearly from one to the other. The values are the
+    # number of active workers or the overall rate, see kind. The time is taken from
+    # the clock (not perf_counter): the processes are started after the parent's
+    # profile and keep its start, the agents are told how far it is (see
+    # remote.Agents.start) - so all of them follow one schedule.
+    def __init__(self, kind, stages):
+        self.kind = kind
+        self.stages = stages
+        self.duration = sum(duration for duration, _, _ in stages)
+        self.start_time = None
+
+    def start(self, elapsed=0.0):
+        self.start_time = time() - elapsed
+
+    def get_elapsed(self):
+        return time() - self.start_time
+
+    def get_stage(self, elapsed):
+        # the index of the stage at the given time (the last one, once it's over)
+        for index, (duration, _, _) in enumerate(self.stages):
+            if elapsed < duration:
+                return index
+            elapsed -= duration
+
+        return len(self.stages) - 1
+
+    def get_value(self, elapsed):
+        for duration, first, last in self.stages:
+            if elapsed < duration:
+                return first + (last - first) * elapsed / duration
+            elapsed -= duration
+
+        return self.stages[-1][2]
+
+    def get_maximum(self):
+        return max(max(first, last) for _, first, last in self.stages)
+
+    def describe_stage(self, index):
+        duration, first, last = self.stages[index]
+
+        if first == last:
+            return "%g %s for %g s" % (first, self.kind, duration)
+
+        return "%g -> %g %s in %g s" % (first, last, self.kind, duration)
+
+
+class Gate:
+    # Lets a worker (numbered across all processes) send as long as the profile wants
+    # at least as many workers as its number: ramping up, worker 10 starts as soon as
+    # there are to be 10 workers - and it pauses, once there are to be less again.
+    def __init__(self, profile, index):
+        self.profile = profile
+        self.index = index
+
+    def get_delay(self):
+        # 0 if the worker may send, otherwise how long to pause
+        if self.index < int(self.profile.get_value(self.profile.get_elapsed())):
+            return 0
+
+        return PAUSE
+
+
+class StageStats:
+    # What happened per stage: update is given the totals (see run.collect_stats) on
+    # every tick, they are kept whenever a stage is over - so a stage is as precise as
+    # the ticks.
+    def __init__(self, profile):
+        self.profile = profile
+        self.stage = 0
+        self.last_elapsed = 0.0
+        self.last_stats = stats.Stats()
+        self.results = []
+
+    def update(self, current, is_over=False):
+        elapsed = self.profile.get_elapsed()
+        stage = self.profile.get_stage(elapsed)
+
+        if stage == self.stage and not is_over:
+            return
+
+        self.results.append(
+            create_result(
+                self.stage,
+                self.profile.describe_stage(self.stage),
+                elapsed - self.last_elapsed,
+                current,
+                self.last_stats,
+            )
+        )
+
+        self.stage = stage
+        self.last_elapsed = elapsed
+        self.last_stats = current
+
+
+def create_result(index, name, seconds, current, last):
+    # (index, name, seconds, messages, errors, throughput, response-times)
+    messages = current.messages - last.messages
+    errors = current.errors - last.errors
+
+    return (
+        index,
+        name,
+        seconds,
+        messages,
+        errors,
+        int((messages - errors) / seconds) if seconds > 0 else 0,
+        current.response_times.get_difference(last.response_times),
+    )
+
+
+def duration(value):
+    # "90", "90s", "10m" or "2h" - returned in seconds
+    try:
+        if value[-1:] in DURATION_UNITS:
+            seconds = float(value[:-1]) * DURATION_UNITS[value[-1]]
+        else:
+            seconds = float(value)
+    except ValueError:
+        seconds = 0
+
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(
+            "'%s' is not a duration like '90s', '10m' or '2h'" % value
+        )
+
+    return seconds
+
+
+def stages(value):
+    # "60s:200,10m:200,60s:0" - every stage goes to its number of workers, starting
+    # from the one of the stage before (0 for the first one)
+    result = []
+    last = 0
+
+    for stage in value.split(","):
+        stage_duration, _, target = stage.partition(":")
+        try:
+            target = int(target)
+        except ValueError:
+            target = -1
+        if target < 0:
+            raise argparse.ArgumentTypeError(
+                "'%s' is not a stage like '60s:200' (duration:workers)" % stage
+            )
+
+        result.append((duration(stage_duration), last, target))
+        last = target
+
+    if max(target for _, _, target in result) == 0:
+        raise argparse.ArgumentTypeError(
+            "'%s' has no stage with any worker at all" % value
+        )
+
+    return Profile(KIND_WORKERS, result)
+
+
+def rate_curve(file_name):
+    # A CSV-file of "seconds,rate" (msg/sec), e.g. one row per hour of a day. The rate
+    # goes linearly from one row to the next, rows that aren't numbers are skipped.
+    points = []
+
+    try:
+        with open(file_name, newline="") as file:
+            for row in csv.reader(file):
+                try:
+                    points.append((float(row[0]), float(row[1])))
+                except (ValueError, IndexError):
+                    continue
+    except OSError as e:
+        raise argparse.ArgumentTypeError("can't read '%s': %s" % (file_name, e))
+
+    if len(points) < 2:
+        raise argparse.ArgumentTypeError(
+            "'%s' needs at least two rows of 'seconds,rate'" % file_name
+        )
+
+    result = []
+    last_seconds, last_rate = 0.0, points[0][1]
+
+    for seconds, rate in points:
+        if rate < 0 or seconds < last_seconds:
+            raise argparse.ArgumentTypeError(
+                "'%s' needs ascending seconds and rates >= 0 (row '%g,%g')"
+                % (file_name, seconds, rate)
+            )
+        if seconds > last_seconds:
+            result.append((seconds - last_seconds, last_rate, rate))
+        last_seconds, last_rate = seconds, rate
+
+    if len(result) == 0 or max(max(first, last) for _, first, last in result) == 0:
+        raise argparse.ArgumentTypeError(
+            "'%s' has no rate above 0 for any time" % file_name
+        )
+
+    return Profile(KIND_RATE, result)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import socket
+from threading import Lock, Thread
+
+from . import helper, histogram, payload_plan, profile, scenario, stats
+
+# some "consts"
+# the messages between controller and agent (one JSON-object per line)
+ASSIGN = "assign"
+READY = "ready"
+START = "start"
+STATS = "stats"
+HALT = "halt"
+ERROR = "error"
+# how long (in seconds) to wait for an agent to connect and to be ready
+TIMEOUT = 30.0
+# what the agents don't need (or get in a different way)
+LOCAL_ARGS = ["plan", "profile", "stages", "rate_curve", "agents", "scenario"]
+
+
+class Channel:
+    # One JSON-object per line over a TCP-connection, send may be called by more
+    # than one thread.
+    def __init__(self, connection):
+        self.connection = connection
+        self.file = connection.makefile("rb")
+        self.lock = Lock()
+
+    def send(self, message):
+        data = (json.dumps(message) + "\n").encode("utf-8")
+        with self.lock:
+            self.connection.sendall(data)
+
+    def receive(self):
+        # the next message or None, if the other side is gone
+        try:
+            line = self.file.readline()
+        except OSError:
+            return None
+
+        if not line:
+            return None
+
+        return json.loads(line.decode("utf-8"))
+
+    def receive_until(self, message_type):
+        # skips any other messages, returns None if the other side is gone
+        while True:
+            message = self.receive()
+            if message is None or message["type"] == message_type:
+                return message
+
+    def close(self):
+        self.file.close()
+        self.connection.close()
+
+
+class StatsSender:
+    # What run.report_process_stats puts into the queue of a process is sent to the
+    # controller instead (see Agents).
+    def __init__(self, channel):
+        self.channel = channel
+
+    def put(self, snapshot):
+        try:
+            self.channel.send(encode_snapshot(snapshot))
+        except OSError:
+            # the controller is gone, the workers are halted by the receiving thread
+            pass
+
+
+class Agents:
+    # The controller's side: every agent is assigned its part of the ids (and of the
+    # rate), they are all started at once and report their stats the same way as
+    # processes do (see run.report_process_stats). So this is a drop-in for the
+    # queue (see threads) and the halt-event (see set) of run.create_send_processes.
+    def __init__(self, addresses, queue):
+        self.addresses = addresses
+        self.queue = queue
+        self.channels = []
+        self.threads = []
+        self.halted = False
+        self.profile = None
+
+    def assign(self, args, max_id_length, chunks):
+        # connects to all agents and waits for them to be ready, raises OSError (incl.
+        # the error of an agent)
+        first_index = 0
+        self.profile = args.profile
+
+        for index, ((host, port), chunk) in enumerate(zip(self.addresses, chunks)):
+            connection = socket.create_connection((host, port), TIMEOUT)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            channel = Channel(connection)
+            self.channels.append(channel)
+
+            channel.send(
+                {
+                    "type": ASSIGN,
+                    "version": helper.get_version(),
+                    "args": encode_args(args, len(self.addresses)),
+                    "offsets": chunk,
+                    "first_index": first_index,
+                    "index": index,
+                    "max_id_length": max_id_length,
+                }
+            )
+            first_index += len(chunk)
+
+        for (host, port), channel in zip(self.addresses, self.channels):
+            message = channel.receive()
+            if message is None or message["type"] != READY:
+                raise OSError(
+                    "agent %s:%i: %s"
+                    % (host, port, message["message"] if message else "disconnected")
+                )
+            # from now on, a run may take its time
+            channel.connection.settimeout(None)
+
+            self.threads.append(
+                Thread(target=self.receive, args=(channel, "%s:%i" % (host, port)))
+            )
+
+    def start(self):
+        # as close together as possible, the profile (started by now) goes on from
+        # where it is on the controller
+        elapsed = self.profile.get_elapsed() if self.profile is not None else None
+        for channel in self.channels:
+            channel.send({"type": START, "elapsed": elapsed})
+
+    def receive(self, channel, name):
+        # until the agent is done (or gone)
+        while True:
+            message = channel.receive()
+            if message is None:
+                print("\nLost agent %s" % name, flush=True)
+                break
+            if message["type"] == STATS:
+                snapshot = decode_snapshot(message)
+                self.queue.put(snapshot)
+                if snapshot["workers"] is not None:
+                    break
+
+        channel.close()
+
+    def set(self):
+        # see run.collect_stats, all agents halt their workers
+        if self.halted:
+            return
+
+        self.halted = True
+        for channel in self.channels:
+            try:
+                channel.send({"type": HALT})
+            except OSError:
+                pass
+
+    def close(self):
+        for channel in self.channels:
+            channel.connection.close()
+
+
+def address(value):
+    # "host:port" or "port" (localhost) - returned as (host, port)
+    host, _, port = value.rpartition(":")
+
+    try:
+        port = int(port)
+    except ValueError:
+        port = 0
+
+    if not 0 < port < 65536:
+        raise argparse.ArgumentTypeError(
+            "'%s' is not an address like 'host:port'" % value
+        )
+
+    return host if host else "localhost", port
+
+
+def addresses(value):
+    # "host:port,host:port,..."
+    return [address(part) for part in value.split(",")]
+
+
+def encode_args(args, num_agents):
+    # the arguments as parsed by the controller, the rate is split across the agents
+    values = {key: value for key, value in vars(args).items() if key not in LOCAL_ARGS}
+
+    if values["rate"] is not None:
+        values["rate"] = args.rate / num_agents
+    if values["verbose_rate"] is not None:
+        values["verbose_rate"] = args.verbose_rate / num_agents
+
+    # the metrics are the controller's
+    values["metrics_file"] = None
+    values["metrics_port"] = None
+
+    if args.profile is not None:
+        # a rate-curve (or search) is split like the rate, stages are kept: the
+        # workers are numbered across all agents
+        share = 1.0 / num_agents if args.profile.kind == profile.KIND_RATE else 1.0
+        values["profile"] = [
+            args.profile.kind,
+            [
+                [duration, first * share, last * share]
+                for duration, first, last in args.profile.stages
+            ],
+        ]
+    else:
+        values["profile"] = None
+
+    # the classes as read from the file
+    if args.scenario is not None:
+        values["scenario"] = args.scenario.definition
+    else:
+        values["scenario"] = None
+
+    return values
+
+
+def decode_args(values):
+    args = argparse.Namespace(**values)
+
+    args.stages = None
+    args.rate_curve = None
+    args.agents = None
+    if values["profile"] is not None:
+        kind, stages = values["profile"]
+        args.profile = profile.Profile(kind, [tuple(stage) for stage in stages])
+
+    args.plan = payload_plan.PayloadPlan(args)
+    if values["scenario"] is not None:
+        args.scenario = scenario.Scenario(values["scenario"], args)
+
+    return args
+
+
+def encode_stats(worker):
+    response_times = worker.response_times
+
+    return {
+        "name": worker.name,
+        "messages": worker.messages,
+        "requests": worker.requests,
+        "errors": worker.errors,
+        "time": worker.time,
+        "deleted": worker.deleted,
+        "not_deleted": worker.not_deleted,
+        "unique_errors": worker.unique_errors,
+        # the counts are sparse, so just those being used
+        "counts": [
+            [index, num] for index, num in enumerate(response_times.counts) if num
+        ],
+        "count": response_times.count,
+        "sum": response_times.sum,
+        "min": response_times.min,
+        "max": response_times.max,
+    }
+
+
+def decode_stats(values):
+    worker = stats.Stats(values["name"])
+
+    worker.messages = values["messages"]
+    worker.requests = values["requests"]
+    worker.errors = values["errors"]
+    worker.time = values["time"]
+    worker.deleted = values["deleted"]
+    worker.not_deleted = values["not_deleted"]
+    worker.unique_errors = values["unique_errors"]
+
+    response_times = histogram.Histogram()
+    for index, num in values["counts"]:
+        response_times.counts[index] = num
+    response_times.count = values["count"]
+    response_times.sum = values["sum"]
+    response_times.min = values["min"]
+    response_times.max = values["max"]
+    worker.response_times = response_times
+
+    return worker
+
+
+def encode_snapshot(snapshot):
+    message = dict(snapshot)
+    message["type"] = STATS
+    message["stats"] = encode_stats(snapshot["stats"])
+    if snapshot["classes"] is not None:
+        message["classes"] = [encode_stats(entity) for entity in snapshot["classes"]]
+
+    return message
+
+
+def decode_snapshot(message):
+    snapshot = dict(message)
+    del snapshot["type"]
+    snapshot["stats"] = decode_stats(message["stats"])
+    if message["classes"] is not None:
+        snapshot["classes"] = [decode_stats(entity) for entity in message["classes"]]
+
+    return snapshot
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import json
+
+from . import payload_plan, stats
+
+# some "consts"
+# the keys of a class in the file - the attributes as the long options of the
+# command-line (a list of their values, or an object of name and value)
+ATTRIBUTES = {
+    "attribute-number": "numbers",
+    "attribute-string": "strings",
+    "attribute-date": "date_times",
+    "attribute-location": "locations",
+    "attribute-boolean": "booleans",
+}
+PAIRS = ["attribute-string", "attribute-boolean"]
+KEYS = ["name", "weight", "type", "prefix", "postfix", "first-id", "ids"] + list(
+    ATTRIBUTES.keys()
+)
+
+
+class EntityClass:
+    # One kind of entity of a scenario: its share of the messages (weight), its range
+    # of ids and its payload. The latter is a copy of the run's args with the type,
+    # prefix, postfix and attributes of the class (see create_args), so everything
+    # creating an id or a payload just takes these args instead of the run's.
+    def __init__(self, definition, args):
+        self.name = definition["name"]
+        self.weight = definition["weight"]
+        self.first_id = definition["first_id"]
+        self.num_ids = definition["ids"]
+        self.args = create_args(definition, args)
+        self.args.plan = payload_plan.PayloadPlan(self.args)
+
+
+class Scenario:
+    # The mix of entity classes sent by every worker (see Mix). The definition is
+    # kept as read from the file, so it can be passed on (see remote.encode_args).
+    def __init__(self, definition, args):
+        self.definition = definition
+        self.classes = [EntityClass(entity, args) for entity in definition]
+        self.total_weight = sum(entity.weight for entity in self.classes)
+
+    def get_max_id_length(self):
+        # see helper.calculate_max_id_length, the longest id of all classes
+        return max(
+            len(entity.args.prefix or "")
+            + len(str(entity.first_id + entity.num_ids - 1))
+            + len(entity.args.postfix or "")
+            for entity in self.classes
+        )
+
+
+class Mix:
+    # What a single worker sends: the classes are interleaved by their weights (smooth
+    # weighted round-robin, so the mix is exact even over a few messages) and every
+    # class cycles through the worker's part of its ids. The parts are split like the
+    # threads' ranges of ids (see run.split_offsets), so no two workers send the same
+    # ids - unless a class has less ids than there are workers.
+    def __init__(self, send_scenario, index, num_workers, static_id):
+        self.scenario = send_scenario
+        self.static_id = static_id
+        self.current_weights = [0] * len(send_scenario.classes)
+        self.ranges = []
+        self.positions = [0] * len(send_scenario.classes)
+        # the counters per class, see run.count_message
+        self.stats = [stats.Stats(entity.name) for entity in send_scenario.classes]
+
+        for entity in send_scenario.classes:
+            begin = entity.num_ids * index // num_workers
+            end = entity.num_ids * (index + 1) // num_workers
+            if begin == end:
+                begin = index % entity.num_ids
+                end = begin + 1
+            self.ranges.append((entity.first_id + begin, end - begin))
+
+    def take(self, num_entities):
+        # the next class: returns its args, the ids of its next entities and its stats
+        best = 0
+        for index, entity in enumerate(self.scenario.classes):
+            self.current_weights[index] += entity.weight
+            if self.current_weights[index] > self.current_weights[best]:
+                best = index
+        self.current_weights[best] -= self.scenario.total_weight
+
+        first_id, num_ids = self.ranges[best]
+        if self.static_id:
+            first_ids = [first_id] * num_entities
+        else:
+            position = self.positions[best]
+            first_ids = [
+                first_id + (position + i) % num_ids for i in range(num_entities)
+            ]
+            self.positions[best] = (position + num_entities) % num_ids
+
+        return self.scenario.classes[best].args, first_ids, self.stats[best]
+
+
+def create_args(definition, args):
+    # the run's args with those of the class
+    class_args = argparse.Namespace(**vars(args))
+
+    class_args.scenario = None
+    class_args.type = definition["type"]
+    class_args.prefix = definition["prefix"]
+    class_args.postfix = definition["postfix"]
+    class_args.first_id = definition["first_id"]
+    for dest in ATTRIBUTES.values():
+        setattr(class_args, dest, definition[dest])
+
+    return class_args
+
+
+def read_file(file_name):
+    # JSON - or YAML, if PyYAML is installed
+    with open(file_name, encoding="utf-8") as file:
+        if not file_name.lower().endswith((".yaml", ".yml")):
+            return json.load(file)
+
+        try:
+            import yaml
+        except ImportError:
+            raise argparse.ArgumentTypeError(
+                "'%s' needs PyYAML to be read (pip install pyyaml), or use JSON"
+                % file_name
+            )
+
+        try:
+            return yaml.safe_load(file)
+        except yaml.YAMLError as e:
+            raise ValueError(e)
+
+
+def check_class(entity, names):
+    # returns what's wrong with the class (or None)
+    if not isinstance(entity, dict):
+        return "a class has to be an object"
+
+    unknown = [key for key in entity.keys() if key not in KEYS]
+    if len(unknown) > 0:
+        return "unknown key(s) %s, valid are %s" % (
+            ", ".join(unknown),
+            ", ".join(KEYS),
+        )
+
+    if not isinstance(entity.get("name"), str) or entity["name"] in names:
+        return "every class needs a name of its own"
+
+    weight = entity.get("weight", 1)
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+        return "'weight' of class '%s' has to be a positive number" % entity["name"]
+
+    for key, minimum in [("ids", 1), ("first-id", 0)]:
+        value = entity.get(key, 1)
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            return "'%s' of class '%s' has to be an integer >= %i" % (
+                key,
+                entity["name"],
+                minimum,
+            )
+
+    for key in ["type", "prefix", "postfix"]:
+        if key in entity and not isinstance(entity[key], str):
+            return "'%s' of class '%s' has to be a string" % (key, entity["name"])
+
+    for key in ATTRIBUTES.keys():
+        value = entity.get(key, [] if key not in PAIRS else {})
+        if key in PAIRS and not isinstance(value, dict):
+            return "'%s' of class '%s' has to be an object of name and value" % (
+                key,
+                entity["name"],
+            )
+        if key not in PAIRS and (
+            not isinstance(value, list)
+            or not all(isinstance(item, str) for item in value)
+        ):
+            return "'%s' of class '%s' has to be a list of strings" % (
+                key,
+                entity["name"],
+            )
+
+    if not any(entity.get(key) for key in ATTRIBUTES.keys()):
+        return "class '%s' has no attributes at all" % entity["name"]
+
+    return None
+
+
+def scenario(file_name):
+    # A JSON- (or YAML-) file of {"classes": [...]}, see KEYS. Returned as the list of
+    # classes with the attributes as parsed from the command-line (see create_args),
+    # their payload is checked by arguments.check_payload.
+    try:
+        content = read_file(file_name)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError("can't read '%s': %s" % (file_name, e))
+
+    classes = content.get("classes") if isinstance(content, dict) else None
+    if not isinstance(classes, list) or len(classes) == 0:
+        raise argparse.ArgumentTypeError(
+            "'%s' needs a list of classes like {\"classes\": [...]}" % file_name
+        )
+
+    definition = []
+    for entity in classes:
+        error = check_class(entity, [item["name"] for item in definition])
+        if error is not None:
+            raise argparse.ArgumentTypeError("'%s': %s" % (file_name, error))
+
+        item = {
+            "name": entity["name"],
+            "weight": entity.get("weight", 1),
+            "first_id": entity.get("first-id", 1),
+            "ids": entity.get("ids", 1),
+            "type": entity.get("type"),
+            "prefix": entity.get("prefix"),
+            "postfix": entity.get("postfix"),
+        }
+        for key, dest in ATTRIBUTES.items():
+            if key in PAIRS:
+                values = [
+                    [
+                        name,
+                        str(value).lower() if isinstance(value, bool) else str(value),
+                    ]
+                    for name, value in entity.get(key, {}).items()
+                ]
+            else:
+                values = [[value] for value in entity.get(key, [])]
+            # like the command-line: None, if not given at all
+            item[dest] = values if len(values) > 0 else None
+        definition.append(item)
+
+    return definition
@@ -8,7 +8,7 @@ from time import sleep
 import paho.mqtt.client as mqtt  # type: ignore
 import requests
 
-from . import helper
+from . import exchange, helper
 
 # some "const" values
 INVALID_ID: int = -1
@@ -46,146 +46,410 @@ def init_mqtt(host):
     return mqtt_client
 
 
-def delete_thing(session, host, thing_id, args):
-    url = "%s/v1.1/Things(%i)" % (host, thing_id)
-
-    headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
+def create_headers(args, with_content_type):
+    if with_content_type:
+        headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
+    else:
+        headers = {}
 
     if args.headers is not None:
         headers.update(args.headers)
 
-    return session.delete(url, headers=headers)
+    return headers
 
 
-def create_thing(session, host, thing_name, args):
-    try:
-        url = "%s/v1.1/Things" % host
+def create_things_url(host):
+    return "%s/v1.1/Things" % host
 
-        headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
 
-        if args.headers is not None:
-            headers.update(args.headers)
+def create_thing_query_url(host, thing_name):
+    return "%s/v1.1/Things?$select=name,id&$filter=name eq '%s'" % (host, thing_name)
 
-        payload = helper.create_thing_payload(thing_name, args.indent)
 
-        resp = session.post(url, data=payload, headers=headers)
+def create_data_streams_url(host, thing_id):
+    return "%s/v1.1/Things(%i)/Datastreams" % (host, thing_id)
 
-        if resp.status_code == 201:
-            thing_id, ms2 = get_thing_id(session, host, thing_name, args)
 
-            return thing_id, resp
+def create_data_stream_query_url(host, thing_id, data_stream_name):
+    return "%s/v1.1/Things(%i)/Datastreams?$select=name,id&$filter=name eq '%s'" % (
+        host,
+        thing_id,
+        data_stream_name,
+    )
 
-    except (requests.exceptions.RequestException, Exception):
-        return INVALID_ID, None
 
-    return INVALID_ID, resp
+def create_observations_topic(data_stream_id):
+    return "v1.1/Datastreams(%i)/Observations" % data_stream_id
 
 
-def create_data_stream(session, host, thing_id, data_stream_name, args):
-    try:
-        url = "%s/v1.1/Things(%i)/Datastreams" % (host, thing_id)
+def create_observations_url(host, data_stream_id):
+    return "%s/%s" % (host, create_observations_topic(data_stream_id))
 
-        headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
 
-        if args.headers is not None:
-            headers.update(args.headers)
+def create_create_observations_url(host):
+    return "%s/v1.1/CreateObservations" % host
 
-        payload = helper.create_data_stream_payload(data_stream_name, args.indent)
 
-        resp = session.post(url, data=payload, headers=headers)
-        ms = int(resp.elapsed.total_seconds() * 1000)
+def create_json_batch_url(host):
+    return "%s/v1.1/$batch" % host
 
-        if resp.status_code == 201:
-            thing_id, ms2 = get_data_stream_id(
-                session, host, thing_id, data_stream_name, args
-            )
 
-            ms = int((ms + ms2) / 2)
-            return thing_id, ms
+def get_iot_id(content):
+    # the first match of a "$select=name,id"-query or INVALID_ID, if there is none
+    value = json.loads(content)["value"]
+
+    if len(value) > 0:
+        return value[0]["@iot.id"]
+
+    return INVALID_ID
+
+
+def publish_observation(mqtt_client, data_stream_id, payload):
+    mqtt_client.publish(create_observations_topic(data_stream_id), payload)
+    # simulate http response
+    resp = requests.Response()
+    resp.status_code = 201
+    return resp
+
+
+def delete_thing(host, thing_id, args):
+    # flow (see exchange), returns the response
+    url = "%s/v1.1/Things(%i)" % (host, thing_id)
 
-    except (requests.exceptions.RequestException, Exception):
+    return (yield exchange.Request("DELETE", url, headers=create_headers(args, True)))
+
+
+def create_thing(host, thing_name, args):
+    # flow (see exchange), returns the id of the new Thing and the response
+    payload = helper.create_thing_payload(thing_name, args.indent)
+
+    resp = yield exchange.Request(
+        "POST", create_things_url(host), payload, create_headers(args, True)
+    )
+    if resp is None:
+        return INVALID_ID, None
+
+    if resp.status_code == 201:
+        thing_id, _ = yield from get_thing_id(host, thing_name, args)
+
+        return thing_id, resp
+
+    return INVALID_ID, resp
+
+
+def create_data_stream(host, thing_id, data_stream_name, args):
+    # flow (see exchange), returns the id of the new Datastream and the time spent
+    payload = helper.create_data_stream_payload(data_stream_name, args.indent)
+
+    resp = yield exchange.Request(
+        "POST",
+        create_data_streams_url(host, thing_id),
+        payload,
+        create_headers(args, True),
+    )
+    if resp is None:
         return ERROR, 0
 
+    ms = exchange.get_ms(resp)
+    if resp.status_code == 201:
+        data_stream_id, ms2 = yield from get_data_stream_id(
+            host, thing_id, data_stream_name, args
+        )
+
+        return data_stream_id, int((ms + ms2) / 2)
+
     return INVALID_ID, ms
 
 
-def create_observation(
-    mqtt_client, session, host, use_mqtt, data_stream_id, value, args
-):
+def create_observation(host, use_mqtt, data_stream_id, value, args):
+    # flow (see exchange), returns the response
     payload = helper.create_observation_payload(value, args.indent)
 
     if use_mqtt:
-        topic = "v1.1/Datastreams(%i)/Observations" % data_stream_id
-        mqtt_client.publish(topic, payload)
-        # simulate http response
-        resp = requests.Response()
-        resp.status_code = 201
-        return resp
-    else:
-        try:
-            url = "%s/v1.1/Datastreams(%i)/Observations" % (host, data_stream_id)
+        return (yield exchange.Publish(data_stream_id, payload))
+
+    return (
+        yield exchange.Request(
+            "POST",
+            create_observations_url(host, data_stream_id),
+            payload,
+            create_headers(args, True),
+        )
+    )
 
-            headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
 
-            if args.headers is not None:
-                headers.update(args.headers)
+def group_observations(observations):
+    # the indices of the observations grouped by their Datastream (in order of appearance)
+    groups = dict()
 
-            return session.post(url, data=payload, headers=headers)
+    for index, (data_stream_id, _) in enumerate(observations):
+        if data_stream_id not in groups:
+            groups[data_stream_id] = []
+        groups[data_stream_id].append(index)
 
-        except (requests.exceptions.RequestException, Exception):
-            return None
+    return groups
 
 
-def get_thing_id(session, host, thing_name, args):
-    try:
-        url = "%s/v1.1/Things?$select=name,id&$filter=name eq '%s'" % (host, thing_name)
+def get_data_array_errors(resp, groups, num_observations):
+    # CreateObservations answers with one self link (or "error...") per observation, in
+    # the same order as they were sent within the dataArrays
+    links = json.loads(resp.content)
 
-        headers = {}
+    observation_errors = [None] * num_observations
+    position = 0
+    for indices in groups.values():
+        for index in indices:
+            link = links[position]
+            if link.startswith("error"):
+                observation_errors[index] = " ".join(link.split())[0:120]
+            position += 1
 
-        if args.headers is not None:
-            headers.update(args.headers)
+    return observation_errors
 
-        resp = session.get(url, headers=headers)
 
-        if resp.status_code == 200:
-            obj = json.loads(resp.text)
-            value = obj["value"]
+def get_json_batch_errors(resp, num_observations):
+    # $batch answers with one response per request, identified by its id
+    responses = json.loads(resp.content)["responses"]
 
-            if len(value) > 0:
-                return value[0]["@iot.id"], resp
-            else:
-                # not found
-                resp.status_code = 404
+    observation_errors = ["No response within batch"] * num_observations
+    for response in responses:
+        status = int(response.get("status", 0))
+        if 200 <= status < 300:
+            observation_errors[int(response["id"])] = None
         else:
-            return ERROR, resp
-    except (requests.exceptions.RequestException, Exception):
-        return ERROR, None
+            observation_errors[int(response["id"])] = (
+                str(status) + " " + " ".join(json.dumps(response.get("body")).split())
+            )[0:120]
 
-    return INVALID_ID, resp
+    return observation_errors
+
+
+def create_observations(host, observations, args):
+    # Flow (see exchange) sending all observations within one request. Returns the
+    # response and one error (or None) per observation - or None instead of the
+    # latter, if the request failed at all.
+    if args.batch_type == helper.BATCH_JSON:
+        url = create_json_batch_url(host)
+        payload = helper.create_json_batch_payload(observations, args.indent)
+        expected_status_code = 200
+    else:
+        groups = group_observations(observations)
+        url = create_create_observations_url(host)
+        payload = helper.create_data_array_payload(observations, groups, args.indent)
+        expected_status_code = 201
+
+    resp = yield exchange.Request("POST", url, payload, create_headers(args, True))
+    if resp is None:
+        return None, None
 
+    if resp.status_code != expected_status_code:
+        return resp, None
 
-def get_data_stream_id(session, host, thing_id, data_stream_name, args):
     try:
-        url = "%s/v1.1/Things(%i)/Datastreams?$select=name,id&$filter=name eq '%s'" % (
-            host,
-            thing_id,
-            data_stream_name,
-        )
+        if args.batch_type == helper.BATCH_JSON:
+            return resp, get_json_batch_errors(resp, len(observations))
+        else:
+            return resp, get_data_array_errors(resp, groups, len(observations))
+    except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+        return resp, None
+
+
+def get_thing_id(host, thing_name, args):
+    # Flow (see exchange), returns the id of the Thing (INVALID_ID, if there is none
+    # - with the status of the response set to 404, ERROR if the request failed) and
+    # the response.
+    resp = yield exchange.Request(
+        "GET",
+        create_thing_query_url(host, thing_name),
+        headers=create_headers(args, False),
+    )
+    if resp is None:
+        return ERROR, None
 
-        headers = {}
+    if resp.status_code != 200:
+        return ERROR, resp
 
-        if args.headers is not None:
-            headers.update(args.headers)
+    try:
+        thing_id = get_iot_id(resp.content)
+    except (ValueError, KeyError, TypeError, IndexError):
+        return ERROR, None
 
-        resp = session.get(url, headers=headers)
+    if thing_id == INVALID_ID:
+        # not found
+        resp.status_code = 404
 
-        if resp.status_code == 200:
-            obj = json.loads(resp.text)
-            value = obj["value"]
+    return thing_id, resp
 
-            if len(value) > 0:
-                return value[0]["@iot.id"], int(resp.elapsed.total_seconds() * 1000)
-    except (requests.exceptions.RequestException, Exception):
+
+def get_data_stream_id(host, thing_id, data_stream_name, args):
+    # flow (see exchange), returns the id of the Datastream (see get_thing_id) and the
+    # time spent
+    resp = yield exchange.Request(
+        "GET",
+        create_data_stream_query_url(host, thing_id, data_stream_name),
+        headers=create_headers(args, False),
+    )
+    if resp is None:
         return ERROR, 0
 
+    if resp.status_code == 200:
+        try:
+            data_stream_id = get_iot_id(resp.content)
+        except (ValueError, KeyError, TypeError, IndexError):
+            return ERROR, 0
+
+        if data_stream_id != INVALID_ID:
+            return data_stream_id, exchange.get_ms(resp)
+
     return INVALID_ID, 0
+
+
+def find_thing(host, first_id, args, cache):
+    # Flow (see exchange), returns the thing_id, the last response, the time spent and
+    # if it's okay at all. The Thing is created, if it doesn't exist yet - by a single
+    # sender, the others asking for the same one wait for it.
+    thing_name = helper.create_id(first_id, args.prefix, args.postfix, 0, False)
+
+    thing_id = cache.get_thing_id(thing_name)
+    if thing_id is not None:
+        return thing_id, None, 0, True
+
+    return (
+        yield exchange.Locked(
+            cache, ("thing", thing_name), search_thing(host, thing_name, args, cache)
+        )
+    )
+
+
+def search_thing(host, thing_name, args, cache):
+    # see find_thing, while holding the lock of the Thing
+    # some other sender may have found (or created) it in the meantime
+    thing_id = cache.get_thing_id(thing_name)
+    if thing_id is not None:
+        return thing_id, None, 0, True
+
+    ms = 0
+
+    #  check, if the thing with the given name (thing_name) already exists:
+    thing_id, resp = yield from get_thing_id(host, thing_name, args)
+    if resp is None:
+        return thing_id, resp, ms, False
+    elif resp.status_code == 404:
+        ms = exchange.get_ms(resp)
+        thing_id, resp = yield from create_thing(host, thing_name, args)
+        if resp is None or resp.status_code != 201:
+            return thing_id, resp, ms, False
+    elif resp.status_code != 200:
+        # neither 200 nor 404 - error!
+        return thing_id, resp, ms, False
+
+    if thing_id != INVALID_ID and thing_id != ERROR:
+        cache.put_thing_id(thing_name, thing_id)
+
+    return thing_id, resp, ms, True
+
+
+def find_data_stream(host, thing_id, data_stream_name, args, cache):
+    # flow (see exchange), returns the data_stream_id, the (averaged) time spent and if
+    # it's okay at all (see find_thing)
+    data_stream_id = cache.get_data_stream_id(thing_id, data_stream_name)
+    if data_stream_id is not None:
+        return data_stream_id, 0, True
+
+    return (
+        yield exchange.Locked(
+            cache,
+            ("datastream", thing_id, data_stream_name),
+            search_data_stream(host, thing_id, data_stream_name, args, cache),
+        )
+    )
+
+
+def search_data_stream(host, thing_id, data_stream_name, args, cache):
+    # see find_data_stream, while holding the lock of the Datastream
+    data_stream_id = cache.get_data_stream_id(thing_id, data_stream_name)
+    if data_stream_id is not None:
+        return data_stream_id, 0, True
+
+    data_stream_id, ms = yield from get_data_stream_id(
+        host, thing_id, data_stream_name, args
+    )
+
+    if data_stream_id == ERROR:
+        return data_stream_id, ms, False
+
+    if data_stream_id == INVALID_ID:
+        data_stream_id, ms2 = yield from create_data_stream(
+            host, thing_id, data_stream_name, args
+        )
+        ms = int((ms + ms2) / 2)
+        if data_stream_id == ERROR:
+            return INVALID_ID, ms, False
+        if data_stream_id == INVALID_ID:
+            # the Thing may be gone (if it was taken from the cache)
+            cache.remove_thing(thing_id)
+            return data_stream_id, ms, False
+
+    cache.put_data_stream_id(thing_id, data_stream_name, data_stream_id)
+
+    return data_stream_id, ms, True
+
+
+def send(host, first_id, thing_id, data_stream_id, args, cache, batching):
+    # Flow (see exchange) of a single message: finds (or creates) the Thing and its
+    # Datastreams and creates an Observation per value. Returns (thing_id,
+    # data_stream_id, okay, resp, ms, observations): the ids are those to start the
+    # next message with (INVALID_ID, if unknown), with batching the Observations are
+    # not sent but returned as (data_stream_id, value) instead.
+    resp = None
+    ms = 0
+    okay = True
+    observations = []
+    use_mqtt = args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT
+    # data_stream_id will not change if only ONE attribute is set!
+    num_attributes = get_sensor_things_relevant_attribute_count(args)
+
+    if args.datastream_id is not None:
+        thing_id = 0
+        data_stream_id = args.datastream_id
+    elif thing_id == INVALID_ID:
+        #  1. Get the Thing's id and create if not existing yet
+        thing_id, resp, ms, okay = yield from find_thing(host, first_id, args, cache)
+
+    if not okay or thing_id == INVALID_ID or thing_id == ERROR:
+        return thing_id, data_stream_id, okay, resp, ms, observations
+
+    for data_stream_name, value in args.plan.create_sensor_things_values():
+        # shortcut: if at this point data_stream_id != INVALID_ID, then we only have
+        # ONE attribute at all! So, no need to find out data_stream_id...create an
+        # Observation immediately instead
+        if args.datastream_id is None and data_stream_id == INVALID_ID:
+            #  2. Get the Datastream's id and create if not existing yet
+            data_stream_id, ms2, found = yield from find_data_stream(
+                host, thing_id, data_stream_name, args, cache
+            )
+            ms = int((ms + ms2) / 2)
+            okay = okay and found
+
+        #  3. Create an observation
+        if batching:
+            observations.append((data_stream_id, value))
+        else:
+            resp = yield from create_observation(
+                host, use_mqtt, data_stream_id, value, args
+            )
+
+            if resp is None:
+                okay = False
+            else:
+                ms = int((ms + exchange.get_ms(resp)) / 2)
+                if resp.status_code != 201:
+                    okay = False
+                if resp.status_code == 404 and args.datastream_id is None:
+                    # the cached Datastream is gone
+                    cache.remove_data_stream(thing_id, data_stream_name)
+
+        if num_attributes > 1:
+            data_stream_id = INVALID_ID
+
+    return thing_id, data_stream_id, okay, resp, ms, observations
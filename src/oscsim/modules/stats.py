@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from . import histogram
+
+
+class Stats:
+    # The counters of a single worker (a thread, or the thread running the async
+    # clients). Only the worker itself writes them, so there's no need for a lock: the
+    # progress merges the counters of all workers (see merge) from time to time.
+    def __init__(self, name=None):
+        self.name = name
+        self.messages = 0
+        self.requests = 0
+        self.errors = 0
+        self.time = 0
+        self.deleted = 0
+        self.not_deleted = 0
+        self.unique_errors = dict()
+        self.response_times = histogram.Histogram()
+
+    def add_unique_error(self, error_as_string, num):
+        if error_as_string in self.unique_errors:
+            self.unique_errors[error_as_string] += num
+        else:
+            self.unique_errors[error_as_string] = num
+
+    def merge(self, other):
+        self.messages += other.messages
+        self.requests += other.requests
+        self.errors += other.errors
+        self.time += other.time
+        self.deleted += other.deleted
+        self.not_deleted += other.not_deleted
+
+        # the copy is taken at once, even if the worker adds an error meanwhile
+        for key, num in dict(other.unique_errors).items():
+            self.unique_errors[key] = self.unique_errors.get(key, 0) + num
+
+        self.response_times.merge(other.response_times)
+
+    def get_summary(self):
+        # what the result shows per worker: (name, messages, errors, deleted, not
+        # deleted, avg. response-time, p99 response-time)
+        net_messages = self.messages - self.errors
+
+        return (
+            self.name,
+            self.messages,
+            self.errors,
+            self.deleted,
+            self.not_deleted,
+            int(self.time / net_messages) if net_messages > 0 else -1,
+            self.response_times.get_percentile(99.0),
+        )
+
+
+def merge(all_stats):
+    total = Stats()
+
+    for stats in all_stats:
+        total.merge(stats)
+
+    return total
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import sys
+from collections import deque
+from datetime import datetime
+from threading import Event, Lock, Thread
+
+# some "consts"
+HEADER_SEND = "ID, Response-Code, Response-Time, Content"
+HEADER_DELETE = "ID, Response-Code, Content"
+# how often (in seconds) the lines are written
+FLUSH_INTERVAL = 0.2
+# how many lines may wait to be written, if the console (or the file) can't keep up,
+# any more are dropped
+MAX_LINES = 10000
+
+
+class VerboseLog:
+    # The output of -v/--verbose. The workers just append their lines (see write),
+    # a thread of its own writes them all at once from time to time, so the workers
+    # never wait for the console (or the file). Which messages are shown at all is
+    # decided by accepts, before any line is formatted.
+    def __init__(self, file_name, every, errors_only, max_rate):
+        self.file_name = file_name
+        self.every = every
+        self.errors_only = errors_only
+        self.max_rate = max_rate
+        # appending to (and popping from) a deque is thread-safe
+        self.lines = deque(maxlen=MAX_LINES)
+        # the lines left out by max_rate and dropped (see MAX_LINES)
+        self.skipped = 0
+        self.dropped = 0
+        self.halt = Event()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.file = None
+        # a token bucket for max_rate, shared by all workers of this process
+        self.lock = Lock()
+        self.capacity = max(max_rate, 1.0) if max_rate is not None else 1.0
+        self.tokens = self.capacity
+        self.last_time = None
+
+    def start(self):
+        if self.file_name is not None:
+            # every process appends to the same file (see create_file)
+            self.file = open(self.file_name, "a")
+        else:
+            self.file = sys.stdout
+
+        self.last_time = datetime.now().timestamp()
+        self.thread.start()
+
+    def stop(self):
+        self.halt.set()
+        self.thread.join()
+        self.flush()
+
+        summary = self.get_summary()
+        if summary is not None:
+            self.file.write(summary + "\n")
+
+        if self.file_name is not None:
+            self.file.close()
+
+    def run(self):
+        while not self.halt.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        lines = []
+        try:
+            while True:
+                lines.append(self.lines.popleft())
+        except IndexError:
+            pass
+
+        if len(lines) > 0:
+            self.file.write("\n".join(lines) + "\n")
+            self.file.flush()
+
+    def accepts(self, num, is_error):
+        # num counts the messages of the worker (starting at 1)
+        if self.errors_only and not is_error:
+            return False
+
+        if (num - 1) % self.every != 0:
+            return False
+
+        if self.max_rate is None:
+            return True
+
+        with self.lock:
+            now = datetime.now().timestamp()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last_time) * self.max_rate
+            )
+            self.last_time = now
+
+            if self.tokens < 1.0:
+                self.skipped += 1
+                return False
+
+            self.tokens -= 1.0
+            return True
+
+    def write(self, line):
+        # the deque would drop the oldest line silently (if more than one worker gets
+        # here at once, it still does - but no more lines are kept than MAX_LINES)
+        if len(self.lines) >= MAX_LINES:
+            with self.lock:
+                self.dropped += 1
+            return
+
+        self.lines.append(line)
+
+    def get_summary(self):
+        if self.skipped == 0 and self.dropped == 0:
+            return None
+
+        return (
+            "Left out of the verbose output: %i line(s) by --verbose-rate, %i line(s) "
+            "as it couldn't keep up" % (self.skipped, self.dropped)
+        )
+
+
+def create_file(file_name, header):
+    # once per run, the processes append to the file only
+    with open(file_name, "w") as file:
+        file.write(header + "\n")
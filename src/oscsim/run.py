@@ -1,33 +1,80 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import multiprocessing
 import signal
 import sys
 from datetime import datetime
-from threading import Lock, Thread
-from time import sleep
-from typing import Dict
+from functools import partial
+from queue import Empty, Queue
+from threading import Event, Thread
+from time import perf_counter, sleep
 
 import requests
 
-from .modules import arguments, helper, ngsi, output, sensor_things
-
-# some globals
+from .modules import (
+    arguments,
+    async_engine,
+    capacity,
+    exchange,
+    exporter,
+    helper,
+    histogram,
+    id_cache,
+    metrics,
+    ngsi,
+    output,
+    pacer,
+    producer,
+    profile,
+    remote,
+    scenario,
+    sensor_things,
+    stats,
+    verbose_log,
+)
+
+# some globals (the totals of all workers, see collect_stats)
 start = datetime.now()
 errors = 0
-unique_errors = dict()  # type: Dict[str, int]
+unique_errors = dict()  # the number of every error (by its text)
 overall_messages = 0
 overall_time = 0
+overall_requests = 0
+response_times = histogram.Histogram()
 deleted = 0
 not_deleted = 0
+# all of the above as one stats.Stats, merged once per tick and shared by the metrics,
+# the stages and the snapshots sent to the parent (or controller)
+total_stats = stats.Stats()
+# one stats.Stats per worker of this process
+worker_stats = []
+# the counters per class of the scenario (see scenario.Mix), if any
+mixes = []
+# the workers of all processes, for the result
+worker_summaries = []
 send_threads = []
-delete_thread = Thread()
+sessions = []
+delete_threads = []
+# the ids of Things and Datastreams (SensorThings only) found so far
+cache = id_cache.IdCache(None)
+request_producer = None
+metrics_writer = None
+metrics_exporter = None
+verbose_output = None
+stage_stats = None
+capacity_search = None
 halt = False
+# only used with more than one process (see --processes)
+halt_event = None
+stats_queue = None
+process_stats = dict()  # the last snapshot of every process (by its index)
+process_connections = (0, 0)
+process_producer_stats = None
+# the controller's side of the agents (see --agents)
+remote_agents = None
 
 
-def do_delete(session, lock, args, max_id_length):
-    global errors, deleted, not_deleted, overall_messages
-    delimiter = ""
-
+def do_delete(session, log, worker, args, max_id_length, first, last, rate_pacer):
     host = helper.create_host_url(args.server)
 
     headers = {}
@@ -35,103 +82,189 @@ def do_delete(session, lock, args, max_id_length):
     if args.headers is not None:
         headers.update(args.headers)
 
-    for i in range(args.delete[0], args.delete[1] + 1):
+    for i in range(first, last + 1):
+        if rate_pacer is not None:
+            wait_for_slot(rate_pacer)
+
         if halt:
             return
         connection_error = False
+        is_deleted = False
+        is_not_found = False
 
         if (
             args.protocol == helper.PROTOCOL_NGSI_V2
             or args.protocol == helper.PROTOCOL_NGSI_LD
         ):
-            resp = ngsi.do_delete(session, host, i, headers, args)
+            resp = perform(session, ngsi.delete(host, i, headers, args))
             if resp is None:
                 connection_error = True
             else:
-                if resp.status_code == 204:
-                    deleted += 1
-                elif resp.status_code == 404:
-                    not_deleted += 1
-                else:
-                    errors += 1
+                is_deleted = resp.status_code == 204
+                is_not_found = resp.status_code == 404
         else:
             thing_name = helper.create_id(i, args.prefix, args.postfix, 0, False)
-            thing_id, ms = sensor_things.get_thing_id(session, host, thing_name, args)
+            thing_id, resp = perform(
+                session, sensor_things.get_thing_id(host, thing_name, args)
+            )
             if thing_id == sensor_things.INVALID_ID:
-                not_deleted += 1
-                resp = requests.Response()
-                resp.status_code = 404
-            else:
-                resp = sensor_things.delete_thing(session, host, thing_id, args)
-                if resp.status_code == 200:
-                    deleted += 1
-                else:
-                    errors += 1
-
-        with lock:
-            if resp is None:
-                errors += 1
-                error_as_string = "Connection Error"
-                if error_as_string in unique_errors.keys():
-                    num = unique_errors[error_as_string]
-                    unique_errors[error_as_string] = num + 1
-                else:
-                    unique_errors[error_as_string] = 1
-            else:
-                error_as_string = (
-                    str(resp.status_code) + " " + " ".join(resp.text.split())[0:120]
+                is_not_found = True
+            elif thing_id != sensor_things.ERROR:
+                resp = perform(
+                    session, sensor_things.delete_thing(host, thing_id, args)
                 )
+                is_deleted = resp is not None and resp.status_code == 200
+                if is_deleted:
+                    cache.remove_thing(thing_id)
+            connection_error = resp is None
+
+        if is_deleted:
+            worker.deleted += 1
+        elif is_not_found:
+            worker.not_deleted += 1
+        else:
+            worker.errors += 1
+            worker.add_unique_error(helper.create_error_string(resp, 120), 1)
 
-                if error_as_string in unique_errors.keys():
-                    num = unique_errors[error_as_string]
-                    unique_errors[error_as_string] = num + 1
-                else:
-                    unique_errors[error_as_string] = 1
-
-            overall_messages += 1
-
-            if args.verbose:
-                if connection_error:
-                    print(
-                        "%s%s  ??? %s"
-                        % (
-                            delimiter,
-                            helper.create_id(
-                                i,
-                                args.prefix,
-                                args.postfix,
-                                max_id_length,
-                                args.protocol == helper.PROTOCOL_NGSI_LD,
-                            ),
-                            error_as_string,
-                        ),
-                        end="",
+        worker.messages += 1
+
+        if log is not None and log.accepts(
+            worker.messages, not is_deleted and not is_not_found
+        ):
+            if connection_error:
+                log.write(
+                    "%s  ??? Connection Error"
+                    % helper.create_id(
+                        i,
+                        args.prefix,
+                        args.postfix,
+                        max_id_length,
+                        args.protocol == helper.PROTOCOL_NGSI_LD,
                     )
-                else:
-                    print(
-                        "%s%s  %3i %s"
-                        % (
-                            delimiter,
-                            helper.create_id(
-                                i,
-                                args.prefix,
-                                args.postfix,
-                                max_id_length,
-                                args.protocol == helper.PROTOCOL_NGSI_LD,
-                            ),
-                            resp.status_code,
-                            " ".join(resp.text.split())[0:120],
+                )
+            else:
+                log.write(
+                    "%s  %3i %s"
+                    % (
+                        helper.create_id(
+                            i,
+                            args.prefix,
+                            args.postfix,
+                            max_id_length,
+                            args.protocol == helper.PROTOCOL_NGSI_LD,
                         ),
-                        end="",
+                        resp.status_code,
+                        helper.get_response_text(resp, 120),
                     )
-                delimiter = "\n"
+                )
 
 
-def do_send(mqtt_client, session, lock, args, offset, max_id_length):
-    global errors, unique_errors, overall_time, overall_messages
+def count_message(
+    worker,
+    log,
+    args,
+    okay,
+    resp,
+    ms,
+    first_id,
+    payload,
+    max_id_length,
+    num_messages,
+    batch_errors=None,
+    class_stats=None,
+):
+    # num_messages is more than 1 for batches. Those fail either as a whole (okay is
+    # False) or only for some of their entities (one entry per entity in batch_errors).
+    # With a scenario, the message counts for its class (class_stats) as well.
+    if (
+        args.protocol == helper.PROTOCOL_NGSI_V2
+        or args.protocol == helper.PROTOCOL_NGSI_LD
+    ):
+        error_length = 160
+    else:
+        error_length = 120
+
+    if not okay:
+        num_errors = num_messages
+        unique_errors_found = [
+            (helper.create_error_string(resp, error_length), num_messages)
+        ]
+    elif batch_errors:
+        num_errors = len(batch_errors)
+        unique_errors_found = [(error_as_string, 1) for error_as_string in batch_errors]
+    else:
+        num_errors = 0
+        unique_errors_found = []
+
+    for counter in [worker] if class_stats is None else [worker, class_stats]:
+        counter.messages += num_messages
+        counter.requests += 1
+        counter.errors += num_errors
+        counter.time += ms * num_messages
+
+        for error_as_string, num in unique_errors_found:
+            counter.add_unique_error(error_as_string, num)
+
+        if num_messages > num_errors:
+            counter.response_times.record(ms, num_messages - num_errors)
+
+    if log is not None and log.accepts(worker.requests, num_errors > 0):
+        if resp is None:
+            log.write(
+                "%s  ???  ---- Connection Error!"
+                % helper.create_id(
+                    first_id,
+                    args.prefix,
+                    args.postfix,
+                    max_id_length,
+                    args.protocol == helper.PROTOCOL_NGSI_LD,
+                )
+            )
+        else:
+            message = helper.get_response_text(resp, 120)
+            # There is this funny thing that Orion sometimes tells
+            # us about 400 ParseError
+            # see https://github.com/telefonicaid/fiware-orion/issues/3731
+            if resp.status_code == 400 and payload is not None:
+                message += "\nPayload was:\n" + payload.decode()
+
+                # In 100%, resending exactly the same payload again gives a 201
+
+            log.write(
+                "%s  %3i  %4i %s"
+                % (
+                    helper.create_id(
+                        first_id,
+                        args.prefix,
+                        args.postfix,
+                        max_id_length,
+                        args.protocol == helper.PROTOCOL_NGSI_LD,
+                    ),
+                    resp.status_code,
+                    ms,
+                    message,
+                )
+            )
+
 
+def do_send(
+    mqtt_client,
+    session,
+    log,
+    worker,
+    args,
+    offset,
+    max_id_length,
+    rate_pacer,
+    request_producer=None,
+    gate=None,
+    mix=None,
+):
     first_id = args.first_id + offset
     host = helper.create_host_url(args.server)
+    # the args of the class of the current message (see scenario.Mix)
+    message_args = args
+    class_stats = None
 
     # We'll start with unknown Thing/Datastream...let's see, if we can cache them later
     # thing_id will not change if --static-id is set!
@@ -143,360 +276,336 @@ def do_send(mqtt_client, session, lock, args, offset, max_id_length):
         # there is no infinite mode :-) - but don't send more than one billion messages!
         args.num_messages = 1000000000
 
-    # how many attributes (relevant for SensorThings) do we have at all?
-    num_attributes = sensor_things.get_sensor_things_relevant_attribute_count(args)
+    # SensorThings-HTTP batches: the observations are collected per message and sent
+    # as soon as the batch is full (or the oldest message waits for too long)
+    batching = args.batch_size > 1
+    pending = PendingObservations(session, log, worker, args, host, max_id_length)
+    slot = None
+
+    # with a producer, the senders share its requests until there are none left
+    num_messages = args.num_messages if request_producer is None else 1000000000
+
+    for i in range(num_messages):
+        wait_for_turn(gate, pending.sleep)
+
+        if rate_pacer is not None:
+            slot = wait_for_slot(rate_pacer, pending.sleep)
 
-    for i in range(args.num_messages):
         start_time_ms = datetime.now()
 
         if halt:
-            return
+            # the pending batch is still sent (see below)
+            break
 
         if (
             args.protocol == helper.PROTOCOL_NGSI_V2
             or args.protocol == helper.PROTOCOL_NGSI_LD
         ):
-            if args.protocol == helper.PROTOCOL_NGSI_V2:
-                headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON}
-            else:
-                headers = {helper.CONTENT_TYPE: helper.APPLICATION_JSON_LD}
-
-            if args.headers is not None:
-                headers.update(args.headers)
+            request = None
+            if request_producer is not None:
+                item = request_producer.get()
+                if item is None:
+                    return
+                first_id, request = item
+            elif mix is not None:
+                message_args, first_ids, class_stats = mix.take(1)
+                first_id = first_ids[0]
+
+            okay, resp, ms, payload = perform(
+                session, ngsi.send(host, first_id, message_args, request)
+            )
 
-            if args.insert_always:
-                resp, payload = ngsi.do_post(
-                    session, host, first_id, headers, True, args
-                )
-                if resp is None:
-                    ms = 0
-                    okay = False
-                else:
-                    ms = int(resp.elapsed.total_seconds() * 1000)
-                    okay = resp.status_code == 204 or resp.status_code == 201
-            else:
-                resp, payload = ngsi.do_patch(session, host, first_id, headers, args)
-                if resp is None:
-                    ms = 0
-                    okay = False
-                else:
-                    ms = int(resp.elapsed.total_seconds() * 1000)
-                    if resp.status_code == 404:
-                        # It would be very okay not to use "options=upsert" in this POST, but when
-                        # running more than one thread, those POSTs will interfere each other!
-                        # The 5th parameter is True in order to use "options=upsert"
-                        # TODO: Orion-LD (currently) does not support upsert at all! As soon as
-                        # this works, set 5th parameter to True again
-                        resp, payload = ngsi.do_post(
-                            session,
-                            host,
-                            first_id,
-                            headers,
-                            args.protocol == helper.PROTOCOL_NGSI_V2,
-                            args,
-                        )
-                        if resp is None:
-                            ms = 0
-                        else:
-                            ms += int(resp.elapsed.total_seconds() * 1000)
-                    # At this point, resp.status_code has to be either 204 (after PATCH)
-                    # or 201 (after POST) in order to be "okay"
-                    if resp.status_code == 204 or resp.status_code == 201:
-                        okay = True
-                    else:
-                        okay = False
-
-            with lock:
-                if not okay:
-                    errors += 1
-                    if resp is None:
-                        error_as_string = "Connection Error"
-                    else:
-                        error_as_string = (
-                            str(resp.status_code)
-                            + " "
-                            + " ".join(resp.text.split())[0:160]
-                        )
-
-                    if error_as_string in unique_errors.keys():
-                        num = unique_errors[error_as_string]
-                        unique_errors[error_as_string] = num + 1
-                    else:
-                        unique_errors[error_as_string] = 1
-
-                overall_time += ms
-                overall_messages += 1
-
-                if args.verbose:
-                    if resp is None:
-                        print(
-                            "%s  ???  ---- Connection Error!"
-                            % helper.create_id(
-                                first_id,
-                                args.prefix,
-                                args.postfix,
-                                max_id_length,
-                                args.protocol == helper.PROTOCOL_NGSI_LD,
-                            )
-                        )
-                    else:
-                        message = " ".join(resp.text.split())[0:120]
-                        # There is this funny thing that Orion sometimes tells
-                        # us about 400 ParseError
-                        # see https://github.com/telefonicaid/fiware-orion/issues/3731
-                        if resp.status_code == 400:
-                            message += "\nPayload was:\n" + payload
-
-                            # try to resend
-                            # if insert_always:
-                            #     url = host + "/v2/entities/?options=upsert"
-                            #
-                            #     resp = session.post(url, data=payload, headers=headers)
-
-                            # In 100%, resending exactly the same payload again gives a 201
-
-                        print(
-                            "%s  %3i  %4i %s"
-                            % (
-                                helper.create_id(
-                                    first_id,
-                                    args.prefix,
-                                    args.postfix,
-                                    max_id_length,
-                                    args.protocol == helper.PROTOCOL_NGSI_LD,
-                                ),
-                                resp.status_code,
-                                ms,
-                                message,
-                            )
-                        )
+            if rate_pacer is not None:
+                ms = pacer.get_ms_since(slot)
+
+            count_message(
+                worker,
+                log,
+                message_args,
+                okay,
+                resp,
+                ms,
+                first_id,
+                payload,
+                max_id_length,
+                1,
+                class_stats=class_stats,
+            )
         else:
             #  Here we go with SensorThings-HTTP/SensorThings-MQTT
-            resp = None
-            ms = 0
+            thing_id, data_stream_id, okay, resp, ms, observations = perform(
+                session,
+                sensor_things.send(
+                    host, first_id, thing_id, data_stream_id, args, cache, batching
+                ),
+                mqtt_client,
+            )
 
-            if args.datastream_id is not None:
-                okay = True
-                thing_id = 0
-                data_stream_id = args.datastream_id
+            if batching and okay:
+                pending.add(first_id, observations, slot)
             else:
-                if thing_id != sensor_things.INVALID_ID:
-                    okay = True
-                else:
-                    #  1. Get the Thing's id and create if not existing yet
-                    with lock:  # since we might be running in more than one thread, use lock!
-                        okay = True
-
-                        if thing_id == sensor_things.INVALID_ID:
-                            thing_name = helper.create_id(
-                                first_id,
-                                args.prefix,
-                                args.postfix,
-                                0,
-                                args.protocol == helper.PROTOCOL_NGSI_LD,
-                            )
-
-                            #  check, if the thing with the given name (thing_name) already exists:
-                            thing_id, resp = sensor_things.get_thing_id(
-                                session, host, thing_name, args
-                            )
-                            if resp is None:
-                                okay = False
-                            elif resp.status_code == 404:
-                                ms = int(resp.elapsed.total_seconds() * 1000)
-                                thing_id, resp = sensor_things.create_thing(
-                                    session, host, thing_name, args
-                                )
-                                if resp.status_code != 201:
-                                    okay = False
-                            elif resp.status_code == 200:
-                                # everything is fine
-                                okay = True
-                            else:
-                                # neither 200 nor 404 - error!
-                                okay = False
-
-            if (
-                okay
-                and thing_id != sensor_things.INVALID_ID
-                and thing_id != sensor_things.ERROR
-            ):
-                if args.numbers is not None:
-                    for number in args.numbers:
-                        attribute_args = number[0].split(",")
-
-                        # shortcut: if at this point data_stream_id != INVALID_ID, then we
-                        #           only have ONE attribute at all! So, no need to find out
-                        #           data_stream_id...create an Observation immediately instead
-                        if (
-                            args.datastream_id is None
-                            and data_stream_id == sensor_things.INVALID_ID
-                        ):
-                            with lock:  # since we might be running in more than one thread!
-                                data_stream_name = attribute_args[0]
-                                data_stream_id, ms2 = sensor_things.get_data_stream_id(
-                                    session, host, thing_id, data_stream_name, args
-                                )
-
-                                ms = int((ms + ms2) / 2)
-
-                                if data_stream_id == sensor_things.ERROR:
-                                    okay = False
-                                elif data_stream_id == sensor_things.INVALID_ID:
-                                    (
-                                        data_stream_id,
-                                        ms2,
-                                    ) = sensor_things.create_data_stream(
-                                        session, host, thing_id, data_stream_name, args
-                                    )
-                                    ms = int((ms + ms2) / 2)
-                                    if data_stream_id == sensor_things.ERROR:
-                                        okay = False
-                                        data_stream_id = sensor_things.INVALID_ID
-
-                        # Create an observation
-                        value = helper.create_value_from_attribute_args(attribute_args)
-
-                        resp = sensor_things.create_observation(
-                            mqtt_client,
-                            session,
-                            host,
-                            args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT,
-                            data_stream_id,
-                            value,
-                            args,
-                        )
-
-                        if resp is not None:
-                            ms2 = int(resp.elapsed.total_seconds() * 1000)
-                            ms = int((ms + ms2) / 2)
-
-                        if num_attributes > 1:
-                            data_stream_id = sensor_things.INVALID_ID
-
-                if args.strings is not None:
-                    for string in args.strings:
-                        data_stream_name = string[0]
-                        with lock:  # since we might be running in more than one thread, use lock!
-                            data_stream_id, ms2 = sensor_things.get_data_stream_id(
-                                session, host, thing_id, data_stream_name, args
-                            )
-
-                            ms = int((ms + ms2) / 2)
-
-                            if data_stream_id == sensor_things.ERROR:
-                                okay = False
-                            elif data_stream_id == sensor_things.INVALID_ID:
-                                data_stream_id, ms2 = sensor_things.create_data_stream(
-                                    session, host, thing_id, data_stream_name, args
-                                )
-                                ms = int((ms + ms2) / 2)
-                                if data_stream_id == sensor_things.ERROR:
-                                    okay = False
-                                    data_stream_id = sensor_things.INVALID_ID
-
-                        # Create an observation
-                        resp = sensor_things.create_observation(
-                            mqtt_client,
-                            session,
-                            host,
-                            args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT,
-                            data_stream_id,
-                            string[1],
-                            args,
-                        )
-
-                        if resp is not None:
-                            ms2 = int(resp.elapsed.total_seconds() * 1000)
-                            ms = int((ms + ms2) / 2)
-
-                        if num_attributes > 1:
-                            data_stream_id = sensor_things.INVALID_ID
-
-            with lock:
-                overall_messages += 1
-
-                if not okay:
-                    errors += 1
-                    if resp is None:
-                        error_as_string = "Connection Error"
-                    else:
-                        error_as_string = (
-                            str(resp.status_code)
-                            + " "
-                            + " ".join(resp.text.split())[0:120]
-                        )
-
-                    if error_as_string in unique_errors.keys():
-                        num = unique_errors[error_as_string]
-                        unique_errors[error_as_string] = num + 1
-                    else:
-                        unique_errors[error_as_string] = 1
-
-                overall_time += ms
-
-                if args.verbose:
-                    if resp is None:
-                        print(
-                            "%s  ???  ---- Connection Error!"
-                            % helper.create_id(
-                                first_id,
-                                args.prefix,
-                                args.postfix,
-                                max_id_length,
-                                args.protocol == helper.PROTOCOL_NGSI_LD,
-                            )
-                        )
-                    else:
-                        message = " ".join(resp.text.split())[0:120]
-                        print(
-                            "%s  %3i  %4i %s"
-                            % (
-                                helper.create_id(
-                                    first_id,
-                                    args.prefix,
-                                    args.postfix,
-                                    max_id_length,
-                                    args.protocol == helper.PROTOCOL_NGSI_LD,
-                                ),
-                                resp.status_code,
-                                ms,
-                                message,
-                            )
-                        )
+                if rate_pacer is not None:
+                    ms = pacer.get_ms_since(slot)
+
+                count_message(
+                    worker, log, args, okay, resp, ms, first_id, None, max_id_length, 1
+                )
 
         if not args.static_id:
             thing_id = sensor_things.INVALID_ID
             first_id += 1
 
         if args.frequency is not None:
-            delta = datetime.now() - start_time_ms
-            milliseconds = int(delta.total_seconds() * 1000)
-            sleep_for_ms = args.frequency - milliseconds
-            sleep_for_ms -= 10  # give some extra for the call itself
-            if sleep_for_ms > 0:
-                sleep(sleep_for_ms / 1000)
+            pending.sleep(helper.get_frequency_delay(args, start_time_ms))
+
+    pending.flush()
+
+
+def send_observations(
+    session, log, worker, args, host, pending_messages, max_id_length, slot
+):
+    observations = [
+        observation
+        for _, message_observations in pending_messages
+        for observation in message_observations
+    ]
+
+    resp, observation_errors = perform(
+        session, sensor_things.create_observations(host, observations, args)
+    )
+
+    ms = 0 if resp is None else int(resp.elapsed.total_seconds() * 1000)
+    if slot is not None:
+        ms = pacer.get_ms_since(slot)
+
+    # a message failed, if at least one of its observations failed
+    batch_errors = None
+    if observation_errors is not None:
+        batch_errors = []
+        position = 0
+        for _, message_observations in pending_messages:
+            end = position + len(message_observations)
+            message_errors = [
+                error for error in observation_errors[position:end] if error is not None
+            ]
+            if len(message_errors) > 0:
+                batch_errors.append(message_errors[0])
+            position = end
+
+    count_message(
+        worker,
+        log,
+        args,
+        observation_errors is not None,
+        resp,
+        ms,
+        pending_messages[0][0],
+        None,
+        max_id_length,
+        len(pending_messages),
+        batch_errors,
+    )
+
+
+class PendingObservations:
+    # The SensorThings-HTTP messages of a sender waiting for their batch (see
+    # --batch-size): they are sent as soon as the batch is full or its oldest message
+    # waits for the flush-interval - the latter even while no other message comes,
+    # as long as the sender waits by sleep (see do_send).
+    def __init__(self, session, log, worker, args, host, max_id_length):
+        self.session = session
+        self.log = log
+        self.worker = worker
+        self.args = args
+        self.host = host
+        self.max_id_length = max_id_length
+        self.messages = []
+        self.since = None
+        self.slot = None
+
+    def add(self, first_id, observations, slot):
+        if len(self.messages) == 0:
+            self.since = perf_counter()
+            self.slot = slot
+        self.messages.append((first_id, observations))
+
+        if len(self.messages) >= self.args.batch_size or self.get_delay() == 0:
+            self.flush()
+
+    def get_delay(self):
+        # seconds until the batch is due by the flush-interval (None if never)
+        if len(self.messages) == 0 or self.args.flush_interval is None:
+            return None
+
+        return max(0.0, self.since + self.args.flush_interval / 1000 - perf_counter())
+
+    def sleep(self, seconds):
+        # like time.sleep, the batch is flushed on time in the meantime
+        end = perf_counter() + seconds
+
+        delay = self.get_delay()
+        if delay is not None and delay < seconds:
+            sleep(delay)
+            self.flush()
+
+        sleep(max(0.0, end - perf_counter()))
+
+    def flush(self):
+        if len(self.messages) == 0:
+            return
+
+        send_observations(
+            self.session,
+            self.log,
+            self.worker,
+            self.args,
+            self.host,
+            self.messages,
+            self.max_id_length,
+            self.slot,
+        )
+        self.messages = []
+
+
+def do_send_batches(
+    session,
+    log,
+    worker,
+    args,
+    offset,
+    max_id_length,
+    rate_pacer,
+    request_producer=None,
+    gate=None,
+    mix=None,
+):
+    first_id = args.first_id + offset
+    host = helper.create_host_url(args.server)
+    # see do_send
+    message_args = args
+    class_stats = None
+
+    if args.unlimited:
+        # there is no infinite mode :-) - but don't send more than one billion messages!
+        args.num_messages = 1000000000
+
+    num_sent = 0
+
+    # with a producer, the senders share its batches until there are none left
+    while request_producer is not None or num_sent < args.num_messages:
+        wait_for_turn(gate)
+
+        if rate_pacer is not None:
+            slot = wait_for_slot(rate_pacer)
+
+        start_time_ms = datetime.now()
+
+        if halt:
+            return
+
+        request = None
+        if request_producer is not None:
+            item = request_producer.get()
+            if item is None:
+                return
+            first_ids, request = item
+            first_id = first_ids[0]
+        elif mix is not None:
+            # a batch of entities of the same class
+            message_args, first_ids, class_stats = mix.take(
+                min(args.batch_size, args.num_messages - num_sent)
+            )
+            first_id = first_ids[0]
+        else:
+            first_ids = ngsi.create_batch_ids(
+                first_id,
+                min(args.batch_size, args.num_messages - num_sent),
+                args.static_id,
+            )
+
+        okay, resp, ms, payload, batch_errors = perform(
+            session, ngsi.send_batch(host, first_ids, message_args, request)
+        )
+
+        if rate_pacer is not None:
+            ms = pacer.get_ms_since(slot)
+
+        count_message(
+            worker,
+            log,
+            message_args,
+            okay,
+            resp,
+            ms,
+            first_id,
+            payload,
+            max_id_length,
+            len(first_ids),
+            batch_errors,
+            class_stats,
+        )
+
+        num_sent += len(first_ids)
+        if not args.static_id:
+            first_id += len(first_ids)
+
+        if args.frequency is not None:
+            sleep(helper.get_frequency_delay(args, start_time_ms))
+
+
+def save_cache():
+    # with more than one process, every process saves the ids it found itself
+    if stats_queue is None:
+        cache.save()
 
 
 def signal_handler(*_):
     stop_send_threads()
+    stop_metrics()
+    stop_exporter()
+    stop_verbose_log()
+    save_cache()
     print("\nInterrupted!")
-    output.show_result(False, start, errors, unique_errors)
+    output.show_result(
+        False,
+        start,
+        errors,
+        unique_errors,
+        response_times,
+        count_connections(),
+        get_worker_summaries(),
+        get_stage_results(),
+        capacity_search,
+        get_class_stats(),
+    )
     sys.exit(0)
 
 
 def signal_handler_delete(*_):
-    stop_delete_thread()
+    stop_delete_threads()
+    stop_verbose_log()
+    save_cache()
     print("\nInterrupted!")
-    output.show_result(True, start, errors, unique_errors)
+    output.show_result(
+        True,
+        start,
+        errors,
+        unique_errors,
+        None,
+        count_connections(),
+        get_worker_summaries(),
+    )
     sys.exit(0)
 
 
-def wait_for_delete_thread(args):
+def wait_for_delete_threads(args):
     ready = False
     while not ready:
         sleep(0.5)
-        if overall_messages > 0 and not args.verbose:
+
+        collect_stats()
+
+        if overall_messages > 0 and shows_progress(args):
             if args.unlimited:
                 print(
                     "\rMessages sent: %i with %i not found and %i other error(s)      "
@@ -519,74 +628,885 @@ def wait_for_delete_thread(args):
                 )
 
         ready = True
-        if delete_thread.is_alive():
-            ready = False
-            continue
+        for t in delete_threads:
+            if t.is_alive():
+                ready = False
+                continue
+
+    collect_stats()
+
 
+def split_range(first, last, parts):
+    # contiguous ranges (including "first" and "last"), one for each worker
+    ranges = []
+    size, rest = divmod(last - first + 1, parts)
+    begin = first
 
-def create_and_start_delete_thread(session, lock, args, max_id_length):
-    global delete_thread
+    for i in range(parts):
+        end = begin + size + (1 if i < rest else 0)
+        if end > begin:
+            ranges.append((begin, end - 1))
+        begin = end
 
-    delete_thread = Thread(target=do_delete, args=(session, lock, args, max_id_length))
+    return ranges
 
-    delete_thread.daemon = True
-    delete_thread.start()
 
+def create_delete_pacer(args, processes):
+    if args.rate is None:
+        return None
 
-def stop_delete_thread():
-    global delete_thread, halt
+    # a cap only: if the server is slow, there is no catching up afterwards
+    return pacer.Pacer(args.rate / processes, pacer.ARRIVAL_FIXED, False)
+
+
+def create_delete_threads(args, log, max_id_length, ranges, processes, first_index=0):
+    rate_pacer = create_delete_pacer(args, processes)
+
+    if not args.session_per_thread:
+        session = create_session(
+            args.pool_size if args.pool_size is not None else len(ranges)
+        )
+
+    for index, (first, last) in enumerate(ranges):
+        if args.session_per_thread:
+            session = create_session(1)
+
+        worker = stats.Stats("thread %i" % (first_index + index + 1))
+        worker_stats.append(worker)
+
+        t = Thread(
+            target=do_delete,
+            args=(session, log, worker, args, max_id_length, first, last, rate_pacer),
+        )
+        t.daemon = True
+        delete_threads.append(t)
+
+
+def start_delete_threads():
+    for t in delete_threads:
+        t.start()
+
+
+def stop_delete_threads():
+    global halt
 
     halt = True
-    while delete_thread.is_alive():
+
+    ready = False
+    while not ready:
+        collect_stats()
+        ready = True
+        for t in delete_threads:
+            if t.is_alive():
+                ready = False
+                continue
         sleep(0.5)
 
+    collect_stats()
+
 
-def handle_delete(args, session, lock, max_id_length):
-    global start, delete_thread
+def handle_delete(args, max_id_length):
+    global start
 
     # noinspection PyTypeChecker
     signal.signal(signal.SIGINT, signal_handler_delete)
 
+    # never start more workers than there are ids to delete
+    workers = min(args.num_threads, args.delete[1] - args.delete[0] + 1)
+    processes = min(args.processes, workers)
+
     # print what will be done...
     output.print_server_used(True, args.server)
     output.print_type_of_server(args.protocol)
-    output.print_will_delete(args)
+    output.print_will_delete(args, workers, processes)
+    if args.rate is not None:
+        output.print_rate(args.rate, pacer.ARRIVAL_FIXED)
 
     # dry run only?
     if args.dry_run:
         print("Dry run only. Exiting...", flush=True)
         sys.exit(0)
 
-    start = datetime.now()
+    ranges = split_range(args.delete[0], args.delete[1], workers)
 
-    if args.verbose:
-        print("ID, Response-Code, Content")
+    if args.verbose_file is not None:
+        # once for all processes, before any of them is started
+        verbose_log.create_file(args.verbose_file, verbose_log.HEADER_DELETE)
 
-    create_and_start_delete_thread(session, lock, args, max_id_length)
+    if processes > 1:
+        create_delete_processes(args, max_id_length, ranges, processes)
+    else:
+        log = create_verbose_log(args, 1)
+        create_delete_threads(args, log, max_id_length, ranges, 1)
 
-    wait_for_delete_thread(args)
+    start = datetime.now()
 
-    print("\nReady", flush=True)
+    if not shows_progress(args):
+        print(verbose_log.HEADER_DELETE, flush=True)
 
+    start_verbose_log()
+    start_delete_threads()
 
-def create_send_threads(args, mqtt_client, session, lock, max_id_length):
-    print("Starting %i thread(s)" % args.num_threads, end="", flush=True)
+    wait_for_delete_threads(args)
+    stop_verbose_log()
+    save_cache()
 
+    if shows_progress(args):
+        print("", flush=True)
+    print("Ready", flush=True)
+
+
+def create_offsets(args):
+    offsets = []
     offset = 0
 
     for i in range(args.num_threads):
+        offsets.append(offset)
+
+        if not args.static_id:
+            offset += args.num_messages
+
+    return offsets
+
+
+def is_halted():
+    return halt
+
+
+def perform(session, flow, mqtt_client=None):
+    # does the I/O of a flow (see exchange) and returns its result
+    answer = None
+    try:
+        while True:
+            step = flow.send(answer)
+            if isinstance(step, exchange.Locked):
+                with step.cache.get_key_lock(step.key):
+                    try:
+                        answer = perform(session, step.flow, mqtt_client)
+                    finally:
+                        step.cache.release_key_lock(step.key)
+            elif isinstance(step, exchange.Publish):
+                answer = sensor_things.publish_observation(
+                    mqtt_client, step.data_stream_id, step.payload
+                )
+            else:
+                try:
+                    answer = session.request(
+                        step.method, step.url, data=step.payload, headers=step.headers
+                    )
+                except (requests.exceptions.RequestException, Exception):
+                    answer = None
+    except StopIteration as e:
+        return e.value
+
+
+def wait_for_turn(gate, wait=sleep):
+    # a worker beyond the number of workers of the current stage pauses (see
+    # profile.Gate), its connection is opened once it sends for the first time
+    while gate is not None and not halt:
+        delay = gate.get_delay()
+        if delay == 0:
+            return
+        wait(delay)
+
+
+def wait_for_slot(rate_pacer, wait=sleep):
+    # the next slot of the schedule (see pacer.Pacer), waited for in steps: a halt
+    # doesn't wait for a slot far ahead (the caller looks for it right after)
+    slot = rate_pacer.next_slot()
+
+    delay = pacer.get_delay(slot)
+    while delay > 0 and not halt:
+        wait(min(delay, pacer.WAIT_STEP))
+        delay = pacer.get_delay(slot)
+
+    return slot
+
+
+def split_offsets(offsets, parts):
+    # contiguous chunks, so every process works on a range of ids of its own
+    chunks = []
+    size, rest = divmod(len(offsets), parts)
+    begin = 0
+
+    for i in range(parts):
+        end = begin + size + (1 if i < rest else 0)
+        chunks.append(offsets[begin:end])
+        begin = end
+
+    return chunks
+
+
+def create_mqtt_client(args):
+    if args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT:
+        return sensor_things.init_mqtt(helper.create_host_url(args.server))
+
+    return None
+
+
+def create_pacer(args, processes):
+    if args.profile is not None and args.profile.kind == profile.KIND_RATE:
+        return pacer.Pacer(1.0 / processes, args.arrival, curve=args.profile)
+
+    if args.rate is None:
+        return None
+
+    # every process keeps to its share of the overall rate
+    return pacer.Pacer(args.rate / processes, args.arrival)
+
+
+def create_gate(args, index):
+    # only if the number of workers follows stages (see --stages)
+    if args.profile is not None and args.profile.kind == profile.KIND_WORKERS:
+        return profile.Gate(args.profile, index)
+
+    return None
+
+
+def create_mix(args, index):
+    # only if there's a scenario (see --scenario), the workers are numbered across all
+    # processes (and agents)
+    if args.scenario is None:
+        return None
+
+    mix = scenario.Mix(args.scenario, index, args.num_threads, args.static_id)
+    mixes.append(mix)
+
+    return mix
+
+
+def create_session(pool_size):
+    # one pooled connection per thread using this session, so no thread has to wait
+    # for a connection or open a new one
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    sessions.append(session)
+
+    return session
+
+
+def count_connections():
+    # returns the number of new and reused connections of all sessions
+    new_connections = 0
+    num_requests = 0
+
+    for session in sessions:
+        # the same adapter is mounted for http and https
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                if pool is not None:
+                    new_connections += pool.num_connections
+                    num_requests += pool.num_requests
+
+    async_new_connections, async_requests = async_engine.count_connections()
+    new_connections += async_new_connections
+    num_requests += async_requests
+
+    return (
+        new_connections + process_connections[0],
+        max(0, num_requests - new_connections) + process_connections[1],
+    )
+
+
+def create_producer(args, offsets):
+    # the producer threads share the threads' ranges of ids
+    return producer.Producer(
+        args,
+        split_offsets(offsets, min(args.producers, len(offsets))),
+        args.queue_size,
+        len(offsets),
+        is_halted,
+    )
+
+
+def create_send_threads(
+    args, mqtt_client, log, max_id_length, offsets, show_progress, first_index=0
+):
+    global request_producer
+
+    rate_pacer = create_pacer(args, args.processes)
+
+    if args.engine == helper.ENGINE_ASYNC:
+        if show_progress:
+            print("Starting %i client(s)" % len(offsets), end="", flush=True)
+
+        # all clients share one thread running the event loop (and its stats)
+        worker = stats.Stats(
+            "clients %i-%i" % (first_index + 1, first_index + len(offsets))
+        )
+        worker_stats.append(worker)
+
         t = Thread(
-            target=do_send,
-            args=(mqtt_client, session, lock, args, offset, max_id_length),
+            target=async_engine.run,
+            args=(
+                mqtt_client,
+                args,
+                offsets,
+                max_id_length,
+                partial(count_message, worker, log),
+                is_halted,
+                rate_pacer,
+                cache,
+                [
+                    create_gate(args, first_index + index)
+                    for index in range(len(offsets))
+                ],
+                [
+                    create_mix(args, first_index + index)
+                    for index in range(len(offsets))
+                ],
+            ),
         )
         send_threads.append(t)
+        if show_progress:
+            print(".", end="", flush=True)
+        return
+
+    if show_progress:
+        print("Starting %i thread(s)" % len(offsets), end="", flush=True)
+
+    if args.producers > 0:
+        request_producer = create_producer(args, offsets)
+
+    if not args.session_per_thread:
+        session = create_session(
+            args.pool_size if args.pool_size is not None else len(offsets)
+        )
+
+    for index, offset in enumerate(offsets):
+        if args.session_per_thread:
+            session = create_session(1)
+
+        worker = stats.Stats("thread %i" % (first_index + index + 1))
+        worker_stats.append(worker)
+
+        if args.batch_size > 1 and (
+            args.protocol == helper.PROTOCOL_NGSI_V2
+            or args.protocol == helper.PROTOCOL_NGSI_LD
+        ):
+            t = Thread(
+                target=do_send_batches,
+                args=(
+                    session,
+                    log,
+                    worker,
+                    args,
+                    offset,
+                    max_id_length,
+                    rate_pacer,
+                    request_producer,
+                    create_gate(args, first_index + index),
+                    create_mix(args, first_index + index),
+                ),
+            )
+        else:
+            t = Thread(
+                target=do_send,
+                args=(
+                    mqtt_client,
+                    session,
+                    log,
+                    worker,
+                    args,
+                    offset,
+                    max_id_length,
+                    rate_pacer,
+                    request_producer,
+                    create_gate(args, first_index + index),
+                    create_mix(args, first_index + index),
+                ),
+            )
+        send_threads.append(t)
+        if show_progress:
+            print(".", end="", flush=True)
+
+
+def report_process_stats(workers, queue, event, index):
+    global halt
+
+    ready = False
+    while not ready:
+        sleep(0.5)
+
+        if event.is_set():
+            halt = True
+
+        active = len([t for t in workers if t.is_alive()])
+        ready = active == 0
+
+        # an agent may have processes of its own (see serve_controller)
+        collect_stats()
+
+        queue.put(
+            {
+                "index": index,
+                "stats": total_stats,
+                "active": active if stats_queue is None else count_active_workers(),
+                # the breakdown per worker is needed for the result only
+                "workers": get_worker_summaries() if ready else None,
+                "connections": count_connections(),
+                "producer": get_producer_stats(),
+                "classes": get_class_stats(),
+            }
+        )
+
+
+def do_send_process(args, offsets, max_id_length, queue, event, index, first_index):
+    global send_threads, halt_event, stats_queue, process_stats
+
+    # Ctrl-C is handled by the parent, which will tell us by the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # when forked, the parent's processes (and their queue) come along in here
+    send_threads = []
+    halt_event = None
+    stats_queue = None
+    process_stats = dict()
+
+    mqtt_client = create_mqtt_client(args)
+    log = create_verbose_log(args, args.processes)
+
+    create_send_threads(
+        args, mqtt_client, log, max_id_length, offsets, False, first_index
+    )
+    # the profile (if any) has been started by the parent, before this process
+    start_verbose_log()
+    start_send_threads()
+
+    report_process_stats(send_threads, queue, event, index)
+    stop_verbose_log()
+    cache.save()
+
+    if mqtt_client is not None:
+        mqtt_client.loop_stop()
+
+
+def create_send_processes(args, max_id_length, offsets, first_index=0):
+    global halt_event, stats_queue
+
+    print("Starting %i process(es)" % args.processes, end="", flush=True)
+
+    halt_event = multiprocessing.Event()
+    stats_queue = multiprocessing.Queue()
+
+    # the threads are numbered across all processes (and agents)
+    for index, chunk in enumerate(split_offsets(offsets, args.processes)):
+        p = multiprocessing.Process(
+            target=do_send_process,
+            args=(
+                args,
+                chunk,
+                max_id_length,
+                stats_queue,
+                halt_event,
+                index,
+                first_index,
+            ),
+        )
+        send_threads.append(p)
+        first_index += len(chunk)
         print(".", end="", flush=True)
 
-        if not args.static_id:
-            offset += args.num_messages
+
+def create_agents(args, max_id_length, offsets):
+    global halt_event, stats_queue, remote_agents
+
+    print("Connecting to %i agent(s)" % len(args.agents), end="", flush=True)
+
+    # the agents report like processes do, one thread per agent receives the stats
+    stats_queue = Queue()
+    remote_agents = remote.Agents(args.agents, stats_queue)
+
+    try:
+        remote_agents.assign(
+            args, max_id_length, split_offsets(offsets, len(args.agents))
+        )
+    except OSError as e:
+        remote_agents.close()
+        print("\nError connecting to the agents: %s\nExiting..." % e)
+        sys.exit(0)
+
+    # halting tells the agents (see collect_stats)
+    halt_event = remote_agents
+    send_threads.extend(remote_agents.threads)
+    print("." * len(args.agents), end="", flush=True)
+
+
+def receive_halt(channel, event):
+    # the controller tells when to halt, it's gone if the connection is
+    channel.receive_until(remote.HALT)
+    event.set()
+
+
+def serve_controller(connection):
+    # Runs what the controller (see create_agents) assigns to an agent (see agent.py).
+    # Every run gets a process of its own, so it starts with fresh globals.
+    global cache
+
+    # Ctrl-C is handled by the agent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    channel = remote.Channel(connection)
+    message = channel.receive()
+    if message is None or message["type"] != remote.ASSIGN:
+        channel.close()
+        return
+
+    if message["version"] != helper.get_version():
+        channel.send(
+            {
+                "type": remote.ERROR,
+                "message": "oscsim %s, not %s"
+                % (helper.get_version(), message["version"]),
+            }
+        )
+        channel.close()
+        return
+
+    args = remote.decode_args(message["args"])
+    offsets = message["offsets"]
+    max_id_length = message["max_id_length"]
+    print(
+        "Assigned %i thread(s) of %s, starting with thread %i"
+        % (len(offsets), args.server, message["first_index"] + 1),
+        flush=True,
+    )
+
+    try:
+        if args.id_cache is not None:
+            cache = id_cache.IdCache(helper.create_host_url(args.server), args.id_cache)
+        if args.verbose_file is not None:
+            verbose_log.create_file(args.verbose_file, verbose_log.HEADER_SEND)
+    except OSError as e:
+        channel.send({"type": remote.ERROR, "message": str(e)})
+        channel.close()
+        return
+
+    if args.processes > 1:
+        mqtt_client = None
+        create_send_processes(args, max_id_length, offsets, message["first_index"])
+    else:
+        mqtt_client = create_mqtt_client(args)
+        log = create_verbose_log(args, 1)
+        create_send_threads(
+            args, mqtt_client, log, max_id_length, offsets, True, message["first_index"]
+        )
+    print("", flush=True)
+
+    channel.send({"type": remote.READY})
+    start_message = channel.receive_until(remote.START)
+    if start_message is None:
+        channel.close()
+        return
+
+    event = Event()
+    Thread(target=receive_halt, args=(channel, event), daemon=True).start()
+
+    if args.profile is not None:
+        # as far as the controller's (see remote.Agents.start)
+        args.profile.start(start_message["elapsed"])
+    start_verbose_log()
+    start_send_threads()
+    print("Running...", flush=True)
+
+    report_process_stats(
+        send_threads, remote.StatsSender(channel), event, message["index"]
+    )
+    stop_verbose_log()
+    save_cache()
+
+    if mqtt_client is not None:
+        mqtt_client.loop_stop()
+
+    channel.close()
+    print(
+        "Ready: %i message(s) with %i error(s)" % (overall_messages, errors),
+        flush=True,
+    )
+
+
+def do_delete_process(
+    args, ranges, max_id_length, queue, event, index, processes, first_index
+):
+    global delete_threads
+
+    # see do_send_process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    delete_threads = []
+
+    log = create_verbose_log(args, processes)
+
+    create_delete_threads(args, log, max_id_length, ranges, processes, first_index)
+    start_verbose_log()
+    start_delete_threads()
+
+    report_process_stats(delete_threads, queue, event, index)
+    stop_verbose_log()
+    cache.save()
+
+
+def create_delete_processes(args, max_id_length, ranges, processes):
+    global halt_event, stats_queue
+
+    halt_event = multiprocessing.Event()
+    stats_queue = multiprocessing.Queue()
+
+    # see create_send_processes
+    first_index = 0
+
+    for index, chunk in enumerate(split_offsets(ranges, processes)):
+        p = multiprocessing.Process(
+            target=do_delete_process,
+            args=(
+                args,
+                chunk,
+                max_id_length,
+                stats_queue,
+                halt_event,
+                index,
+                processes,
+                first_index,
+            ),
+        )
+        p.daemon = True
+        delete_threads.append(p)
+        first_index += len(chunk)
+
+
+def collect_stats():
+    # merges the stats of all workers (of this process and of the others) into the
+    # globals, the workers themselves don't need any lock for counting
+    global errors, unique_errors, overall_messages, overall_requests, overall_time
+    global response_times, process_connections, deleted, not_deleted
+    global process_producer_stats, total_stats
+
+    if stats_queue is not None:
+        if halt:
+            halt_event.set()
+
+        # every process reports its totals, so just keep the latest one of each
+        while True:
+            try:
+                snapshot = stats_queue.get_nowait()
+            except Empty:
+                break
+            process_stats[snapshot["index"]] = snapshot
+
+    total = merge_stats()
+
+    total_stats = total
+    overall_messages = total.messages
+    overall_requests = total.requests
+    errors = total.errors
+    overall_time = total.time
+    deleted = total.deleted
+    not_deleted = total.not_deleted
+    unique_errors = total.unique_errors
+    response_times = total.response_times
+
+    new_connections = 0
+    reused_connections = 0
+    producer_stats = None
+
+    for snapshot in process_stats.values():
+        new_connections += snapshot["connections"][0]
+        reused_connections += snapshot["connections"][1]
+        if snapshot["producer"] is not None:
+            # the queues of all processes as if they were one
+            if producer_stats is None:
+                producer_stats = snapshot["producer"]
+            else:
+                producer_stats = tuple(
+                    a + b for a, b in zip(producer_stats, snapshot["producer"])
+                )
+
+    process_connections = (new_connections, reused_connections)
+    process_producer_stats = producer_stats
+
+
+def merge_stats():
+    # the totals of all workers of this process and of the others (as far as known)
+    return stats.merge(
+        list(worker_stats)
+        + [snapshot["stats"] for snapshot in list(process_stats.values())]
+    )
+
+
+def start_metrics(args):
+    global metrics_writer
+
+    if args.metrics_file is not None:
+        metrics_writer = metrics.MetricsWriter(args.metrics_file, args.metrics_interval)
+        metrics_writer.start()
+
+
+def stop_metrics():
+    global metrics_writer
+
+    if metrics_writer is not None:
+        metrics_writer.stop(total_stats)
+        metrics_writer = None
+
+
+def write_metrics():
+    # a row, if the interval is over (see metrics.MetricsWriter)
+    if metrics_writer is not None:
+        metrics_writer.update(total_stats)
+
+
+def start_exporter(args):
+    global metrics_exporter
+
+    if args.metrics_port is not None:
+        try:
+            metrics_exporter = exporter.Exporter(args.metrics_port, args.protocol)
+        except OSError as e:
+            print("Error listening on port %i: %s\nExiting..." % (args.metrics_port, e))
+            sys.exit(0)
+        metrics_exporter.start()
+        print(
+            "Serving metrics at http://localhost:%i%s"
+            % (args.metrics_port, exporter.PATH),
+            flush=True,
+        )
+
+
+def publish_metrics():
+    # the globals are replaced (not changed) by collect_stats, so they can be passed
+    if metrics_exporter is not None:
+        metrics_exporter.update(
+            {
+                "start": start.timestamp(),
+                "messages": overall_messages,
+                "requests": overall_requests,
+                "errors": errors,
+                "unique_errors": unique_errors,
+                "response_times": response_times,
+                "active_workers": count_active_workers(),
+            }
+        )
+
+
+def stop_exporter():
+    global metrics_exporter
+
+    if metrics_exporter is not None:
+        metrics_exporter.stop()
+        metrics_exporter = None
+
+
+def count_active_workers():
+    # the processes report their threads still running
+    if stats_queue is not None:
+        active = sum(snapshot["active"] for snapshot in list(process_stats.values()))
+    else:
+        active = len([t for t in send_threads if t.is_alive()])
+
+    if stage_stats is not None and stage_stats.profile.kind == profile.KIND_WORKERS:
+        # the others are paused
+        elapsed = stage_stats.profile.get_elapsed()
+        return min(active, int(stage_stats.profile.get_value(elapsed)))
+
+    return active
+
+
+def create_verbose_log(args, processes):
+    # one for each process (if verbose at all), sharing the lines per second
+    global verbose_output
+
+    if args.verbose:
+        verbose_output = verbose_log.VerboseLog(
+            args.verbose_file,
+            args.verbose_every,
+            args.verbose_errors,
+            None if args.verbose_rate is None else args.verbose_rate / processes,
+        )
+
+    return verbose_output
+
+
+def start_verbose_log():
+    if verbose_output is not None:
+        verbose_output.start()
+
+
+def stop_verbose_log():
+    global verbose_output
+
+    if verbose_output is not None:
+        verbose_output.stop()
+        verbose_output = None
+
+
+def shows_progress(args):
+    # the verbose output replaces the progress, unless it's written to a file (or by
+    # the agents)
+    return not args.verbose or args.verbose_file is not None or args.agents is not None
+
+
+def get_worker_summaries():
+    # see stats.Stats.get_summary, the processes in the order of their threads
+    summaries = [worker.get_summary() for worker in worker_stats]
+
+    for index in sorted(process_stats.keys()):
+        if process_stats[index]["workers"] is not None:
+            summaries += process_stats[index]["workers"]
+
+    return summaries
+
+
+def get_class_stats():
+    # see scenario.Mix, the totals per class of all workers (and of the processes)
+    per_worker = [mix.stats for mix in mixes] + [
+        snapshot["classes"]
+        for snapshot in list(process_stats.values())
+        if snapshot["classes"] is not None
+    ]
+    if len(per_worker) == 0:
+        return None
+
+    totals = []
+    for class_stats in zip(*per_worker):
+        total = stats.merge(list(class_stats))
+        total.name = class_stats[0].name
+        totals.append(total)
+
+    return totals
+
+
+def get_stage_results():
+    # see profile.StageStats, the stage running at the end counts as well
+    if stage_stats is None:
+        return None
+
+    stage_stats.update(total_stats, True)
+    if capacity_search is not None:
+        # the step running at the end (if not after the breach)
+        capacity_search.check(stage_stats.results)
+
+    return stage_stats.results
+
+
+def get_producer_stats():
+    # (depth of the queue, size of the queue, produced, consumed, starved)
+    if request_producer is not None:
+        return request_producer.get_stats()
+
+    return process_producer_stats
 
 
 def start_send_threads():
+    if remote_agents is not None:
+        # all at once
+        remote_agents.start()
+
+    if request_producer is not None:
+        request_producer.start()
+
     for t in send_threads:
         t.daemon = True
         t.start()
@@ -608,9 +1528,27 @@ def wait_for_send_threads(limit_time, verbose, msg_num, unlimited):
         if limit_time is not None and temp_s >= limit_time:
             halt = True
 
+        collect_stats()
+        write_metrics()
+        publish_metrics()
+        if stage_stats is not None:
+            stage_stats.update(total_stats)
+            if capacity_search is not None and capacity_search.check(
+                stage_stats.results
+            ):
+                halt = True
+
         if not verbose:
             output.print_messages_send(
-                overall_messages, errors, overall_time, temp_ms, msg_num, unlimited
+                overall_messages,
+                overall_requests,
+                errors,
+                overall_time,
+                response_times,
+                temp_ms,
+                msg_num,
+                unlimited,
+                get_producer_stats(),
             )
 
         ready = True
@@ -619,12 +1557,25 @@ def wait_for_send_threads(limit_time, verbose, msg_num, unlimited):
                 ready = False
                 continue
 
+    collect_stats()
+    publish_metrics()
+
     if not verbose:
         output.print_messages_send(
-            overall_messages, errors, overall_time, temp_ms, msg_num, unlimited
+            overall_messages,
+            overall_requests,
+            errors,
+            overall_time,
+            response_times,
+            temp_ms,
+            msg_num,
+            unlimited,
+            get_producer_stats(),
         )
 
-    if limit_time is not None:
+    if capacity_search is not None and capacity_search.breached:
+        print("\nSLO breached!", flush=True)
+    elif limit_time is not None:
         print("\nTime is up!", flush=True)
 
     return temp_ms
@@ -637,6 +1588,7 @@ def stop_send_threads():
 
     ready = False
     while not ready:
+        collect_stats()
         ready = True
         for t in send_threads:
             if t.is_alive():
@@ -644,9 +1596,11 @@ def stop_send_threads():
                 continue
         sleep(0.5)
 
+    collect_stats()
+
 
-def handle_send(args, session, lock, msg_num, max_id_length):
-    global start, send_threads
+def handle_send(args, msg_num, max_id_length):
+    global start, send_threads, stage_stats, capacity_search
 
     # noinspection PyTypeChecker
     signal.signal(signal.SIGINT, signal_handler)
@@ -655,70 +1609,133 @@ def handle_send(args, session, lock, msg_num, max_id_length):
     output.print_server_used(False, args.server)
     output.print_type_of_server(args.protocol)
     output.print_schema(args)
-    if args.datastream_id is None:
+    if args.scenario is not None:
+        output.print_scenario(args.scenario)
+    elif args.datastream_id is None:
         output.print_id_used(args, msg_num)
     else:
         output.print_data_stream_id_used(args.datastream_id)
-    if args.dry_run:
+    if args.dry_run and args.scenario is not None:
+        for entity in args.scenario.classes:
+            print('Class "%s":' % entity.name, flush=True)
+            output.print_payload(entity.args)
+    elif args.dry_run:
         output.print_payload(args)
     output.print_will_send_messages(args, msg_num)
     if args.frequency is not None:
         output.print_frequency(args.frequency, args.num_threads > 1)
+    if args.rate is not None:
+        output.print_rate(args.rate, args.arrival)
+    if args.search is not None:
+        output.print_search(args)
+    elif args.profile is not None:
+        output.print_profile(args.profile)
 
     # dry run only?
     if args.dry_run:
         print("Dry run only. Exiting...", flush=True)
         sys.exit(0)
 
-    mqtt_client = (
-        sensor_things.init_mqtt(helper.create_host_url(args.server))
-        if args.protocol == helper.PROTOCOL_SENSOR_THINGS_MQTT
-        else None
-    )
-
-    create_send_threads(args, mqtt_client, session, lock, max_id_length)
+    start_exporter(args)
+    offsets = create_offsets(args)
+
+    if args.verbose_file is not None and args.agents is None:
+        # once for all processes, before any of them is started
+        verbose_log.create_file(args.verbose_file, verbose_log.HEADER_SEND)
+
+    if args.agents is not None:
+        # every agent will have its own processes (and verbose output)
+        mqtt_client = None
+        create_agents(args, max_id_length, offsets)
+    elif args.processes > 1:
+        # every process will have its own MQTT-client (and verbose output)
+        mqtt_client = None
+        create_send_processes(args, max_id_length, offsets)
+    else:
+        mqtt_client = create_mqtt_client(args)
+        log = create_verbose_log(args, 1)
+        create_send_threads(args, mqtt_client, log, max_id_length, offsets, True)
 
     start = datetime.now()
+    if args.profile is not None:
+        # before the processes (and agents) are started, they keep to this one
+        args.profile.start()
+        stage_stats = profile.StageStats(args.profile)
+    if args.search is not None:
+        capacity_search = capacity.Search(
+            args.profile, args.slo_latency, args.slo_errors
+        )
+    start_verbose_log()
     start_send_threads()
+    start_metrics(args)
 
     print("Ready\nRunning...", flush=True)
 
-    if args.verbose:
-        print("ID, Response-Code, Response-Time, Content", flush=True)
+    if not shows_progress(args):
+        print(verbose_log.HEADER_SEND, flush=True)
 
     # Wait for all threads to finish
-    ms = wait_for_send_threads(args.limit_time, args.verbose, msg_num, args.unlimited)
+    ms = wait_for_send_threads(
+        args.limit_time, not shows_progress(args), msg_num, args.unlimited
+    )
+    stop_metrics()
+    stop_exporter()
+    stop_verbose_log()
+    save_cache()
 
-    if not args.verbose:
+    if shows_progress(args):
         print("", flush=True)
     print("Ready", flush=True)
 
     if mqtt_client is not None:
         mqtt_client.loop_stop()
 
-    if args.verbose:
+    if not shows_progress(args):
         output.print_messages_send(
-            overall_messages, errors, overall_time, ms, msg_num, args.unlimited
+            overall_messages,
+            overall_requests,
+            errors,
+            overall_time,
+            response_times,
+            ms,
+            msg_num,
+            args.unlimited,
         )
         print("")
 
 
 def main(args=None):
+    global cache
+
     output.print_version()
-    args = arguments.parse_arguments()
+    args = arguments.parse_arguments(args)
     # if there was any error on the arguments, the function already gave some hint and exited.
 
+    if args.id_cache is not None:
+        cache = id_cache.IdCache(helper.create_host_url(args.server), args.id_cache)
+
     # calculate the overall number of messages to be sent
     msg_num = args.num_threads * args.num_messages
 
     max_id_length = helper.calculate_max_id_length(args, msg_num)
 
     if args.delete:
-        handle_delete(args, requests.Session(), Lock(), max_id_length)
+        handle_delete(args, max_id_length)
     else:
-        handle_send(args, requests.Session(), Lock(), msg_num, max_id_length)
-
-    output.show_result(args.delete, start, errors, unique_errors)
+        handle_send(args, msg_num, max_id_length)
+
+    output.show_result(
+        args.delete,
+        start,
+        errors,
+        unique_errors,
+        None if args.delete else response_times,
+        count_connections(),
+        get_worker_summaries(),
+        get_stage_results(),
+        capacity_search,
+        get_class_stats(),
+    )
 
     sys.exit(0)
 
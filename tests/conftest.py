@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# The sources next to this directory are tested, not an installed oscsim.
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+)
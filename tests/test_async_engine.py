@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from oscsim.modules import async_engine
+
+RESPONSE = b"HTTP/1.1 201 Created\r\nContent-Length: 2\r\n\r\n{}"
+
+
+def run_against(answers, method, num_requests):
+    # Sends the requests by a single connection to a server answering the n-th
+    # request as answers(n) says: "keep" (alive), "close" (after the response) or
+    # None (closing without any response). Returns the status (or the error) per
+    # request and the number of requests the server got.
+    received = []
+
+    async def handle(reader, writer):
+        while True:
+            try:
+                await reader.readuntil(b"\r\n\r\n{}")
+            except asyncio.IncompleteReadError:
+                break
+            received.append(method)
+            answer = answers(len(received))
+            if answer is not None:
+                writer.write(RESPONSE)
+                await writer.drain()
+            if answer != "keep":
+                break
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        connection = async_engine.Connection("http://127.0.0.1:%i" % port)
+        results = []
+        for _ in range(num_requests):
+            try:
+                resp = await connection.request(method, "/v2/entities", "{}")
+                results.append(resp.status_code)
+            except ConnectionError as e:
+                results.append(type(e))
+            # the server closes (or not) in the meantime
+            await asyncio.sleep(0.05)
+        connection.close()
+        server.close()
+        return results
+
+    return asyncio.run(run()), len(received)
+
+
+def test_keep_alive():
+    assert run_against(lambda num: "keep", "POST", 3) == ([201, 201, 201], 3)
+
+
+def test_closed_keep_alive():
+    # the server closes after every response: a fresh connection, nothing twice
+    assert run_against(lambda num: "close", "POST", 3) == ([201, 201, 201], 3)
+
+
+def test_no_response_to_post():
+    # the server might have processed it already, so it's not sent again
+    results, received = run_against(lambda num: "keep" if num == 1 else None, "POST", 2)
+    assert results == [201, ConnectionResetError]
+    assert received == 2
+
+
+def test_no_response_to_patch():
+    # sending the same attributes again doesn't harm
+    results, received = run_against(
+        lambda num: None if num == 2 else "keep", "PATCH", 2
+    )
+    assert results == [201, 201]
+    assert received == 3
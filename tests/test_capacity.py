@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from oscsim.modules import capacity, histogram
+
+
+def create_result(index, messages, errors, throughput, response_time):
+    # see profile.create_result
+    response_times = histogram.Histogram()
+    if response_time is not None:
+        response_times.record(response_time, messages - errors)
+
+    return index, "step", 10.0, messages, errors, throughput, response_times
+
+
+def create_search(slo_latency=(99.0, 100), slo_errors=1.0):
+    return capacity.Search(
+        capacity.create_profile(100, 100, 300, 10.0), slo_latency, slo_errors
+    )
+
+
+def test_no_breach():
+    search = create_search()
+
+    assert search.get_breaches(create_result(0, 1000, 10, 99, 100)) == []
+
+
+def test_breaches():
+    search = create_search()
+
+    # too slow, too many errors and too late - at once
+    assert search.get_breaches(create_result(1, 1000, 20, 150, 101)) == [
+        "150 of 200 msg/sec",
+        "2.0% errors",
+        "p99: 101 ms",
+    ]
+    # nothing succeeded at all
+    assert search.get_breaches(create_result(0, 1000, 1000, 0, None))[-1] == (
+        "p99: -- ms"
+    )
+    # without a latency, the errors count only
+    assert create_search(None).get_breaches(create_result(0, 1000, 0, 95, 5000)) == []
+
+
+def test_knee():
+    search = create_search()
+    results = [create_result(0, 1000, 0, 100, 10), create_result(1, 2000, 0, 195, 20)]
+
+    assert not search.check(results)
+    assert search.check(results + [create_result(2, 3000, 0, 200, 30)])
+    # once breached, any further steps are ignored
+    assert search.check(results + [create_result(2, 3000, 0, 200, 30)] * 2)
+    assert len(search.steps) == 3
+    assert search.get_knee() is results[1]
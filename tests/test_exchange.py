@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import timedelta
+
+from oscsim.modules import arguments, exchange, id_cache, ngsi, sensor_things
+
+
+class Response:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.elapsed = timedelta(milliseconds=5)
+
+
+def drive(flow, responses):
+    # like run.perform, with the responses (or None) given in order - returns the
+    # result and the requests (method and url)
+    requests = []
+    answer = None
+    try:
+        while True:
+            step = flow.send(answer)
+            if isinstance(step, exchange.Locked):
+                answer, locked = drive(step.flow, responses)
+                requests += locked
+            else:
+                requests.append((step.method, step.url))
+                answer = responses.pop(0)
+    except StopIteration as e:
+        return e.value, requests
+
+
+def create_args(protocol, *options):
+    return arguments.parse_arguments(
+        ["-s", "http://server:1026", "-p", protocol, "-an", "t,f,1,5"] + list(options)
+    )
+
+
+def test_ngsi_patch():
+    args = create_args("NGSI-V2")
+    (okay, resp, ms, _), requests = drive(
+        ngsi.send("http://server:1026", 1, args), [Response(204)]
+    )
+
+    assert okay and ms == 5
+    assert requests == [("PATCH", "http://server:1026/v2/entities/1/attrs/")]
+
+
+def test_ngsi_post_after_404():
+    args = create_args("NGSI-V2")
+    (okay, resp, ms, _), requests = drive(
+        ngsi.send("http://server:1026", 1, args), [Response(404), Response(201)]
+    )
+
+    assert okay and ms == 10
+    assert [method for method, _ in requests] == ["PATCH", "POST"]
+    assert requests[1][1].endswith("?options=upsert")
+
+
+def test_ngsi_failed():
+    args = create_args("NGSI-LD")
+    (okay, resp, ms, _), requests = drive(
+        ngsi.send("http://server:1026", 1, args), [Response(404), None]
+    )
+
+    assert not okay and resp is None
+
+
+def test_batch_append_after_404():
+    args = create_args("NGSI-V2", "--batch-size", "2")
+    (okay, _, _, payload, _), requests = drive(
+        ngsi.send_batch("http://server:1026", [1, 2], args),
+        [Response(404), Response(204)],
+    )
+
+    assert okay
+    assert json.loads(payload)["actionType"] == ngsi.ACTION_APPEND
+
+
+def test_sensor_things_creates_thing_once():
+    args = create_args("SensorThings-HTTP")
+    cache = id_cache.IdCache("http://server:1026")
+    found = json.dumps({"value": [{"@iot.id": 7}]}).encode()
+    none = json.dumps({"value": []}).encode()
+
+    result, requests = drive(
+        sensor_things.send(
+            "http://server:1026",
+            1,
+            sensor_things.INVALID_ID,
+            sensor_things.INVALID_ID,
+            args,
+            cache,
+            False,
+        ),
+        [
+            Response(200, none),  # GET Thing
+            Response(201),  # POST Thing
+            Response(200, found),  # GET Thing
+            Response(200, none),  # GET Datastream
+            Response(201),  # POST Datastream
+            Response(200, found),  # GET Datastream
+            Response(201),  # POST Observation
+        ],
+    )
+    thing_id, data_stream_id, okay, _, _, _ = result
+
+    assert okay and thing_id == 7 and data_stream_id == 7
+    assert cache.get_thing_id("1") == 7
+    assert requests[-1] == (
+        "POST",
+        "http://server:1026/v1.1/Datastreams(7)/Observations",
+    )
+
+    # the next message of the same Thing takes both from the cache
+    _, requests = drive(
+        sensor_things.send(
+            "http://server:1026",
+            1,
+            sensor_things.INVALID_ID,
+            sensor_things.INVALID_ID,
+            args,
+            cache,
+            False,
+        ),
+        [Response(201)],
+    )
+    assert len(requests) == 1
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from oscsim.modules import exporter
+
+
+def test_errors_by_class():
+    unique_errors = {
+        '404 {"error":"NotFound","description":"The requested entity of id 1': 2,
+        '404 {"error":"NotFound","description":"The requested entity of id 2': 3,
+        '400 {"type":"https://uri.etsi.org/ngsi-ld/errors/BadRequestData",': 1,
+        "409 Already Exists": 4,
+        "Connection Error": 5,
+    }
+
+    assert exporter.get_errors_by_class(unique_errors) == {
+        ("404", "NotFound"): 5,
+        ("400", "BadRequestData"): 1,
+        ("409", ""): 4,
+        ("other", ""): 5,
+    }
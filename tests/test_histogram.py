@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from oscsim.modules import histogram
+
+
+def get_nearest_rank(values, percentile):
+    # the percentile of a sorted list, as the histogram defines it
+    wanted = max(1, int(round(percentile / 100.0 * len(values))))
+    return values[wanted - 1]
+
+
+def create_values(num, highest, seed):
+    generator = random.Random(seed)
+    return [int(generator.expovariate(1.0) * highest / 5) for _ in range(num)]
+
+
+@pytest.mark.parametrize("highest", [200, 10000, 5000000])
+def test_percentiles_against_sorted_list(highest):
+    values = create_values(5000, highest, highest)
+    recorded = histogram.Histogram()
+    for value in values:
+        recorded.record(value)
+
+    values.sort()
+    assert recorded.count == len(values)
+    assert recorded.min == values[0]
+    assert recorded.max == values[-1]
+    for percentile in histogram.PERCENTILES + [0.0, 100.0]:
+        expected = get_nearest_rank(values, percentile)
+        # two significant digits (exact below 256)
+        assert expected <= recorded.get_percentile(percentile) <= expected * 1.01
+
+
+def test_merge_is_like_recording_all():
+    first = create_values(1000, 3000, 1)
+    second = create_values(3000, 30000, 2)
+    all_values = histogram.Histogram()
+    parts = [histogram.Histogram(), histogram.Histogram()]
+    for part, values in zip(parts, [first, second]):
+        for value in values:
+            part.record(value)
+            all_values.record(value)
+
+    merged = histogram.Histogram()
+    for part in parts + [histogram.Histogram()]:
+        merged.merge(part)
+
+    assert merged.counts == all_values.counts
+    assert (merged.count, merged.sum, merged.min, merged.max) == (
+        all_values.count,
+        all_values.sum,
+        all_values.min,
+        all_values.max,
+    )
+    assert merged.get_percentiles() == all_values.get_percentiles()
+
+
+def test_difference():
+    earlier = histogram.Histogram()
+    for value in [5, 100, 1000]:
+        earlier.record(value)
+    current = earlier.copy()
+    current.record(7, 2)
+    current.record(50)
+
+    difference = current.get_difference(earlier)
+
+    assert (difference.count, difference.sum) == (3, 64)
+    assert (difference.min, difference.max) == (7, 50)
+    assert difference.get_percentile(50.0) == 7
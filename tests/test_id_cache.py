@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from threading import Lock, Thread
+from time import sleep
+
+from oscsim.modules import id_cache
+
+
+def find_thing(cache, thing_name, attempts, fail):
+    # like sensor_things.search_thing, a search may fail (e.g. the POST of the Thing)
+    key = ("thing", thing_name)
+    with cache.get_key_lock(key):
+        try:
+            if cache.get_thing_id(thing_name) is not None:
+                return
+
+            with attempts["lock"]:
+                attempts["active"] += 1
+                attempts["max"] = max(attempts["max"], attempts["active"])
+            sleep(0.01)
+            with attempts["lock"]:
+                attempts["active"] -= 1
+                attempts["total"] += 1
+
+            if not fail:
+                cache.put_thing_id(thing_name, 1)
+        finally:
+            cache.release_key_lock(key)
+
+
+def test_key_lock_after_failure():
+    # senders waiting for (or coming after) a failed search never search at once
+    cache = id_cache.IdCache("http://localhost")
+    attempts = {"lock": Lock(), "active": 0, "max": 0, "total": 0}
+
+    threads = []
+    for i in range(20):
+        thread = Thread(target=find_thing, args=(cache, "thing", attempts, i < 10))
+        threads.append(thread)
+        thread.start()
+        sleep(0.003)
+    for thread in threads:
+        thread.join()
+
+    assert attempts["max"] == 1
+    assert attempts["total"] >= 2
+    assert cache.get_thing_id("thing") == 1
+    assert len(cache.key_locks) == 0
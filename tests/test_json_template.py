@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from oscsim.modules import json_template
+
+
+@pytest.mark.parametrize("indent", [0, 2, 4])
+def test_render_like_json_dumps(indent):
+    skeleton = {
+        "id": "urn:" + json_template.TEXT,
+        "number": json_template.VALUE,
+        "nested": {"list": [json_template.VALUE, json_template.VALUE]},
+        "text": 'a "quoted" ä',
+    }
+    template = json_template.Template(skeleton, indent)
+
+    payload = {
+        "id": "urn:7",
+        "number": 1.5,
+        "nested": {"list": [True, None]},
+        "text": 'a "quoted" ä',
+    }
+    expected = json.dumps(payload, indent=indent) if indent > 0 else json.dumps(payload)
+
+    assert template.render([b"7", b"1.5", b"true", b"null"]) == expected.encode()
+
+
+@pytest.mark.parametrize("indent", [0, 2])
+def test_join_nested(indent):
+    item = json_template.Template({"a": json_template.VALUE}, indent, 1)
+    batch = json_template.Template([json_template.VALUE, json_template.VALUE], indent)
+
+    items = [item.render([str(i).encode()]) for i in range(3)]
+    payload = [{"a": i} for i in range(3)]
+    expected = json.dumps(payload, indent=indent) if indent > 0 else json.dumps(payload)
+
+    assert batch.join(items) == expected.encode()
+
+
+@pytest.mark.parametrize(
+    "value", [True, False, 0, -42, 2**70, 1.5, -0.1, 1e22, 12.345678901234567, 'ä"']
+)
+def test_encode_value(value):
+    assert json_template.encode_value(value) == json.dumps(value).encode()
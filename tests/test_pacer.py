@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from oscsim.modules import pacer, profile
+
+
+def create_slots(rate_pacer, num_slots):
+    # the schedule as seconds since its first slot (nobody waits for them)
+    slots = [rate_pacer.next_slot() for _ in range(num_slots)]
+    return [slot - slots[0] for slot in slots]
+
+
+def create_curve(stages):
+    curve = profile.Profile(profile.KIND_RATE, stages)
+    curve.start()
+    return curve
+
+
+def test_fixed_rate():
+    slots = create_slots(pacer.Pacer(100.0, pacer.ARRIVAL_FIXED), 101)
+
+    assert abs(slots[1] - 0.01) < 1e-9
+    assert abs(slots[-1] - 1.0) < 1e-6
+
+
+def test_curve_starting_at_0():
+    # 0 -> 200 msg/sec in 2 s, 200 -> 50 msg/sec in 2 s: 200 + 250 messages
+    curve = create_curve([(2.0, 0.0, 200.0), (2.0, 200.0, 50.0)])
+    slots = create_slots(pacer.Pacer(1.0, pacer.ARRIVAL_FIXED, curve=curve), 500)
+
+    # the first (tiny) rate doesn't push the next slot far into the future
+    assert slots[1] < 0.5
+    assert 190 <= len([slot for slot in slots if slot < 2.0]) <= 210
+    assert 435 <= len([slot for slot in slots if slot < 4.0]) <= 465
+
+
+def test_curve_pausing_at_0():
+    # no slot while the curve is at 0
+    curve = create_curve([(1.0, 0.0, 0.0), (1.0, 100.0, 100.0)])
+    rate_pacer = pacer.Pacer(1.0, pacer.ARRIVAL_FIXED, curve=curve)
+    first = rate_pacer.next_slot()
+    slots = create_slots(rate_pacer, 100)
+
+    assert rate_pacer.get_elapsed(first) >= 0.99
+    assert 0.95 <= slots[-1] <= 1.05
+
+
+def test_curve_poisson():
+    curve = create_curve([(10.0, 0.0, 100.0)])
+    slots = create_slots(pacer.Pacer(1.0, pacer.ARRIVAL_POISSON, curve=curve), 500)
+
+    # 500 messages are due after 10 s (with some luck)
+    assert 8.0 <= slots[-1] <= 12.0
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from oscsim.modules import arguments
+
+DATE_TIME = "2021-01-01T00:00:00.00Z"
+
+
+def create_plan(protocol, indent, *options):
+    args = arguments.parse_arguments(
+        [
+            "-s",
+            "http://server:1026",
+            "-p",
+            protocol,
+            "-ai",
+            str(indent),
+            "-ad",
+            "d",
+            "-an",
+            "i,i,1,9",
+            "-an",
+            "f,f,2.5",
+            "-as",
+            "s",
+            'a "quoted" ä',
+        ]
+        + list(options)
+    )
+    args.plan.date_time = DATE_TIME
+    return args.plan
+
+
+def dumps(payload, indent):
+    # what the plan has to render, byte by byte
+    if indent > 0:
+        return json.dumps(payload, indent=indent).encode("utf-8")
+    return json.dumps(payload).encode("utf-8")
+
+
+def check_attributes(entity, ngsi_ld):
+    assert entity["d"] == {"type": "DateTime", "value": DATE_TIME}
+    assert entity["i"]["type"] == ("Property" if ngsi_ld else "Number")
+    assert 1 <= entity["i"]["value"] <= 9
+    assert entity["f"]["value"] == 2.5
+    assert entity["s"] == {"type": "Text", "value": 'a "quoted" ä'}
+
+
+V2_OPTIONS = ["-ab", "b", "true", "-ab", "r", "toggle", "-al", "l,1,2,3,4"]
+
+
+@pytest.mark.parametrize("indent", [0, 2, 4])
+@pytest.mark.parametrize("meta_data", [True, False])
+def test_ngsi_v2(indent, meta_data):
+    plan = create_plan("NGSI-V2", indent, "-y", "T", *V2_OPTIONS)
+
+    rendered = plan.create_payload_ngsi_v2(7, meta_data)
+    entity = json.loads(rendered.decode("utf-8"))
+
+    assert rendered == dumps(entity, indent)
+    assert ("id" in entity) == meta_data
+    check_attributes(entity, False)
+    assert entity["b"] == {"type": "Boolean", "value": True}
+    assert isinstance(entity["r"]["value"], bool)
+    assert 1 <= entity["l"]["value"]["coordinates"][0] <= 3
+    assert 2 <= entity["l"]["value"]["coordinates"][1] <= 4
+
+
+@pytest.mark.parametrize("indent", [0, 2, 4])
+@pytest.mark.parametrize("is_post", [True, False])
+def test_ngsi_ld(indent, is_post):
+    plan = create_plan("NGSI-LD", indent, "-y", "T")
+
+    rendered = plan.create_payload_ngsi_ld(7, is_post)
+    entity = json.loads(rendered.decode("utf-8"))
+
+    assert rendered == dumps(entity, indent)
+    assert ("id" in entity) == is_post
+    check_attributes(entity, True)
+
+
+@pytest.mark.parametrize("indent", [0, 2])
+def test_batches(indent):
+    plan = create_plan("NGSI-V2", indent, *V2_OPTIONS)
+    rendered = plan.create_batch_payload_ngsi_v2([1, 2, 3], "update")
+    batch = json.loads(rendered.decode("utf-8"))
+
+    assert rendered == dumps(batch, indent)
+    assert [entity["id"] for entity in batch["entities"]] == ["1", "2", "3"]
+
+    plan = create_plan("NGSI-LD", indent)
+    rendered = plan.create_batch_payload_ngsi_ld([1, 2])
+    entities = json.loads(rendered.decode("utf-8"))
+
+    assert rendered == dumps(entities, indent)
+    assert len(entities) == 2
+    for entity in entities:
+        check_attributes(entity, True)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import json
+
+from oscsim.modules import arguments, payload_plan, producer
+
+
+def create_producer(*options):
+    args = arguments.parse_arguments(
+        ["-s", "http://server:1026", "-an", "t,i,1", "-u", "-l", "1"] + list(options)
+    )
+    return producer.Producer(args, [[0]], 4, 1, lambda: False)
+
+
+def test_date_time_is_taken_when_sent(monkeypatch):
+    queued = create_producer("-ad", "d")
+    queued.start()
+    queued.get()
+
+    monkeypatch.setattr(
+        payload_plan, "create_date_time", lambda: "2021-01-01T00:00:00.00Z"
+    )
+    _, (_, payload) = queued.get()
+
+    assert (
+        json.loads(payload.decode("utf-8"))["d"]["value"] == "2021-01-01T00:00:00.00Z"
+    )
+
+
+def test_batch_without_date_time():
+    queued = create_producer("--batch-size", "2")
+    queued.start()
+    first_ids, (url, payload) = queued.get()
+
+    assert len(first_ids) == 2
+    assert url.endswith("/v2/op/update")
+    assert producer.DATE_TIME_MARKER not in payload
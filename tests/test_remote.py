@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+import socket
+
+from oscsim.modules import arguments, remote, stats
+
+
+def over_the_wire(message):
+    # what the other side gets from a remote.Channel
+    return json.loads(json.dumps(message))
+
+
+def test_args_round_trip():
+    args = arguments.parse_arguments(
+        [
+            "-s",
+            "http://server:1026",
+            "-an",
+            "t,i,1,9",
+            "-n",
+            "8",
+            "-u",
+            "--rate",
+            "100/s",
+            "--metrics-port",
+            "9464",
+        ]
+    )
+
+    decoded = remote.decode_args(over_the_wire(remote.encode_args(args, 4)))
+
+    assert decoded.rate == 25.0
+    assert decoded.metrics_port is None
+    assert decoded.profile is None
+    for key in ["server", "num_threads", "unlimited", "numbers", "protocol"]:
+        assert getattr(decoded, key) == getattr(args, key)
+    assert decoded.plan.create_payload_ngsi_v2(1, True)[:8] == b'{"id": "'
+
+
+def test_rate_curve_is_split(tmp_path):
+    curve = tmp_path / "curve.csv"
+    curve.write_text("0,0\n10,100\n")
+    args = arguments.parse_arguments(
+        ["-s", "http://server:1026", "-an", "t,i,1", "--rate-curve", str(curve)]
+    )
+
+    decoded = remote.decode_args(over_the_wire(remote.encode_args(args, 2)))
+
+    assert decoded.profile.kind == args.profile.kind
+    assert decoded.profile.stages == [
+        (duration, first / 2, last / 2) for duration, first, last in args.profile.stages
+    ]
+
+
+def test_stats_round_trip():
+    worker = stats.Stats("thread 1")
+    worker.messages = 10
+    worker.requests = 5
+    worker.errors = 2
+    worker.time = 123
+    worker.add_unique_error("404 Not Found", 2)
+    for value in [1, 7, 300, 45000]:
+        worker.response_times.record(value)
+
+    snapshot = {"index": 0, "stats": worker, "classes": [worker], "active": 1}
+    decoded = remote.decode_snapshot(over_the_wire(remote.encode_snapshot(snapshot)))
+
+    for other in [decoded["stats"], decoded["classes"][0]]:
+        assert other.get_summary() == worker.get_summary()
+        assert other.unique_errors == worker.unique_errors
+        assert other.response_times.counts == worker.response_times.counts
+        assert other.response_times.get_percentiles() == (
+            worker.response_times.get_percentiles()
+        )
+    assert decoded["active"] == 1
+
+
+def test_channel():
+    left, right = socket.socketpair()
+    sender, receiver = remote.Channel(left), remote.Channel(right)
+
+    sender.send({"type": remote.STATS, "value": 1})
+    sender.send({"type": remote.START, "elapsed": 1.5})
+    assert receiver.receive_until(remote.START)["elapsed"] == 1.5
+
+    sender.close()
+    assert receiver.receive_until(remote.HALT) is None
+    receiver.close()
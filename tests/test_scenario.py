@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import json
+
+from oscsim.modules import arguments, scenario
+
+CLASSES = [
+    {"name": "a", "weight": 3, "ids": 10, "attribute-number": ["t,i,1"]},
+    {"name": "b", "weight": 1, "ids": 4, "attribute-number": ["t,i,1"]},
+    {
+        "name": "c",
+        "weight": 2,
+        "first-id": 100,
+        "ids": 1,
+        "attribute-string": {"s": "x"},
+    },
+]
+
+
+def create_scenario(tmp_path):
+    file_name = tmp_path / "scenario.json"
+    file_name.write_text(json.dumps({"classes": CLASSES}))
+    args = arguments.parse_arguments(
+        ["-s", "http://server:1026", "--scenario", str(file_name)]
+    )
+    return args.scenario
+
+
+def take_names(mix, num):
+    return [mix.take(1)[2].name for _ in range(num)]
+
+
+def test_weights_are_exact(tmp_path):
+    mix = scenario.Mix(create_scenario(tmp_path), 0, 1, False)
+
+    # smooth: every round of the total weight has the exact shares
+    for _ in range(10):
+        names = take_names(mix, 6)
+        assert [names.count(name) for name in "abc"] == [3, 1, 2]
+
+
+def test_ids_of_the_workers(tmp_path):
+    send_scenario = create_scenario(tmp_path)
+    ids_by_class = {name: [] for name in "abc"}
+
+    for index in range(2):
+        mix = scenario.Mix(send_scenario, index, 2, False)
+        for _ in range(60):
+            _, first_ids, class_stats = mix.take(1)
+            ids_by_class[class_stats.name].append((index, first_ids[0]))
+
+    for name, first, num_ids in [("a", 1, 10), ("b", 1, 4)]:
+        ids = ids_by_class[name]
+        # all ids of the class are sent, each one by a single worker
+        assert {first_id for _, first_id in ids} == set(range(first, first + num_ids))
+        assert len(set(ids)) == num_ids
+    # less ids than workers: they share it
+    assert {first_id for _, first_id in ids_by_class["c"]} == {100}
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from oscsim.modules import verbose_log
+
+
+def test_lines_are_bounded(monkeypatch):
+    monkeypatch.setattr(verbose_log, "MAX_LINES", 3)
+    log = verbose_log.VerboseLog(None, 1, False, None)
+
+    for i in range(5):
+        log.write(str(i))
+
+    assert list(log.lines) == ["0", "1", "2"]
+    assert log.dropped == 2
+    assert "2 line(s) as it couldn't keep up" in log.get_summary()
+
+
+def test_nothing_left_out():
+    log = verbose_log.VerboseLog(None, 2, True, None)
+
+    assert not log.accepts(1, False)
+    assert not log.accepts(2, True)
+    assert log.accepts(3, True)
+    assert log.get_summary() is None